@@ -0,0 +1,209 @@
+# aggregates.py (مؤشرات مجمعة تُحدَّث تدريجيًا: المتوسط المتحرك والمتوسط الأسبوعي والفارق بين الآجال)
+"""
+Materialized aggregates of the auction history, maintained incrementally.
+
+Three aggregates live next to the auctions table and are written in the same
+transaction as the auctions they summarize:
+
+- `AGGREGATES_TABLE_NAME`: one row per auction with the moving average of the
+  yield over the last `MOVING_AVERAGE_AUCTIONS` auctions of its tenor.
+- `WEEKLY_TABLE_NAME`: a running sum and count of the yields per (week, tenor);
+  the weekly average is their ratio, so a new auction adds to one row.
+- `SPREADS_VIEW_NAME`: the weekly long-minus-short tenor spread, read from two
+  rows of the weekly table.
+
+A new or revised auction touches a constant number of rows (itself and the
+next auctions of its tenor whose window contains it), so saving a scrape never
+recomputes the history. A full rebuild is only needed after a bulk import or a
+migration.
+"""
+import sqlite3
+from typing import Iterable, Tuple
+
+import constants as C
+
+# Weeks start on Sunday, the first business day in Egypt (day 3 is a Sunday)
+_WEEK_START_SQL = (
+    f'"{C.SESSION_DATE_COLUMN_NAME}" - ("{C.SESSION_DATE_COLUMN_NAME}" + 4) % 7'
+)
+
+_CREATE_AGGREGATES_SQL = f"""
+    CREATE TABLE IF NOT EXISTS "{C.AGGREGATES_TABLE_NAME}" (
+        "{C.TENOR_COLUMN_NAME}" INTEGER NOT NULL,
+        "{C.SESSION_DATE_COLUMN_NAME}" INTEGER NOT NULL,
+        "{C.YIELD_COLUMN_NAME}" REAL NOT NULL,
+        "{C.MOVING_AVERAGE_COLUMN_NAME}" REAL NOT NULL,
+        PRIMARY KEY ("{C.TENOR_COLUMN_NAME}", "{C.SESSION_DATE_COLUMN_NAME}")
+    ) WITHOUT ROWID
+"""
+_CREATE_WEEKLY_SQL = f"""
+    CREATE TABLE IF NOT EXISTS "{C.WEEKLY_TABLE_NAME}" (
+        "{C.WEEK_START_COLUMN_NAME}" INTEGER NOT NULL,
+        "{C.TENOR_COLUMN_NAME}" INTEGER NOT NULL,
+        yield_sum REAL NOT NULL,
+        auction_count INTEGER NOT NULL,
+        PRIMARY KEY ("{C.WEEK_START_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}")
+    ) WITHOUT ROWID
+"""
+_CREATE_SPREADS_SQL = f"""
+    CREATE VIEW "{C.SPREADS_VIEW_NAME}" AS
+    SELECT l."{C.WEEK_START_COLUMN_NAME}",
+           l.yield_sum / l.auction_count AS long_yield,
+           s.yield_sum / s.auction_count AS short_yield,
+           l.yield_sum / l.auction_count - s.yield_sum / s.auction_count AS spread
+    FROM "{C.WEEKLY_TABLE_NAME}" AS l
+    JOIN "{C.WEEKLY_TABLE_NAME}" AS s
+    ON s."{C.WEEK_START_COLUMN_NAME}" = l."{C.WEEK_START_COLUMN_NAME}"
+    AND s."{C.TENOR_COLUMN_NAME}" = {int(C.SPREAD_SHORT_TENOR)}
+    WHERE l."{C.TENOR_COLUMN_NAME}" = {int(C.SPREAD_LONG_TENOR)}
+"""
+
+# --- Incremental maintenance ---
+_UPSERT_AUCTION_SQL = f"""
+    INSERT INTO "{C.AGGREGATES_TABLE_NAME}" (
+        "{C.TENOR_COLUMN_NAME}", "{C.SESSION_DATE_COLUMN_NAME}",
+        "{C.YIELD_COLUMN_NAME}", "{C.MOVING_AVERAGE_COLUMN_NAME}"
+    )
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT("{C.TENOR_COLUMN_NAME}", "{C.SESSION_DATE_COLUMN_NAME}")
+    DO UPDATE SET "{C.YIELD_COLUMN_NAME}" = excluded."{C.YIELD_COLUMN_NAME}"
+"""
+# Recomputes the moving average of an auction and of the next auctions of its
+# tenor whose window contains it: at most MOVING_AVERAGE_AUCTIONS rows, each
+# averaging at most MOVING_AVERAGE_AUCTIONS yields, all read on the primary key
+_REFRESH_MOVING_AVERAGE_SQL = f"""
+    UPDATE "{C.AGGREGATES_TABLE_NAME}" AS a
+    SET "{C.MOVING_AVERAGE_COLUMN_NAME}" = (
+        SELECT AVG(w."{C.YIELD_COLUMN_NAME}") FROM (
+            SELECT p."{C.YIELD_COLUMN_NAME}" FROM "{C.AGGREGATES_TABLE_NAME}" AS p
+            WHERE p."{C.TENOR_COLUMN_NAME}" = a."{C.TENOR_COLUMN_NAME}"
+            AND p."{C.SESSION_DATE_COLUMN_NAME}" <= a."{C.SESSION_DATE_COLUMN_NAME}"
+            ORDER BY p."{C.SESSION_DATE_COLUMN_NAME}" DESC
+            LIMIT {int(C.MOVING_AVERAGE_AUCTIONS)}
+        ) AS w
+    )
+    WHERE a."{C.TENOR_COLUMN_NAME}" = ?1 AND a."{C.SESSION_DATE_COLUMN_NAME}" IN (
+        SELECT "{C.SESSION_DATE_COLUMN_NAME}" FROM "{C.AGGREGATES_TABLE_NAME}"
+        WHERE "{C.TENOR_COLUMN_NAME}" = ?1 AND "{C.SESSION_DATE_COLUMN_NAME}" >= ?2
+        ORDER BY "{C.SESSION_DATE_COLUMN_NAME}"
+        LIMIT {int(C.MOVING_AVERAGE_AUCTIONS)}
+    )
+"""
+_ADD_TO_WEEK_SQL = f"""
+    INSERT INTO "{C.WEEKLY_TABLE_NAME}" (
+        "{C.WEEK_START_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}", yield_sum, auction_count
+    )
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT("{C.WEEK_START_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}")
+    DO UPDATE SET yield_sum = yield_sum + excluded.yield_sum,
+                  auction_count = auction_count + excluded.auction_count
+"""
+
+# --- Full rebuild ---
+_REBUILD_AGGREGATES_SQL = f"""
+    INSERT INTO "{C.AGGREGATES_TABLE_NAME}"
+    SELECT "{C.TENOR_COLUMN_NAME}", "{C.SESSION_DATE_COLUMN_NAME}", "{C.YIELD_COLUMN_NAME}",
+           AVG("{C.YIELD_COLUMN_NAME}") OVER (
+               PARTITION BY "{C.TENOR_COLUMN_NAME}"
+               ORDER BY "{C.SESSION_DATE_COLUMN_NAME}"
+               ROWS BETWEEN {int(C.MOVING_AVERAGE_AUCTIONS) - 1} PRECEDING AND CURRENT ROW
+           )
+    FROM "{C.TABLE_NAME}"
+"""
+_REBUILD_WEEKLY_SQL = f"""
+    INSERT INTO "{C.WEEKLY_TABLE_NAME}"
+    SELECT {_WEEK_START_SQL}, "{C.TENOR_COLUMN_NAME}",
+           SUM("{C.YIELD_COLUMN_NAME}"), COUNT(*)
+    FROM "{C.TABLE_NAME}"
+    GROUP BY 1, 2
+"""
+
+# --- Readers ---
+MOVING_AVERAGES_SQL = f"""
+    SELECT "{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}",
+           "{C.YIELD_COLUMN_NAME}", "{C.MOVING_AVERAGE_COLUMN_NAME}"
+    FROM "{C.AGGREGATES_TABLE_NAME}"
+    ORDER BY "{C.TENOR_COLUMN_NAME}", "{C.SESSION_DATE_COLUMN_NAME}"
+"""
+WEEKLY_AVERAGES_SQL = f"""
+    SELECT "{C.WEEK_START_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}",
+           yield_sum / auction_count AS "{C.YIELD_COLUMN_NAME}", auction_count
+    FROM "{C.WEEKLY_TABLE_NAME}"
+    ORDER BY "{C.TENOR_COLUMN_NAME}", "{C.WEEK_START_COLUMN_NAME}"
+"""
+SPREADS_SQL = (
+    f'SELECT * FROM "{C.SPREADS_VIEW_NAME}" ORDER BY "{C.WEEK_START_COLUMN_NAME}"'
+)
+
+
+def week_start(day: int) -> int:
+    """Returns the epoch day of the Sunday that starts the week of `day`."""
+    return day - (day + 4) % 7
+
+
+def create_aggregate_tables(cursor: sqlite3.Cursor) -> bool:
+    """
+    Creates the aggregate tables and the spreads view.
+
+    Returns:
+        True if the tables did not exist yet and must be filled by
+        `rebuild_aggregates`.
+    """
+    existed = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (C.AGGREGATES_TABLE_NAME,),
+    ).fetchone()
+    cursor.execute(_CREATE_AGGREGATES_SQL)
+    cursor.execute(_CREATE_WEEKLY_SQL)
+    # Recreated only when the configured tenors changed: a schema change
+    # rewrites the database file, which must stay untouched on a no-op open
+    view = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?",
+        (C.SPREADS_VIEW_NAME,),
+    ).fetchone()
+    if view is None or view[0] != _CREATE_SPREADS_SQL.strip():
+        cursor.execute(f'DROP VIEW IF EXISTS "{C.SPREADS_VIEW_NAME}"')
+        cursor.execute(_CREATE_SPREADS_SQL)
+    return existed is None
+
+
+def rebuild_aggregates(cursor: sqlite3.Cursor) -> None:
+    """Recomputes every aggregate from the auctions table."""
+    cursor.execute(f'DELETE FROM "{C.AGGREGATES_TABLE_NAME}"')
+    cursor.execute(f'DELETE FROM "{C.WEEKLY_TABLE_NAME}"')
+    cursor.execute(_REBUILD_AGGREGATES_SQL)
+    cursor.execute(_REBUILD_WEEKLY_SQL)
+
+
+def apply_auction_changes(
+    cursor: sqlite3.Cursor,
+    inserted: Iterable[Tuple[int, int, float]],
+    updated: Iterable[Tuple[int, int, float, float]],
+) -> None:
+    """
+    Folds new and revised auctions into the aggregates.
+
+    Must run in the transaction that writes the auctions.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor on the writing connection.
+        inserted: (tenor, session day, yield) of every new auction.
+        updated: (tenor, session day, new yield, old yield) of every revised auction.
+    """
+    week_rows = []
+    auctions = []
+    for tenor, session_day, yield_ in inserted:
+        auctions.append((tenor, session_day, yield_))
+        week_rows.append((week_start(session_day), tenor, yield_, 1))
+    for tenor, session_day, yield_, old_yield in updated:
+        auctions.append((tenor, session_day, yield_))
+        week_rows.append((week_start(session_day), tenor, yield_ - old_yield, 0))
+
+    cursor.executemany(
+        _UPSERT_AUCTION_SQL,
+        [(tenor, day, yield_, yield_) for tenor, day, yield_ in auctions],
+    )
+    cursor.executemany(
+        _REFRESH_MOVING_AVERAGE_SQL, [(tenor, day) for tenor, day, _ in auctions]
+    )
+    cursor.executemany(_ADD_TO_WEEK_SQL, week_rows)
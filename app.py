@@ -1,17 +1,57 @@
 # app.py (نسخة نهائية مع حل مشكلة الـ scroll)
 import streamlit as st
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 import plotly.express as px
+import numpy as np
+import pandas as pd
 
 # Import all the corrected and improved modules
 from utils import prepare_arabic_text, load_css
-from db_manager import get_db_manager
-from calculations import calculate_primary_yield, analyze_secondary_sale
+from db_cache import get_db_manager
+from db_manager import UNKNOWN_DATA_VERSION
+from calculations import (
+    analyze_secondary_sale_surface,
+    solve_break_even_secondary_yield,
+)
 from cbe_scraper import fetch_data_from_cbe
+from retry_policy import RetryPolicy
+from yield_curve import YieldCurve
+from asof_index import AsOfYieldIndex
+from pricing_cache import PricingCache
 import constants as C
 
 
+@st.cache_resource
+def get_pricing_cache() -> PricingCache:
+    """One pricing cache shared by every session of this server process."""
+    return PricingCache()
+
+
+def by_version(builder, data_version: int):
+    """
+    Returns a per-version cached builder, or its uncached body when the data
+    version is unknown (the database could not be read), so the fallback data
+    is not cached for every session.
+    """
+    return builder.__wrapped__ if data_version == UNKNOWN_DATA_VERSION else builder
+
+
+@st.cache_resource(max_entries=C.DATA_CACHE_MAX_ENTRIES)
+def build_yield_curve(_data_df, data_version: int) -> YieldCurve:
+    """Builds the interpolation curve once per version of the latest data."""
+    return YieldCurve.from_dataframe(_data_df)
+
+
+@st.cache_resource(max_entries=C.DATA_CACHE_MAX_ENTRIES)
+def build_asof_index(_db_manager, data_version: int) -> AsOfYieldIndex:
+    """Builds the as-of yield index once per version of the history."""
+    history = _db_manager.load_history_snapshot(data_version)
+    if history is None:
+        history = _db_manager.load_all_historical_data(data_version)
+    return AsOfYieldIndex.from_history(history)
+
+
 def main():
     # --- 1. App Configuration and Initialization ---
     st.set_page_config(
@@ -23,19 +63,13 @@ def main():
 
     # Use the cached DB Manager
     db_manager = get_db_manager()
+    pricing_cache = get_pricing_cache()
 
-    # --- IMPROVEMENT: Initialize data in session_state for smooth updates ---
-    if "df_data" not in st.session_state:
-        st.session_state.df_data, st.session_state.last_update = (
-            db_manager.load_latest_data()
-        )
-    if "historical_df" not in st.session_state:
-        st.session_state.historical_df = db_manager.load_all_historical_data()
-
-    # Always use data from session_state for display
-    data_df = st.session_state.df_data
-    last_update = st.session_state.last_update
-    historical_df = st.session_state.historical_df
+    # --- IMPROVEMENT: Loaders are cached per data version ---
+    # Every rerun reads the version counter (one indexed lookup) and is served
+    # from the cache until a scrape bumps it, for this session and all others.
+    data_version = db_manager.data_version()
+    data_df, last_update = db_manager.load_latest_data(data_version)
 
     # --- 2. Header ---
     st.markdown(
@@ -73,18 +107,25 @@ def main():
                     "Friday": "الجمعة",
                     "Saturday": "السبت",
                 }
+                # Session dates are loaded as datetimes, so they sort natively
                 try:
                     unique_dates = sorted(
-                        data_df[C.SESSION_DATE_COLUMN_NAME].unique(),
-                        key=lambda d: datetime.strptime(d, "%d/%m/%Y"),
+                        pd.DatetimeIndex(data_df[C.SESSION_DATE_COLUMN_NAME].unique())
                     )
                 except (ValueError, TypeError):
-                    unique_dates = data_df[C.SESSION_DATE_COLUMN_NAME].unique()
+                    # The fallback data of a database error has no session dates
+                    unique_dates = []
+                if not unique_dates:
+                    st.info(
+                        prepare_arabic_text(
+                            "في انتظار ورود البيانات من البنك المركزي..."
+                        )
+                    )
 
-                for session_date_str in unique_dates:
+                for session_date_dt in unique_dates:
                     try:
-                        session_date_dt = datetime.strptime(
-                            session_date_str, "%d/%m/%Y"
+                        session_date_str = session_date_dt.strftime(
+                            C.SESSION_DATE_FORMAT
                         )
                         day_en = session_date_dt.strftime("%A")
                         day_ar = day_names_en_ar.get(day_en, day_en)
@@ -104,7 +145,7 @@ def main():
                         )
 
                         tenors_for_this_date = data_df[
-                            data_df[C.SESSION_DATE_COLUMN_NAME] == session_date_str
+                            data_df[C.SESSION_DATE_COLUMN_NAME] == session_date_dt
                         ].sort_values(by=C.TENOR_COLUMN_NAME)
                         cols = st.columns(len(tenors_for_this_date) or 1)
                         for i, (_, tenor_data) in enumerate(
@@ -118,7 +159,7 @@ def main():
                                     unsafe_allow_html=True,
                                 )
 
-                        if session_date_str != unique_dates[-1]:
+                        if session_date_dt != unique_dates[-1]:
                             st.markdown(
                                 "<hr style='border-color: #495057; margin: 10px 0 15px 0;'>",
                                 unsafe_allow_html=True,
@@ -148,17 +189,35 @@ def main():
                     )
                 ):
                     try:
-                        fetch_data_from_cbe(db_manager)
-                        # --- IMPROVEMENT: Update session_state directly instead of st.rerun() ---
-                        st.session_state.df_data, st.session_state.last_update = (
-                            db_manager.load_latest_data()
-                        )
-                        st.session_state.historical_df = (
-                            db_manager.load_all_historical_data()
-                        )
-                        st.toast(
-                            prepare_arabic_text("تم تحديث البيانات بنجاح!"), icon="✅"
+                        # A short budget: this blocks the user's session
+                        status = fetch_data_from_cbe(
+                            db_manager, policy=RetryPolicy.interactive()
                         )
+                        if status == "unchanged":
+                            # Nothing was written: the cached data is current
+                            st.toast(
+                                prepare_arabic_text(
+                                    "لا توجد نتائج جديدة منذ آخر تحديث."
+                                ),
+                                icon="ℹ️",
+                            )
+                        elif status == "failed":
+                            st.warning(
+                                prepare_arabic_text(
+                                    "تعذر جلب البيانات من البنك المركزي. حاول لاحقًا."
+                                ),
+                                icon="⚠️",
+                            )
+                        else:
+                            # --- IMPROVEMENT: Reload only the loaders of the new version ---
+                            data_version = db_manager.data_version()
+                            data_df, last_update = db_manager.load_latest_data(
+                                data_version
+                            )
+                            st.toast(
+                                prepare_arabic_text("تم تحديث البيانات بنجاح!"),
+                                icon="✅",
+                            )
                         # By not calling st.rerun(), Streamlit will do a smoother update.
                     except Exception as e:
                         st.error(
@@ -220,12 +279,20 @@ def main():
                 else [91, 182, 273, 364]
             )
 
+            # One dict lookup per tenor instead of filtering the DataFrame each time
+            yields_by_tenor = (
+                dict(
+                    zip(
+                        data_df[C.TENOR_COLUMN_NAME].tolist(),
+                        data_df[C.YIELD_COLUMN_NAME].tolist(),
+                    )
+                )
+                if not data_df.empty
+                else {}
+            )
+
             def get_yield_for_tenor(tenor):
-                if not data_df.empty:
-                    yield_row = data_df[data_df[C.TENOR_COLUMN_NAME] == tenor]
-                    if not yield_row.empty:
-                        return yield_row[C.YIELD_COLUMN_NAME].iloc[0]
-                return None
+                return yields_by_tenor.get(tenor)
 
             formatted_options = []
             for tenor in options:
@@ -274,11 +341,12 @@ def main():
             else:
                 yield_rate = get_yield_for_tenor(selected_tenor_main)
                 if yield_rate is not None:
-                    results = calculate_primary_yield(
+                    results = pricing_cache.primary_yield(
                         investment_amount_main,
                         yield_rate,
                         selected_tenor_main,
                         tax_rate_main,
+                        data_version=data_version,
                     )
 
                     with results_placeholder_main.container(border=True):
@@ -370,19 +438,40 @@ def main():
                 step=25000.0,
                 key="secondary_face_value",
             )
+            original_tenor_secondary = st.selectbox(
+                prepare_arabic_text("أجل الإذن الأصلي (بالأيام)"),
+                options,
+                key="secondary_tenor",
+            )
+            purchase_date_secondary = st.date_input(
+                prepare_arabic_text("تاريخ الشراء"),
+                value=datetime.now(pytz.timezone(C.TIMEZONE)).date(),
+                key="secondary_purchase_date",
+            )
+            # Prefill the purchase yield from the auction in effect on that date
+            asof_yield, asof_session = by_version(build_asof_index, data_version)(
+                db_manager, data_version
+            ).lookup(int(original_tenor_secondary), purchase_date_secondary)
+            if np.isnan(asof_yield[0]):
+                yield_help = "لا يوجد عطاء مسجل لهذا الأجل في أو قبل تاريخ الشراء."
+                default_yield = 29.0
+            else:
+                yield_help = (
+                    "القيمة المقترحة هي عائد عطاء "
+                    f"{pd.Timestamp(int(asof_session[0]), unit='D').strftime(C.SESSION_DATE_FORMAT)} "
+                    "السائد في تاريخ الشراء."
+                )
+                default_yield = round(float(asof_yield[0]), 3)
             original_yield_secondary = st.number_input(
                 prepare_arabic_text("عائد الشراء الأصلي (%)"),
                 min_value=1.0,
-                value=29.0,
+                value=max(default_yield, 1.0),
                 step=0.1,
-                key="secondary_original_yield",
+                # A new tenor or date is a new widget, so the suggestion is applied
+                key=f"secondary_original_yield_{original_tenor_secondary}_{purchase_date_secondary}",
+                help=prepare_arabic_text(yield_help),
                 format="%.3f",
             )
-            original_tenor_secondary = st.selectbox(
-                prepare_arabic_text("أجل الإذن الأصلي (بالأيام)"),
-                options,
-                key="secondary_tenor",
-            )
             tax_rate_secondary = st.number_input(
                 prepare_arabic_text("نسبة الضريبة على الأرباح (%)"),
                 0.0,
@@ -403,10 +492,20 @@ def main():
                 max_value=max_holding_days,
                 step=1,
             )
+            # Prefill the market yield from the curve at the remaining maturity
+            try:
+                curve_yield = by_version(build_yield_curve, data_version)(
+                    data_df, data_version
+                ).yield_for(int(original_tenor_secondary) - early_sale_days_secondary)
+            except (KeyError, ValueError):
+                curve_yield = 30.0
             secondary_market_yield = st.number_input(
                 prepare_arabic_text("العائد السائد في السوق للمشتري (%)"),
                 min_value=1.0,
-                value=30.0,
+                value=round(max(curve_yield, 1.0), 3),
+                help=prepare_arabic_text(
+                    "القيمة المقترحة محسوبة من منحنى العائد الحالي للمدة المتبقية."
+                ),
                 step=0.1,
                 format="%.3f",
             )
@@ -420,13 +519,14 @@ def main():
     secondary_results_placeholder = col_secondary_results.empty()
     if calc_secondary_sale_button:
         try:
-            results = analyze_secondary_sale(
+            results = pricing_cache.secondary_sale(
                 face_value_secondary,
                 original_yield_secondary,
                 original_tenor_secondary,
                 early_sale_days_secondary,
                 secondary_market_yield,
                 tax_rate_secondary,
+                data_version=data_version,
             )
             with secondary_results_placeholder.container(border=True):
                 st.subheader(
@@ -461,6 +561,25 @@ def main():
                             unsafe_allow_html=True,
                         )
 
+                    break_even = solve_break_even_secondary_yield(
+                        face_value_secondary,
+                        original_yield_secondary,
+                        original_tenor_secondary,
+                        tax_rate_secondary,
+                        holding_days=early_sale_days_secondary,
+                    )
+                    if not break_even.get("error"):
+                        break_even_yield = break_even["post_tax_yield"][0]
+                        break_even_text = (
+                            f"{break_even_yield:.3f}%"
+                            if np.isfinite(break_even_yield)
+                            else "-"
+                        )
+                        st.markdown(
+                            f"""<div style="text-align: center; background-color: #212529; padding: 10px; border-radius: 10px; margin-top: 15px;"><p style="font-size: 1rem; color: #adb5bd; margin-bottom: 0px;">{prepare_arabic_text("⚖️ عائد التعادل (أقصى عائد سائد للبيع دون خسارة)")}</p><p style="font-size: 1.9rem; color: #ffc107; font-weight: 600; line-height: 1.2;">{break_even_text}</p><p style="font-size: 0.9rem; color: #adb5bd; margin-top: -5px;">{prepare_arabic_text("البيع بعائد سائد أقل من هذه النسبة يحقق ربحًا")}</p></div>""",
+                            unsafe_allow_html=True,
+                        )
+
                     st.markdown(
                         "<div style='margin-top: 15px;'></div>", unsafe_allow_html=True
                     )
@@ -476,6 +595,45 @@ def main():
                                 ),
                                 icon="ℹ️",
                             )
+
+                    with st.expander(prepare_arabic_text("🗺️ خريطة قرار البيع")):
+                        yield_grid = np.round(
+                            np.arange(
+                                max(1.0, secondary_market_yield - 5.0),
+                                secondary_market_yield + 5.0 + 1e-9,
+                                0.25,
+                            ),
+                            3,
+                        )
+                        surface = analyze_secondary_sale_surface(
+                            face_value_secondary,
+                            original_yield_secondary,
+                            original_tenor_secondary,
+                            yield_grid,
+                            tax_rate_secondary,
+                        )
+                        if surface.get("error"):
+                            st.error(prepare_arabic_text(surface["error"]))
+                        else:
+                            heatmap = px.imshow(
+                                surface["net_profit"],
+                                x=surface["secondary_yields"],
+                                y=surface["holding_days"],
+                                origin="lower",
+                                aspect="auto",
+                                color_continuous_scale="RdYlGn",
+                                color_continuous_midpoint=0,
+                                labels={
+                                    "x": prepare_arabic_text("العائد السائد (%)"),
+                                    "y": prepare_arabic_text("أيام الاحتفاظ"),
+                                    "color": prepare_arabic_text("صافي الربح"),
+                                },
+                                title=prepare_arabic_text(
+                                    "صافي الربح / الخسارة لكل يوم بيع وعائد سائد"
+                                ),
+                            )
+                            heatmap.update_layout(title_x=0.5, template="plotly_dark")
+                            st.plotly_chart(heatmap, use_container_width=True)
         except Exception as e:
             with secondary_results_placeholder.container(border=True):
                 st.error(
@@ -492,42 +650,134 @@ def main():
     st.divider()
     st.header(prepare_arabic_text("📈 تطور العائد تاريخيًا"))
 
-    if not historical_df.empty:
-        available_tenors = sorted(historical_df[C.TENOR_COLUMN_NAME].unique())
-        selected_tenors = st.multiselect(
-            label=prepare_arabic_text("اختر الآجال التي تريد عرضها:"),
-            options=available_tenors,
-            default=available_tenors,
-            label_visibility="collapsed",
-        )
+    available_tenors = db_manager.load_available_tenors(data_version)
+    if available_tenors:
+        chart_periods = {
+            prepare_arabic_text("آخر شهر"): 30,
+            prepare_arabic_text("آخر 3 أشهر"): 91,
+            prepare_arabic_text("آخر سنة"): 365,
+            prepare_arabic_text("كل الفترات"): None,
+        }
+        tenors_col, period_col = st.columns([3, 1])
+        with tenors_col:
+            selected_tenors = st.multiselect(
+                label=prepare_arabic_text("اختر الآجال التي تريد عرضها:"),
+                options=available_tenors,
+                default=available_tenors,
+                label_visibility="collapsed",
+            )
+        with period_col:
+            selected_period = st.selectbox(
+                prepare_arabic_text("الفترة"),
+                list(chart_periods),
+                index=len(chart_periods) - 1,
+                label_visibility="collapsed",
+            )
 
         if selected_tenors:
-            chart_df = historical_df[
-                historical_df[C.TENOR_COLUMN_NAME].isin(selected_tenors)
-            ]
-
-            fig = px.line(
-                chart_df,
-                x=C.DATE_COLUMN_NAME,
-                y=C.YIELD_COLUMN_NAME,
-                color=C.TENOR_COLUMN_NAME,
-                markers=True,
-                labels={
-                    C.DATE_COLUMN_NAME: prepare_arabic_text("تاريخ التحديث"),
-                    C.YIELD_COLUMN_NAME: prepare_arabic_text("نسبة العائد (%)"),
-                    C.TENOR_COLUMN_NAME: prepare_arabic_text("الأجل (يوم)"),
-                },
-                title=prepare_arabic_text(
-                    "التغير في متوسط العائد المرجح لأذون الخزانة"
-                ),
+            # Tenor and date filtering happen in SQL on the covering index
+            period_days = chart_periods[selected_period]
+            start_date = (
+                datetime.now(pytz.timezone(C.TIMEZONE)).date()
+                - timedelta(days=period_days)
+                if period_days
+                else None
             )
-            fig.update_layout(
-                legend_title_text=prepare_arabic_text("الأجل"),
-                title_x=0.5,
-                template="plotly_dark",
-                xaxis=dict(tickformat="%d-%m-%Y"),
+            chart_df = db_manager.load_history_range(
+                tuple(int(t) for t in selected_tenors),
+                start_date,
+                data_version=data_version,
             )
-            st.plotly_chart(fig, use_container_width=True)
+            if chart_df.empty:
+                st.info(prepare_arabic_text("لا توجد بيانات مسجلة في الفترة المحددة."))
+            else:
+                fig = px.line(
+                    chart_df,
+                    x=C.DATE_COLUMN_NAME,
+                    y=C.YIELD_COLUMN_NAME,
+                    color=C.TENOR_COLUMN_NAME,
+                    markers=True,
+                    labels={
+                        C.DATE_COLUMN_NAME: prepare_arabic_text("تاريخ التحديث"),
+                        C.YIELD_COLUMN_NAME: prepare_arabic_text("نسبة العائد (%)"),
+                        C.TENOR_COLUMN_NAME: prepare_arabic_text("الأجل (يوم)"),
+                    },
+                    title=prepare_arabic_text(
+                        "التغير في متوسط العائد المرجح لأذون الخزانة"
+                    ),
+                )
+                fig.update_layout(
+                    legend_title_text=prepare_arabic_text("الأجل"),
+                    title_x=0.5,
+                    template="plotly_dark",
+                    xaxis=dict(tickformat="%d-%m-%Y"),
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+            with st.expander(prepare_arabic_text("📐 مؤشرات مجمعة")):
+                # Read from the aggregates maintained by save_data; nothing is recomputed here
+                ma_tab, spread_tab = st.tabs(
+                    [
+                        prepare_arabic_text(
+                            f"متوسط آخر {C.MOVING_AVERAGE_AUCTIONS} عطاءات"
+                        ),
+                        prepare_arabic_text(
+                            f"الفارق بين أجل {C.SPREAD_LONG_TENOR} و{C.SPREAD_SHORT_TENOR} يوم"
+                        ),
+                    ]
+                )
+                with ma_tab:
+                    ma_df = db_manager.load_moving_averages(data_version)
+                    if not ma_df.empty:
+                        ma_df = ma_df[ma_df[C.TENOR_COLUMN_NAME].isin(selected_tenors)]
+                    if ma_df.empty:
+                        st.info(prepare_arabic_text("لا توجد عطاءات كافية."))
+                    else:
+                        ma_fig = px.line(
+                            ma_df,
+                            x=C.SESSION_DATE_COLUMN_NAME,
+                            y=C.MOVING_AVERAGE_COLUMN_NAME,
+                            color=C.TENOR_COLUMN_NAME,
+                            labels={
+                                C.SESSION_DATE_COLUMN_NAME: prepare_arabic_text(
+                                    "تاريخ الجلسة"
+                                ),
+                                C.MOVING_AVERAGE_COLUMN_NAME: prepare_arabic_text(
+                                    "المتوسط المتحرك (%)"
+                                ),
+                                C.TENOR_COLUMN_NAME: prepare_arabic_text("الأجل"),
+                            },
+                        )
+                        ma_fig.update_layout(
+                            template="plotly_dark",
+                            xaxis=dict(tickformat="%d-%m-%Y"),
+                        )
+                        st.plotly_chart(ma_fig, use_container_width=True)
+                with spread_tab:
+                    spreads_df = db_manager.load_weekly_spreads(data_version)
+                    if spreads_df.empty:
+                        st.info(
+                            prepare_arabic_text(
+                                "لا توجد أسابيع تحتوي على عطاءات للأجلين معًا."
+                            )
+                        )
+                    else:
+                        spread_fig = px.bar(
+                            spreads_df,
+                            x=C.WEEK_START_COLUMN_NAME,
+                            y="spread",
+                            labels={
+                                C.WEEK_START_COLUMN_NAME: prepare_arabic_text(
+                                    "بداية الأسبوع"
+                                ),
+                                "spread": prepare_arabic_text("الفارق (نقطة مئوية)"),
+                            },
+                        )
+                        spread_fig.update_layout(
+                            template="plotly_dark",
+                            xaxis=dict(tickformat="%d-%m-%Y"),
+                        )
+                        st.plotly_chart(spread_fig, use_container_width=True)
         else:
             st.info(
                 prepare_arabic_text(
@@ -563,6 +813,7 @@ def main():
         1.  **حساب سعر شرائك الأصلي:** بنفس طريقة الحاسبة الأساسية.
         2.  **حساب سعر البيع اليوم:** `الأيام المتبقية = الأجل الأصلي - أيام الاحتفاظ`، `سعر البيع = القيمة الإسمية ÷ (1 + (العائد السائد اليوم ÷ 100) × (الأيام المتبقية ÷ 365))`
         3.  **النتيجة النهائية:** `الربح أو الخسارة = سعر البيع - سعر الشراء الأصلي`. يتم حساب الضريبة على هذا الربح إذا كان موجباً.
+        4.  **عائد التعادل:** `عائد التعادل = (القيمة الإسمية ÷ سعر الشراء الأصلي - 1) × (365 ÷ الأيام المتبقية) × 100`، وهو أعلى عائد سائد يمكنك البيع عنده دون خسارة.
         """
             )
         )
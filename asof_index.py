@@ -0,0 +1,115 @@
+# asof_index.py (فهرس "حتى تاريخ": عائد أي أجل السائد في أي تاريخ شراء)
+"""
+As-of lookup of auction yields.
+
+Given a tenor and a purchase date, `AsOfYieldIndex` returns the yield of the
+most recent auction of that tenor held on or before the date: the yield a
+bill bought that day was priced at. The history is kept as one array of
+(tenor, session day) keys sorted once, so a query (or a whole array of
+queries, e.g. a bulk portfolio import) is a single binary search.
+"""
+import logging
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import constants as C
+from calculations import ArrayLike
+from portfolio import DateLike, to_epoch_days
+
+logger = logging.getLogger(__name__)
+
+# Keys are tenor * 2**32 + session day, so one sort orders by (tenor, day)
+_TENOR_SHIFT = np.int64(1) << 32
+
+
+class AsOfYieldIndex:
+    """Sorted (tenor, session day) keys with the auction yield of each."""
+
+    def __init__(self, tenors: ArrayLike, session_days: ArrayLike, yields: ArrayLike):
+        tenors = np.asarray(tenors, dtype=np.int64)
+        session_days = np.asarray(session_days, dtype=np.int64)
+        yields = np.asarray(yields, dtype=float)
+        valid = np.isfinite(yields) & (tenors > 0)
+
+        keys = tenors[valid] * _TENOR_SHIFT + session_days[valid]
+        # One entry per auction; a repeated key keeps its last yield
+        order = np.argsort(keys, kind="stable")
+        keys, yields = keys[order], yields[valid][order]
+        last = np.append(keys[1:] != keys[:-1], True)
+        self._keys = keys[last]
+        self._yields = yields[last]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @classmethod
+    def from_history(cls, history: Union[pd.DataFrame, np.ndarray]) -> "AsOfYieldIndex":
+        """
+        Builds the index from the auction history.
+
+        Args:
+            history: The DataFrame of `load_all_historical_data` or the
+                structured array of `load_history_snapshot`.
+        """
+        if isinstance(history, np.ndarray):
+            return cls(
+                history[C.TENOR_COLUMN_NAME],
+                history[C.SESSION_DATE_COLUMN_NAME],
+                history[C.YIELD_COLUMN_NAME],
+            )
+        if history.empty:
+            return cls([], [], [])
+        return cls(
+            pd.to_numeric(history[C.TENOR_COLUMN_NAME], errors="coerce")
+            .fillna(0)
+            .to_numpy(),
+            to_epoch_days(history[C.SESSION_DATE_COLUMN_NAME]),
+            pd.to_numeric(history[C.YIELD_COLUMN_NAME], errors="coerce").to_numpy(),
+        )
+
+    def lookup(
+        self,
+        tenors: Union[int, ArrayLike],
+        purchase_dates: Union[DateLike, ArrayLike],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the auction in effect for many (tenor, purchase date) pairs at once.
+
+        Scalars are broadcast against arrays.
+
+        Returns:
+            The yields and the session days (since 1970-01-01) of the matched
+            auctions; NaN and -1 where the tenor has no auction on or before
+            the date.
+        """
+        tenors, days = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(tenors, dtype=np.int64)),
+            to_epoch_days(purchase_dates),
+        )
+        queries = tenors * _TENOR_SHIFT + days
+        position = np.searchsorted(self._keys, queries, side="right") - 1
+        # The preceding key may belong to a smaller tenor: then there is no match
+        found = position >= 0
+        found[found] = self._keys[position[found]] // _TENOR_SHIFT == tenors[found]
+
+        matched = position[found]
+        yields = np.full(len(queries), np.nan)
+        session_days = np.full(len(queries), -1, dtype=np.int64)
+        yields[found] = self._yields[matched]
+        session_days[found] = self._keys[matched] % _TENOR_SHIFT
+        return yields, session_days
+
+    def yields_on(
+        self,
+        tenors: Union[int, ArrayLike],
+        purchase_dates: Union[DateLike, ArrayLike],
+    ) -> np.ndarray:
+        """Returns the yield in effect for every (tenor, purchase date) pair (NaN if none)."""
+        return self.lookup(tenors, purchase_dates)[0]
+
+    def yield_on(self, tenor: int, purchase_date: DateLike) -> Optional[float]:
+        """Returns the yield in effect for one tenor on one date, or None."""
+        value = self.yields_on(tenor, purchase_date)[0]
+        return None if np.isnan(value) else float(value)
@@ -0,0 +1,165 @@
+# backfill.py (استيراد الأرشيف التاريخي لنتائج العطاءات دفعة واحدة)
+"""
+Bulk backfill of archived CBE auction results.
+
+Streams a directory (or a list of files) of archived result pages (`.html`,
+`.htm`) and CSV exports (`.csv`) through `parse_cbe_html` or a CSV reader,
+and hands them to `DatabaseManager.bulk_import`, which deduplicates against
+the stored auctions and writes in large batched transactions.
+
+Usage:
+    python backfill.py archive/ --db cbe_historical_data.db
+"""
+import argparse
+import logging
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+import constants as C
+from cbe_scraper import parse_cbe_html
+from db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+HTML_EXTENSIONS = (".html", ".htm")
+CSV_EXTENSIONS = (".csv",)
+
+
+def find_archive_files(paths: Iterable[str]) -> List[str]:
+    """Expands files and directories (recursively) into a sorted list of archive files."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, name) for name in files)
+        else:
+            found.append(path)
+    return sorted(
+        f for f in found if f.lower().endswith(HTML_EXTENSIONS + CSV_EXTENSIONS)
+    )
+
+
+def read_archived_page(path: str) -> Optional[pd.DataFrame]:
+    """
+    Parses one archived results page.
+
+    The page was not scraped live, so every auction is recorded as first
+    seen on its own session date (the day its results were published).
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        df = parse_cbe_html(f.read())
+    if df is None:
+        return None
+    df[C.DATE_COLUMN_NAME] = df[C.SESSION_DATE_COLUMN_NAME]
+    return df
+
+
+def read_csv_export(path: str) -> Optional[pd.DataFrame]:
+    """
+    Reads one CSV export with tenor, yield and session_date columns.
+
+    Session dates may be 'DD/MM/YYYY' (as published) or ISO dates. A missing
+    scrape_date column defaults to the session date.
+    """
+    df = pd.read_csv(path)
+    required = [C.TENOR_COLUMN_NAME, C.YIELD_COLUMN_NAME, C.SESSION_DATE_COLUMN_NAME]
+    missing = [col for col in required if col not in df.columns]
+    if missing:
+        logger.error(f"Skipping '{path}': missing column(s) {missing}.")
+        return None
+
+    df[C.SESSION_DATE_COLUMN_NAME] = pd.to_datetime(
+        df[C.SESSION_DATE_COLUMN_NAME], format="mixed", dayfirst=True
+    )
+    if C.DATE_COLUMN_NAME in df.columns:
+        df[C.DATE_COLUMN_NAME] = pd.to_datetime(df[C.DATE_COLUMN_NAME])
+    else:
+        df[C.DATE_COLUMN_NAME] = df[C.SESSION_DATE_COLUMN_NAME]
+    return df.dropna(subset=required)
+
+
+def iter_archive_frames(
+    files: Iterable[str], stats: Dict[str, int]
+) -> Iterator[pd.DataFrame]:
+    """Yields one DataFrame per readable file, counting files and rows in `stats`."""
+    for path in files:
+        try:
+            if path.lower().endswith(CSV_EXTENSIONS):
+                df = read_csv_export(path)
+            else:
+                df = read_archived_page(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Skipping '{path}': {e}")
+            df = None
+        if df is None or df.empty:
+            stats["failed_files"] += 1
+            continue
+        stats["files"] += 1
+        stats["rows"] += len(df)
+        yield df
+
+
+def run_backfill(
+    paths: Iterable[str],
+    db_filename: str = C.DB_FILENAME,
+    batch_rows: int = C.BACKFILL_BATCH_ROWS,
+) -> Dict[str, float]:
+    """
+    Imports every archive file under `paths` into the database.
+
+    Returns:
+        The import counts, the number of files read and failed, the elapsed
+        time and the throughput (`rows_per_sec`).
+    """
+    files = find_archive_files(paths)
+    logger.info(f"Backfilling {len(files)} archive file(s) into '{db_filename}'.")
+    stats = {"files": 0, "failed_files": 0, "rows": 0}
+
+    db_manager = DatabaseManager(db_filename)
+    start_time = time.perf_counter()
+    try:
+        counts = db_manager.bulk_import(iter_archive_frames(files, stats), batch_rows)
+    finally:
+        db_manager.close()
+    elapsed = time.perf_counter() - start_time
+
+    result: Dict[str, float] = {**counts, **stats}
+    result["elapsed_seconds"] = elapsed
+    result["rows_per_sec"] = stats["rows"] / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Backfill finished: {stats['rows']} rows from {stats['files']} file(s) in "
+        f"{elapsed:.2f}s ({result['rows_per_sec']:,.0f} rows/sec)."
+    )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import archived CBE result pages and CSV exports."
+    )
+    parser.add_argument("paths", nargs="+", help="Archive files or directories.")
+    parser.add_argument("--db", default=C.DB_FILENAME, help="SQLite database file.")
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=C.BACKFILL_BATCH_ROWS,
+        help="Rows written per transaction.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    result = run_backfill(args.paths, args.db, args.batch_rows)
+    print(
+        f"{result['inserted']} inserted, {result['updated']} updated, "
+        f"{result['skipped']} skipped from {result['files']} file(s) "
+        f"({result['failed_files']} unreadable)."
+    )
+    print(
+        f"{result['rows']} rows in {result['elapsed_seconds']:.2f}s "
+        f"-> {result['rows_per_sec']:,.0f} rows/sec"
+    )
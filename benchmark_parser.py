@@ -0,0 +1,230 @@
+# benchmark_parser.py (مقارنة سرعة محلل صفحة البنك المركزي الجديد بالقديم)
+"""
+Benchmark of `parse_cbe_html` (lxml/XPath) against `parse_cbe_html_legacy`
+(BeautifulSoup + `pd.read_html`).
+
+Runs both parsers on saved result pages and on generated multi-section
+pages, checks that they return identical DataFrames and prints the time per
+parse and the speed-up.
+
+Usage:
+    python benchmark_parser.py                    # generated pages only
+    python benchmark_parser.py saved_pages/*.html --sections 10 200 --repeat 5
+"""
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+from io import StringIO
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import constants as C
+from cbe_scraper import _finalize_sections, parse_cbe_html
+
+logger = logging.getLogger(__name__)
+
+TENOR_PAIRS = ((91, 273), (182, 364))
+
+
+def parse_cbe_html_legacy(page_source: str) -> Optional[pd.DataFrame]:
+    """
+    The original BeautifulSoup + `pd.read_html` parser.
+
+    Kept here, out of the scraper, as the reference `parse_cbe_html` is
+    tested and benchmarked against.
+    """
+    logger.info("Starting to parse HTML content...")
+    soup = BeautifulSoup(page_source, "lxml")
+
+    results_headers = soup.find_all(
+        lambda tag: tag.name == "h2" and "النتائج" in tag.get_text()
+    )
+
+    if not results_headers:
+        logger.error("Parse Error: Could not find any 'النتائج' (Results) headers.")
+        return None
+
+    all_dataframes: List[pd.DataFrame] = []
+
+    for header in results_headers:
+        results_table = header.find_next("table")
+        if not results_table:
+            logger.warning(
+                "Found a 'Results' header but no subsequent table. Skipping."
+            )
+            continue
+
+        try:
+            results_df = pd.read_html(StringIO(str(results_table)))[0]
+            tenors = (
+                pd.to_numeric(results_df.columns[1:], errors="coerce")
+                .dropna()
+                .astype(int)
+                .tolist()
+            )
+            if not tenors:
+                continue
+
+            session_date_row = results_df[results_df.iloc[:, 0] == "تاريخ الجلسة"]
+            if session_date_row.empty:
+                continue
+            session_dates = session_date_row.iloc[0, 1 : len(tenors) + 1].tolist()
+
+            accepted_bids_header = header.find_next(
+                lambda tag: tag.name in ["p", "strong"]
+                and C.ACCEPTED_BIDS_KEYWORD in tag.get_text()
+            )
+            if not accepted_bids_header:
+                continue
+            accepted_bids_table = accepted_bids_header.find_next("table")
+            if not accepted_bids_table:
+                continue
+
+            accepted_df = pd.read_html(StringIO(str(accepted_bids_table)))[0]
+            yield_row = accepted_df[
+                accepted_df.iloc[:, 0].str.contains(C.YIELD_ANCHOR_TEXT, na=False)
+            ]
+            if yield_row.empty:
+                continue
+
+            yields = (
+                pd.to_numeric(yield_row.iloc[0, 1 : len(tenors) + 1], errors="coerce")
+                .dropna()
+                .astype(float)
+                .tolist()
+            )
+
+            if len(tenors) == len(yields) == len(session_dates):
+                section_df = pd.DataFrame(
+                    {
+                        C.TENOR_COLUMN_NAME: tenors,
+                        C.YIELD_COLUMN_NAME: yields,
+                        C.SESSION_DATE_COLUMN_NAME: session_dates,
+                    }
+                )
+                all_dataframes.append(section_df)
+                logger.info(f"Successfully parsed data for tenors: {tenors}")
+
+        except Exception as e:
+            logger.error(f"Error processing a section: {e}", exc_info=True)
+            continue
+
+    if not all_dataframes:
+        return _finalize_sections(None)
+    return _finalize_sections(pd.concat(all_dataframes, ignore_index=True))
+
+
+def build_results_page(sections: int, filler_paragraphs: int = 20) -> str:
+    """
+    Builds a results page shaped like the CBE one, with `sections` auction
+    sections and unrelated navigation, paragraphs and tables in between.
+    """
+    parts = ["<html><head><title>الأذون</title></head><body>"]
+    parts.append(
+        "<nav><ul>"
+        + "".join(f"<li><a href='#'>رابط {i}</a></li>" for i in range(50))
+        + "</ul></nav>"
+    )
+    session = date(2025, 7, 6)
+    for i in range(sections):
+        tenors = TENOR_PAIRS[i % 2]
+        session_text = session.strftime("%d/%m/%Y")
+        session -= timedelta(days=3 + i % 2)
+        parts.extend(
+            f"<p>فقرة توضيحية رقم {j} عن <strong>العطاء</strong> والسوق.</p>"
+            for j in range(filler_paragraphs)
+        )
+        parts.append("<h2>النتائج</h2>")
+        parts.append(
+            "<table><thead><tr><th>البيان</th>"
+            + "".join(f"<th>{t}</th>" for t in tenors)
+            + "</tr></thead><tbody>"
+            + "<tr><td>تاريخ الجلسة</td>"
+            + f"<td>{session_text}</td>" * len(tenors)
+            + "</tr><tr><td>المبلغ المطلوب</td>"
+            + "".join(f"<td>{1000 + 37 * i:,}.5</td>" for _ in tenors)
+            + "</tr></tbody></table>"
+        )
+        parts.append("<p><strong>تفاصيل العروض المقبولة</strong></p>")
+        yields = [25 + ((i * 7 + k) % 300) / 100 for k in range(len(tenors))]
+        parts.append(
+            "<table><tbody>"
+            + "<tr><td>أقل عائد</td>"
+            + "".join(f"<td>{y - 1:.3f}</td>" for y in yields)
+            + "</tr><tr><td>أعلى عائد</td>"
+            + "".join(f"<td>{y + 1:.3f}</td>" for y in yields)
+            + "</tr><tr><td>متوسط العائد المرجح</td>"
+            + "".join(f"<td>{y:.3f}</td>" for y in yields)
+            + "</tr></tbody></table>"
+        )
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def time_parser(
+    parser: Callable[[str], Optional[pd.DataFrame]], page: str, repeat: int
+) -> Tuple[float, Optional[pd.DataFrame]]:
+    """Returns the best time of `repeat` parses, and the parsed frame."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = parser(page)
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+
+def run_benchmark(pages: List[Tuple[str, str]], repeat: int) -> List[dict]:
+    """Benchmarks both parsers on (name, html) pages and checks their results match."""
+    rows = []
+    for name, page in pages:
+        legacy_seconds, legacy_df = time_parser(parse_cbe_html_legacy, page, repeat)
+        lxml_seconds, lxml_df = time_parser(parse_cbe_html, page, repeat)
+        if legacy_df is None or lxml_df is None:
+            identical = legacy_df is None and lxml_df is None
+        else:
+            identical = legacy_df.equals(lxml_df)
+        rows.append(
+            {
+                "page": name,
+                "kib": len(page.encode("utf-8")) / 1024,
+                "rows": 0 if lxml_df is None else len(lxml_df),
+                "legacy_ms": legacy_seconds * 1000,
+                "lxml_ms": lxml_seconds * 1000,
+                "speedup": legacy_seconds / lxml_seconds,
+                "identical": identical,
+            }
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the CBE page parsers.")
+    parser.add_argument("pages", nargs="*", help="Saved result pages (.html).")
+    parser.add_argument(
+        "--sections",
+        type=int,
+        nargs="+",
+        default=[2, 50, 500],
+        help="Sizes of the generated multi-section pages.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The parsers log every section; keep the benchmark output readable
+    logging.basicConfig(level=logging.CRITICAL)
+    pages = []
+    for path in args.pages:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((path, f.read()))
+    pages.extend(
+        (f"generated, {n} sections", build_results_page(n)) for n in args.sections
+    )
+
+    results = run_benchmark(pages, args.repeat)
+    print(pd.DataFrame(results).to_string(index=False, float_format="{:,.2f}".format))
+    if not all(row["identical"] for row in results):
+        raise SystemExit("The parsers returned different results.")
@@ -1,8 +1,30 @@
 # calculations.py (النسخة المحسنة مع validation أفضل)
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Union
+
+import numpy as np
+import pandas as pd
 
 import constants as C
 
+ArrayLike = Union[float, int, np.ndarray, pd.Series, list]
+
+# --- Shared validation messages (used by the scalar and batch APIs) ---
+POSITIVE_PRIMARY_INPUTS_ERROR = "القيمة الإسمية، العائد، والمدة يجب أن تكون أرقامًا موجبة."
+TAX_RATE_RANGE_ERROR = "نسبة الضريبة يجب أن تكون بين 0 و 100."
+POSITIVE_SECONDARY_INPUTS_ERROR = "جميع المدخلات الرقمية يجب أن تكون أرقامًا موجبة."
+HOLDING_DAYS_RANGE_ERROR = (
+    "أيام الاحتفاظ يجب أن تكون أكبر من صفر وأقل من أجل الإذن الأصلي."
+)
+
+PRIMARY_RESULT_COLUMNS = [
+    "purchase_price",
+    "gross_return",
+    "tax_amount",
+    "net_return",
+    "total_payout",
+    "real_profit_percentage",
+]
+
 
 def calculate_primary_yield(
     face_value: float, yield_rate: float, tenor: int, tax_rate: float
@@ -21,9 +43,9 @@ def calculate_primary_yield(
     """
     # --- IMPROVED VALIDATION ---
     if face_value <= 0 or yield_rate <= 0 or tenor <= 0:
-        return {"error": "القيمة الإسمية، العائد، والمدة يجب أن تكون أرقامًا موجبة."}
+        return {"error": POSITIVE_PRIMARY_INPUTS_ERROR}
     if not 0 <= tax_rate <= 100:
-        return {"error": "نسبة الضريبة يجب أن تكون بين 0 و 100."}
+        return {"error": TAX_RATE_RANGE_ERROR}
 
     # This calculation reflects the discount instrument nature of T-bills
     purchase_price = face_value / (1 + (yield_rate / 100.0 * tenor / C.DAYS_IN_YEAR))
@@ -48,6 +70,110 @@ def calculate_primary_yield(
     }
 
 
+def validate_primary_inputs_batch(
+    face_value: ArrayLike,
+    yield_rate: ArrayLike,
+    tenor: ArrayLike,
+    tax_rate: ArrayLike,
+) -> np.ndarray:
+    """
+    Vectorized version of the validation done in `calculate_primary_yield`.
+
+    Args:
+        face_value, yield_rate, tenor, tax_rate: Scalars or arrays that
+            broadcast against each other.
+
+    Returns:
+        An object array holding the error message for each invalid row and
+        None for every valid one (`errors != None` is the per-row error mask).
+    """
+    face_value, yield_rate, tenor, tax_rate = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (face_value, yield_rate, tenor, tax_rate))
+    )
+    # Same checks, in the same order, as the scalar function
+    non_positive = (face_value <= 0) | (yield_rate <= 0) | (tenor <= 0)
+    bad_tax = ~((0 <= tax_rate) & (tax_rate <= 100))
+
+    errors = np.full(face_value.shape, None, dtype=object)
+    errors[bad_tax] = TAX_RATE_RANGE_ERROR
+    errors[non_positive] = POSITIVE_PRIMARY_INPUTS_ERROR
+    return errors
+
+
+def calculate_primary_yield_batch(
+    face_value: Union[ArrayLike, pd.DataFrame],
+    yield_rate: Optional[ArrayLike] = None,
+    tenor: Optional[ArrayLike] = None,
+    tax_rate: Optional[ArrayLike] = None,
+) -> pd.DataFrame:
+    """
+    Columnar version of `calculate_primary_yield` for pricing many holdings at once.
+
+    Args:
+        face_value: An array of face values, or a DataFrame with the columns
+            `face_value`, `yield_rate`, `tenor` and `tax_rate` (in which case the
+            other arguments must be omitted).
+        yield_rate: Annualized yield rates (e.g., 27.5).
+        tenor: Terms in days.
+        tax_rate: Tax rates on profits (e.g., 20.0).
+
+    Returns:
+        A DataFrame with one row per input row, the columns in
+        `PRIMARY_RESULT_COLUMNS` and an `error` column. Invalid rows carry the
+        same error message as the scalar function and NaN results.
+    """
+    index = None
+    if isinstance(face_value, pd.DataFrame):
+        frame = face_value
+        index = frame.index
+        face_value, yield_rate, tenor, tax_rate = (
+            frame["face_value"],
+            frame["yield_rate"],
+            frame["tenor"],
+            frame["tax_rate"],
+        )
+    elif yield_rate is None or tenor is None or tax_rate is None:
+        raise ValueError(
+            "yield_rate, tenor and tax_rate are required unless a DataFrame is given."
+        )
+
+    face_value, yield_rate, tenor, tax_rate = (
+        np.atleast_1d(np.asarray(x, dtype=float))
+        for x in (face_value, yield_rate, tenor, tax_rate)
+    )
+    face_value, yield_rate, tenor, tax_rate = np.broadcast_arrays(
+        face_value, yield_rate, tenor, tax_rate
+    )
+
+    errors = validate_primary_inputs_batch(face_value, yield_rate, tenor, tax_rate)
+    valid = np.equal(errors, None)
+
+    # Same operation order as the scalar function so the results match bit for bit
+    with np.errstate(divide="ignore", invalid="ignore"):
+        purchase_price = face_value / (1 + (yield_rate / 100.0 * tenor / C.DAYS_IN_YEAR))
+        gross_return = face_value - purchase_price
+        tax_amount = gross_return * (tax_rate / 100.0)
+        net_return = gross_return - tax_amount
+        real_profit_percentage = np.where(
+            purchase_price > 0, (net_return / purchase_price) * 100, 0.0
+        )
+
+    columns = {
+        "purchase_price": purchase_price,
+        "gross_return": gross_return,
+        "tax_amount": tax_amount,
+        "net_return": net_return,
+        "total_payout": face_value,
+        "real_profit_percentage": real_profit_percentage,
+    }
+    results = pd.DataFrame(
+        {name: np.where(valid, values, np.nan) for name, values in columns.items()},
+        index=index,
+    )
+    results["error"] = pd.Series(errors, index=results.index, dtype=object)
+    return results
+
+
 def analyze_secondary_sale(
     face_value: float,
     original_yield: float,
@@ -77,15 +203,13 @@ def analyze_secondary_sale(
         or original_tenor <= 0
         or secondary_yield <= 0
     ):
-        return {"error": "جميع المدخلات الرقمية يجب أن تكون أرقامًا موجبة."}
+        return {"error": POSITIVE_SECONDARY_INPUTS_ERROR}
 
     if not 0 <= tax_rate <= 100:
-        return {"error": "نسبة الضريبة يجب أن تكون بين 0 و 100."}
+        return {"error": TAX_RATE_RANGE_ERROR}
 
     if not 1 <= holding_days < original_tenor:
-        return {
-            "error": "أيام الاحتفاظ يجب أن تكون أكبر من صفر وأقل من أجل الإذن الأصلي."
-        }
+        return {"error": HOLDING_DAYS_RANGE_ERROR}
 
     # Price you paid initially
     original_purchase_price = face_value / (
@@ -120,3 +244,147 @@ def analyze_secondary_sale(
         "net_profit": net_profit,
         "period_yield": period_yield,
     }
+
+
+def analyze_secondary_sale_surface(
+    face_value: float,
+    original_yield: float,
+    original_tenor: int,
+    secondary_yields: ArrayLike,
+    tax_rate: float,
+) -> Dict[str, Any]:
+    """
+    Evaluates `analyze_secondary_sale` for every holding day and a grid of market yields.
+
+    The whole (holding day x secondary yield) surface is computed with one
+    broadcasted NumPy expression instead of one scalar call per cell.
+
+    Args:
+        face_value (float): The T-bill's nominal value.
+        original_yield (float): The yield rate at the time of original purchase.
+        original_tenor (int): The original term of the T-bill in days.
+        secondary_yields (ArrayLike): The market yields to evaluate (columns).
+        tax_rate (float): The tax rate on profits.
+
+    Returns:
+        A dictionary with the axis labels (`holding_days` for rows, 1 to
+        tenor-1, and `secondary_yields` for columns), the 2D `net_profit` and
+        `period_yield` arrays, or an error message.
+    """
+    secondary_yields = np.atleast_1d(np.asarray(secondary_yields, dtype=float))
+
+    # --- Same validation as the scalar function ---
+    if (
+        face_value <= 0
+        or original_yield <= 0
+        or original_tenor <= 0
+        or secondary_yields.size == 0
+        or not (secondary_yields > 0).all()
+    ):
+        return {"error": POSITIVE_SECONDARY_INPUTS_ERROR}
+
+    if not 0 <= tax_rate <= 100:
+        return {"error": TAX_RATE_RANGE_ERROR}
+
+    if original_tenor < 2:
+        return {"error": HOLDING_DAYS_RANGE_ERROR}
+
+    original_purchase_price = face_value / (
+        1 + (original_yield / 100.0 * original_tenor / C.DAYS_IN_YEAR)
+    )
+
+    holding_days = np.arange(1, int(original_tenor))
+    remaining_days = (original_tenor - holding_days)[:, np.newaxis]
+
+    # Rows are holding days, columns are secondary yields
+    sale_price = face_value / (
+        1 + ((secondary_yields / 100.0)[np.newaxis, :] * remaining_days / C.DAYS_IN_YEAR)
+    )
+    gross_profit = sale_price - original_purchase_price
+    tax_amount = np.maximum(0, gross_profit * (tax_rate / 100.0))
+    net_profit = gross_profit - tax_amount
+    period_yield = (net_profit / original_purchase_price) * 100
+
+    return {
+        "error": None,
+        "holding_days": holding_days,
+        "secondary_yields": secondary_yields,
+        "original_purchase_price": original_purchase_price,
+        "net_profit": net_profit,
+        "period_yield": period_yield,
+    }
+
+
+def solve_break_even_secondary_yield(
+    face_value: float,
+    original_yield: float,
+    original_tenor: int,
+    tax_rate: float,
+    holding_days: Optional[ArrayLike] = None,
+    target_net_profit: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Solves for the secondary market yield at which selling on a given day breaks even.
+
+    The sale price is a closed-form function of the market yield, so the yield
+    that produces a required sale price is solved directly (no search):
+    `yield = (face_value / sale_price - 1) * 365 / remaining_days * 100`.
+    Selling at any market yield below the returned value beats the target.
+
+    Args:
+        face_value (float): The T-bill's nominal value.
+        original_yield (float): The yield rate at the time of original purchase.
+        original_tenor (int): The original term of the T-bill in days.
+        tax_rate (float): The tax rate on profits.
+        holding_days (Optional[ArrayLike]): Day(s) of the sale. Defaults to every
+            day from 1 to tenor-1.
+        target_net_profit (float): The profit to break even at (0 by default).
+
+    Returns:
+        A dictionary with `holding_days`, `pre_tax_yield` (gross profit equals the
+        target) and `post_tax_yield` (net profit equals the target), or an error
+        message. Since losses are not taxed, both coincide for a zero target. Days
+        where no positive yield can reach the target are NaN.
+    """
+    if face_value <= 0 or original_yield <= 0 or original_tenor <= 0:
+        return {"error": POSITIVE_SECONDARY_INPUTS_ERROR}
+
+    if not 0 <= tax_rate <= 100:
+        return {"error": TAX_RATE_RANGE_ERROR}
+
+    if holding_days is None:
+        holding_days = np.arange(1, int(original_tenor))
+    holding_days = np.atleast_1d(np.asarray(holding_days))
+    if (
+        holding_days.size == 0
+        or (holding_days < 1).any()
+        or (holding_days >= original_tenor).any()
+    ):
+        return {"error": HOLDING_DAYS_RANGE_ERROR}
+
+    original_purchase_price = face_value / (
+        1 + (original_yield / 100.0 * original_tenor / C.DAYS_IN_YEAR)
+    )
+    remaining_days = original_tenor - holding_days
+
+    # Tax is only on positive profit, so a loss target needs no gross-up
+    pre_tax_gross_profit = target_net_profit
+    if target_net_profit <= 0:
+        post_tax_gross_profit = target_net_profit
+    elif tax_rate < 100:
+        post_tax_gross_profit = target_net_profit / (1 - tax_rate / 100.0)
+    else:
+        post_tax_gross_profit = np.inf
+
+    def _yield_for_gross_profit(gross_profit: float) -> np.ndarray:
+        sale_price = original_purchase_price + gross_profit
+        if not 0 < sale_price < face_value:
+            return np.full(remaining_days.shape, np.nan)
+        return (face_value / sale_price - 1) * C.DAYS_IN_YEAR / remaining_days * 100
+
+    return {
+        "error": None,
+        "holding_days": holding_days,
+        "pre_tax_yield": _yield_for_gross_profit(pre_tax_gross_profit),
+        "post_tax_yield": _yield_for_gross_profit(post_tax_gross_profit),
+    }
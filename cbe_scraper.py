@@ -1,26 +1,112 @@
 # cbe_scraper.py (النسخة النهائية لتعمل على Streamlit Cloud)
 import pandas as pd
-from io import StringIO
 from datetime import datetime
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException, TimeoutException
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+import atexit
+import bisect
+import hashlib
 import logging
+import math
+import re
+import threading
 import time
-from typing import Optional, List
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, List, Tuple
+import requests
+from requests.adapters import HTTPAdapter
 
 # لا حاجة لاستيراد webdriver_manager هنا
 
 import constants as C
 from db_manager import DatabaseManager
+from retry_policy import Deadline, DriverStartupError, RetryPolicy, is_retryable
+from scrape_state import ScrapeState, scrape_state_path
 
 logger = logging.getLogger(__name__)
 
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the process-wide HTTP session.
+
+    The session keeps a pool of keep-alive connections, so repeated fetches
+    (retries, scheduled runs in a long-lived process) reuse the TLS connection
+    instead of opening a new one.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=C.HTTP_POOL_SIZE, pool_maxsize=C.HTTP_POOL_SIZE
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(
+                {"User-Agent": C.USER_AGENT, "Accept-Language": "ar,en;q=0.8"}
+            )
+            _http_session = session
+        return _http_session
+
+
+def get_page_with_http(
+    url: str = C.CBE_DATA_URL,
+    state: Optional[ScrapeState] = None,
+    timeout: float = C.HTTP_TIMEOUT_SECONDS,
+) -> requests.Response:
+    """
+    Sends a GET on the pooled session, conditional on `state`'s validators.
+
+    Returns:
+        The response; status 304 if the page has not changed since `state`
+        was saved.
+
+    Raises:
+        requests.RequestException: If the request failed or the server
+            answered with an error status.
+    """
+    start_time = time.perf_counter()
+    headers = state.conditional_headers(url) if state is not None else {}
+    response = get_http_session().get(url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    if response.status_code == 304:
+        logger.info(
+            f"HTTP 304 Not Modified in {time.perf_counter() - start_time:.2f}s."
+        )
+        return response
+    if response.encoding is None or response.encoding.lower() == "iso-8859-1":
+        # No charset in the headers: trust the content, the page is Arabic
+        response.encoding = response.apparent_encoding
+    logger.info(
+        f"Fetched {len(response.content)} bytes over HTTP in "
+        f"{time.perf_counter() - start_time:.2f}s."
+    )
+    return response
+
+
+def fetch_page_with_http(url: str = C.CBE_DATA_URL) -> Optional[str]:
+    """
+    Fetches a page with a plain HTTP GET on the pooled session.
+
+    Returns:
+        The HTML, or None if the request failed.
+    """
+    try:
+        return get_page_with_http(url).text
+    except requests.RequestException as e:
+        logger.warning(f"HTTP fetch of {url} failed: {e}")
+        return None
+
 
 def setup_driver() -> Optional[webdriver.Chrome]:
     """
@@ -53,145 +139,510 @@ def setup_driver() -> Optional[webdriver.Chrome]:
         return None
 
 
+class DriverManager:
+    """
+    Keeps one warm headless Chrome and lends it to one caller at a time.
+
+    Starting Chrome costs seconds and hundreds of MB, so the browser is kept
+    between page loads (retries, refresh clicks in the app) instead of being
+    quit after each one. Before every loan it is health-checked; it is
+    replaced after `max_uses` loads, or as soon as a caller fails with it.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Optional[webdriver.Chrome]] = setup_driver,
+        max_uses: int = C.DRIVER_MAX_USES,
+    ):
+        self._factory = factory
+        self.max_uses = max(1, max_uses)
+        self._driver: Optional[webdriver.Chrome] = None
+        self._uses = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def driver(self) -> Iterator[webdriver.Chrome]:
+        """
+        Lends the warm driver, starting a new one if needed.
+
+        Raises:
+            DriverStartupError: If a new driver could not be started.
+        """
+        with self._lock:
+            driver = self._acquire()
+            try:
+                yield driver
+            except Exception:
+                self._discard("it failed during use")
+                raise
+            self._uses += 1
+            if self._uses >= self.max_uses:
+                self._discard(f"it served {self._uses} page loads")
+
+    def close(self) -> None:
+        """Quits the warm driver, if there is one."""
+        with self._lock:
+            self._discard("the manager was closed")
+
+    def _acquire(self) -> webdriver.Chrome:
+        if self._driver is not None and not self._is_healthy(self._driver):
+            self._discard("it failed the health check")
+        if self._driver is None:
+            driver = self._factory()
+            if not driver:
+                raise DriverStartupError("Driver setup failed. Aborting this attempt.")
+            self._driver, self._uses = driver, 0
+        else:
+            logger.info(f"Reusing the warm Selenium driver (use {self._uses + 1}).")
+        return self._driver
+
+    @staticmethod
+    def _is_healthy(driver: webdriver.Chrome) -> bool:
+        # Any round trip to the browser proves the session and the process are alive
+        try:
+            driver.execute_script("return 1;")
+            return True
+        except WebDriverException:
+            return False
+
+    def _discard(self, reason: str) -> None:
+        if self._driver is None:
+            return
+        logger.info(f"Closing the Selenium driver because {reason}.")
+        try:
+            self._driver.quit()
+        except WebDriverException as e:
+            logger.warning(f"Error while quitting the Selenium driver: {e}")
+        self._driver, self._uses = None, 0
+
+
+_driver_manager: Optional[DriverManager] = None
+_driver_manager_lock = threading.Lock()
+
+
+def get_driver_manager() -> DriverManager:
+    """Returns the process-wide DriverManager; its browser is quit at exit."""
+    global _driver_manager
+    with _driver_manager_lock:
+        if _driver_manager is None:
+            _driver_manager = DriverManager()
+            atexit.register(_driver_manager.close)
+        return _driver_manager
+
+
+def fetch_page_with_selenium(
+    url: str = C.CBE_DATA_URL,
+    driver_manager: Optional[DriverManager] = None,
+    timeout: float = C.SCRAPER_TIMEOUT_SECONDS,
+) -> str:
+    """
+    Renders a page in the warm headless Chrome and returns its HTML.
+
+    Args:
+        timeout (float): The limit of the page load and the render together.
+
+    Raises:
+        DriverStartupError: If the driver could not be started.
+        TimeoutException: If the page did not load or render in time.
+    """
+    with (driver_manager or get_driver_manager()).driver() as driver:
+        logger.info(f"Navigating to {url}")
+        page_deadline = Deadline(timeout)
+        driver.set_page_load_timeout(timeout)
+        driver.get(url)
+        WebDriverWait(driver, page_deadline.clamp(timeout)).until(
+            EC.presence_of_element_located((By.TAG_NAME, "h2"))
+        )
+        return driver.page_source
+
+
 # --- باقي دوال الملف تبقى كما هي دون تغيير ---
 
 
-def parse_cbe_html(page_source: str) -> Optional[pd.DataFrame]:
-    # (الكود هنا لم يتغير)
-    logger.info("Starting to parse HTML content...")
-    soup = BeautifulSoup(page_source, "lxml")
+RESULTS_HEADER_TEXT = "النتائج"
+SESSION_DATE_ROW_TEXT = "تاريخ الجلسة"
+# Same whitespace folding as pd.read_html, so both parsers see the same cell text
+_WHITESPACE_RE = re.compile(r"[\r\n]+|\s{2,}")
+
+
+def results_hash(page_source: str) -> Optional[str]:
+    """
+    Hashes the results section of a page without parsing it.
+
+    The section runs from the first results header to the end of the last
+    table, with whitespace folded, so navigation, scripts and tokens outside
+    it do not change the hash.
+
+    Returns:
+        A hex digest, or None if the page has no results section.
+    """
+    start = page_source.find(RESULTS_HEADER_TEXT)
+    end = page_source.rfind("</table>")
+    if start < 0 or end < start:
+        return None
+    section = " ".join(page_source[start:end].split())
+    return hashlib.sha256(section.encode("utf-8")).hexdigest()
+
+
+def _cell_text(cell) -> str:
+    return _WHITESPACE_RE.sub(" ", cell.text_content()).strip()
+
+
+def _row_texts(rows) -> List[List[str]]:
+    """Cell texts of <tr> elements, with colspan/rowspan copied like pd.read_html."""
+    texts: List[List[str]] = []
+    carried: List[Tuple[int, str, int]] = []  # (column, text, rows left)
+    for tr in rows:
+        row: List[str] = []
+        next_carried = []
+        for cell in tr.xpath("./td|./th"):
+            while carried and carried[0][0] <= len(row):
+                column, text, left = carried.pop(0)
+                row.append(text)
+                if left > 1:
+                    next_carried.append((column, text, left - 1))
+            text = _cell_text(cell)
+            rowspan = int(cell.get("rowspan") or 1)
+            for _ in range(int(cell.get("colspan") or 1)):
+                if rowspan > 1:
+                    next_carried.append((len(row), text, rowspan - 1))
+                row.append(text)
+        for column, text, left in carried:
+            row.append(text)
+            if left > 1:
+                next_carried.append((column, text, left - 1))
+        texts.append(row)
+        carried = next_carried
+    return texts
+
+
+def _split_table(table) -> Tuple[List[List[str]], List[List[str]]]:
+    """Returns the header rows and the body rows of a table, as pd.read_html splits them."""
+    header_rows = table.xpath(".//thead//tr")
+    body_rows = table.xpath(".//tbody//tr") + table.xpath("./tr")
+    if not header_rows:
+        while body_rows and all(
+            cell.tag == "th" for cell in body_rows[0].xpath("./td|./th")
+        ):
+            header_rows.append(body_rows.pop(0))
+    return _row_texts(header_rows), _row_texts(body_rows)
+
+
+def _to_number(text: str) -> Optional[float]:
+    """Parses a cell as a finite number (None otherwise), like pd.to_numeric."""
+    text = text.replace(",", "")
+    if "_" in text:  # float() accepts digit separators, pandas does not
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+SectionRows = Tuple[List[int], List[float], List[str]]
+
 
-    results_headers = soup.find_all(
-        lambda tag: tag.name == "h2" and "النتائج" in tag.get_text()
+def _parse_section(results_table, accepted_table) -> Optional[SectionRows]:
+    """Extracts the tenors, yields and session dates of one results section."""
+    header, body = _split_table(results_table)
+    if not header:
+        return None
+    tenors = [
+        int(value) for value in map(_to_number, header[-1][1:]) if value is not None
+    ]
+    if not tenors:
+        return None
+
+    session_row = next(
+        (row for row in body if row and row[0] == SESSION_DATE_ROW_TEXT), None
     )
+    if session_row is None:
+        return None
+    session_dates = session_row[1 : len(tenors) + 1]
 
-    if not results_headers:
-        logger.error("Parse Error: Could not find any 'النتائج' (Results) headers.")
+    _, accepted_body = _split_table(accepted_table)
+    yield_row = next(
+        (row for row in accepted_body if row and C.YIELD_ANCHOR_TEXT in row[0]), None
+    )
+    if yield_row is None:
         return None
+    yields = [
+        value
+        for value in map(_to_number, yield_row[1 : len(tenors) + 1])
+        if value is not None
+    ]
 
-    all_dataframes: List[pd.DataFrame] = []
+    if len(tenors) == len(yields) == len(session_dates):
+        logger.info(f"Successfully parsed data for tenors: {tenors}")
+        return tenors, yields, session_dates
+    return None
 
-    for header in results_headers:
-        results_table = header.find_next("table")
-        if not results_table:
+
+def parse_cbe_html(page_source: str) -> Optional[pd.DataFrame]:
+    """
+    Parses the auction results of a CBE page.
+
+    The document is parsed once with lxml and walked once in document order,
+    collecting the results headers, the tables and the accepted-bids markers.
+    Every section then pairs a header with the next results table, the next
+    accepted-bids marker and the table after it, found by binary search over
+    those positions. Table cells are read directly from the tree instead of
+    being re-serialized through `pd.read_html`. The result is identical to
+    the original BeautifulSoup parser (`benchmark_parser.parse_cbe_html_legacy`).
+
+    Returns:
+        The parsed rows, or None if no section could be parsed.
+    """
+    logger.info("Starting to parse HTML content...")
+    try:
+        document = lxml_html.document_fromstring(page_source)
+    except ValueError:
+        # Unicode input with an XML encoding declaration must be given as bytes
+        document = lxml_html.document_fromstring(page_source.encode("utf-8"))
+    except Exception as e:
+        logger.error(f"Parse Error: The page is not valid HTML: {e}")
+        return None
+
+    headers: List[int] = []
+    markers: List[int] = []
+    tables: List[int] = []
+    elements = []
+    for position, element in enumerate(document.iter("h2", "table", "p", "strong")):
+        elements.append(element)
+        if element.tag == "table":
+            tables.append(position)
+        elif element.tag == "h2":
+            if RESULTS_HEADER_TEXT in element.text_content():
+                headers.append(position)
+        elif C.ACCEPTED_BIDS_KEYWORD in element.text_content():
+            markers.append(position)
+
+    if not headers:
+        logger.error("Parse Error: Could not find any 'النتائج' (Results) headers.")
+        return None
+
+    def next_after(positions: List[int], position: int) -> Optional[int]:
+        i = bisect.bisect_right(positions, position)
+        return positions[i] if i < len(positions) else None
+
+    # Rows of every section, turned into a DataFrame once at the end
+    tenors: List[int] = []
+    yields: List[float] = []
+    session_dates: List[str] = []
+    for header in headers:
+        results_table = next_after(tables, header)
+        if results_table is None:
             logger.warning(
                 "Found a 'Results' header but no subsequent table. Skipping."
             )
             continue
-
+        marker = next_after(markers, header)
+        accepted_table = None if marker is None else next_after(tables, marker)
+        if accepted_table is None:
+            continue
         try:
-            results_df = pd.read_html(StringIO(str(results_table)))[0]
-            tenors = (
-                pd.to_numeric(results_df.columns[1:], errors="coerce")
-                .dropna()
-                .astype(int)
-                .tolist()
-            )
-            if not tenors:
-                continue
-
-            session_date_row = results_df[results_df.iloc[:, 0] == "تاريخ الجلسة"]
-            if session_date_row.empty:
-                continue
-            session_dates = session_date_row.iloc[0, 1 : len(tenors) + 1].tolist()
-
-            accepted_bids_header = header.find_next(
-                lambda tag: tag.name in ["p", "strong"]
-                and C.ACCEPTED_BIDS_KEYWORD in tag.get_text()
-            )
-            if not accepted_bids_header:
-                continue
-            accepted_bids_table = accepted_bids_header.find_next("table")
-            if not accepted_bids_table:
-                continue
-
-            accepted_df = pd.read_html(StringIO(str(accepted_bids_table)))[0]
-            yield_row = accepted_df[
-                accepted_df.iloc[:, 0].str.contains(C.YIELD_ANCHOR_TEXT, na=False)
-            ]
-            if yield_row.empty:
-                continue
-
-            yields = (
-                pd.to_numeric(yield_row.iloc[0, 1 : len(tenors) + 1], errors="coerce")
-                .dropna()
-                .astype(float)
-                .tolist()
-            )
-
-            if len(tenors) == len(yields) == len(session_dates):
-                section_df = pd.DataFrame(
-                    {
-                        C.TENOR_COLUMN_NAME: tenors,
-                        C.YIELD_COLUMN_NAME: yields,
-                        C.SESSION_DATE_COLUMN_NAME: session_dates,
-                    }
-                )
-                all_dataframes.append(section_df)
-                logger.info(f"Successfully parsed data for tenors: {tenors}")
-
+            section = _parse_section(elements[results_table], elements[accepted_table])
         except Exception as e:
             logger.error(f"Error processing a section: {e}", exc_info=True)
             continue
+        if section is not None:
+            tenors.extend(section[0])
+            yields.extend(section[1])
+            session_dates.extend(section[2])
+
+    if not tenors:
+        return _finalize_sections(None)
+    return _finalize_sections(
+        pd.DataFrame(
+            {
+                C.TENOR_COLUMN_NAME: pd.Series(tenors, dtype="int64"),
+                C.YIELD_COLUMN_NAME: pd.Series(yields, dtype="float64"),
+                C.SESSION_DATE_COLUMN_NAME: session_dates,
+            }
+        )
+    )
 
-    if not all_dataframes:
+
+def _finalize_sections(final_df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """Types the dates of the parsed rows and adds the scrape date."""
+    if final_df is None:
         logger.error("Could not parse any valid data from any section.")
         return None
 
-    final_df = pd.concat(all_dataframes, ignore_index=True)
-    final_df[C.DATE_COLUMN_NAME] = datetime.now().strftime("%Y-%m-%d")
+    # Dates are typed once here; storage keeps them as integer day numbers
+    final_df[C.SESSION_DATE_COLUMN_NAME] = pd.to_datetime(
+        final_df[C.SESSION_DATE_COLUMN_NAME],
+        format=C.SESSION_DATE_FORMAT,
+        errors="coerce",
+    )
+    invalid_dates = final_df[C.SESSION_DATE_COLUMN_NAME].isna()
+    if invalid_dates.any():
+        logger.warning(
+            f"Dropping {int(invalid_dates.sum())} row(s) with an unreadable session date."
+        )
+        final_df = final_df[~invalid_dates]
+    final_df[C.DATE_COLUMN_NAME] = pd.Timestamp(datetime.now().date())
     final_df = final_df.sort_values(by=C.TENOR_COLUMN_NAME).reset_index(drop=True)
 
     logger.info(f"Successfully parsed a total of {len(final_df)} tenors from the page.")
     return final_df
 
 
-def fetch_data_from_cbe(db_manager: DatabaseManager) -> None:
-    # (الكود هنا لم يتغير)
-    retries = C.SCRAPER_RETRIES
-    delay_seconds = C.SCRAPER_RETRY_DELAY_SECONDS
-
-    for attempt in range(retries):
-        driver = None
-        logger.info(f"--- Starting scrape attempt {attempt + 1} of {retries} ---")
-        try:
-            driver = setup_driver()
-            if not driver:
-                raise RuntimeError("Driver setup failed. Aborting this attempt.")
+def _scrape_once(
+    db_manager: DatabaseManager,
+    url: str,
+    mode: str,
+    state: ScrapeState,
+    state_path: Optional[str],
+    deadline: Deadline,
+) -> Optional[str]:
+    """
+    Runs one scrape attempt within what is left of `deadline`.
 
-            logger.info(f"Navigating to {C.CBE_DATA_URL}")
-            driver.get(C.CBE_DATA_URL)
+    Returns:
+        "saved" or "unchanged", or None if the page did not parse.
 
-            WebDriverWait(driver, C.SCRAPER_TIMEOUT_SECONDS).until(
-                EC.presence_of_element_located((By.TAG_NAME, "h2"))
+    Raises:
+        Exception: Whatever failed; `is_retryable` decides what happens next.
+    """
+    final_df = None
+    new_state = None
+    if mode in ("auto", "http"):
+        try:
+            response = get_page_with_http(
+                url, state, timeout=deadline.clamp(C.HTTP_TIMEOUT_SECONDS)
             )
-
-            page_source = driver.page_source
-            final_df = parse_cbe_html(page_source)
-
-            if final_df is not None and not final_df.empty:
-                db_manager.save_data(final_df)
-                logger.info("Data successfully scraped and saved.")
-                return
-            else:
-                logger.error("Parsing failed. No data was saved for this attempt.")
-
-        except TimeoutException:
-            logger.warning(
-                f"Page load timed out on attempt {attempt + 1}.", exc_info=True
+        except requests.RequestException as e:
+            if mode == "http":
+                raise
+            logger.warning(f"HTTP fetch of {url} failed: {e}")
+            response = None
+        if response is not None and response.status_code == 304:
+            logger.info(
+                f"No-op run: the CBE page is unchanged since {state.scraped_on} (HTTP 304)."
+            )
+            return "unchanged"
+        if response is not None:
+            page_hash = results_hash(response.text)
+            if state.matches(url, page_hash):
+                logger.info(
+                    f"No-op run: the CBE results are unchanged since {state.scraped_on}."
+                )
+                return "unchanged"
+            final_df = parse_cbe_html(response.text)
+            new_state = ScrapeState(
+                url=url,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                results_hash=page_hash,
+            )
+        if final_df is None and mode == "auto":
+            logger.info("HTTP page did not parse. Falling back to Selenium.")
+    if final_df is None and mode in ("auto", "selenium"):
+        page_source = fetch_page_with_selenium(
+            url, timeout=deadline.clamp(C.SCRAPER_TIMEOUT_SECONDS)
+        )
+        page_hash = results_hash(page_source)
+        if state.matches(url, page_hash):
+            logger.info(
+                f"No-op run: the CBE results are unchanged since {state.scraped_on}."
             )
+            return "unchanged"
+        final_df = parse_cbe_html(page_source)
+        # The HTTP validators describe a page without results: not kept
+        new_state = ScrapeState(url=url, results_hash=page_hash)
+
+    if final_df is None or final_df.empty:
+        logger.error("Parsing failed. No data was saved for this attempt.")
+        return None
+    counts = db_manager.save_data(final_df)
+    logger.info(
+        f"Data successfully scraped and saved "
+        f"({counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['skipped']} unchanged)."
+    )
+    # Written only once the results are in the database
+    new_state.scraped_on = final_df[C.DATE_COLUMN_NAME].max().strftime("%Y-%m-%d")
+    new_state.save(state_path)
+    return "saved"
+
+
+def fetch_data_from_cbe(
+    db_manager: DatabaseManager,
+    url: str = C.CBE_DATA_URL,
+    mode: str = C.SCRAPER_FETCH_MODE,
+    state_path: Optional[str] = None,
+    policy: Optional[RetryPolicy] = None,
+) -> str:
+    """
+    Fetches the latest auction results and saves them.
+
+    The validators and results hash of the last saved page are kept in a
+    `ScrapeState` file. If the server answers the conditional GET with 304,
+    or the page's results section hashes the same as last time, the run
+    stops there: nothing is parsed and the database is not written.
+
+    Failed attempts are retried as `policy` allows: with a jittered
+    exponential backoff, only for transient errors, and never past its
+    deadline, to which every attempt's timeouts are also clamped.
+
+    Args:
+        db_manager (DatabaseManager): Where to save the results.
+        url (str): The results page.
+        mode (str): "auto" tries a plain HTTP fetch first and starts Chrome
+            only if that HTML does not parse; "http" and "selenium" use one
+            path only.
+        state_path (Optional[str]): The state file; defaults to the one next
+            to the database (none for an in-memory database).
+        policy (Optional[RetryPolicy]): Attempts, backoff and latency budget;
+            defaults to `RetryPolicy.scheduled()`.
+
+    Returns:
+        "saved" if new results were parsed and saved, "unchanged" if the page
+        is the one saved last time, "failed" if the scrape gave up.
+    """
+    if mode not in ("auto", "http", "selenium"):
+        raise ValueError(f"Unknown fetch mode: {mode!r}")
+    if policy is None:
+        policy = RetryPolicy.scheduled()
+    deadline = policy.start()
+    if state_path is None:
+        state_path = scrape_state_path(db_manager)
+    state = ScrapeState.load(state_path)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        logger.info(
+            f"--- Starting scrape attempt {attempt} of {policy.max_attempts} ---"
+        )
+        try:
+            status = _scrape_once(db_manager, url, mode, state, state_path, deadline)
+            if status is not None:
+                return status
         except Exception as e:
-            logger.error(
-                f"An unexpected error occurred during attempt {attempt + 1}: {e}",
-                exc_info=True,
+            if not is_retryable(e):
+                logger.critical(
+                    f"Giving up after a non-retryable error on attempt {attempt}: {e}",
+                    exc_info=True,
+                )
+                return "failed"
+            logger.warning(
+                f"Attempt {attempt} failed with a retryable error: {e}", exc_info=True
             )
-        finally:
-            if driver:
-                logger.info("Closing Selenium driver for this attempt.")
-                driver.quit()
 
-        if attempt < retries - 1:
-            logger.info(f"Waiting for {delay_seconds} seconds before next attempt...")
-            time.sleep(delay_seconds)
+        delay_seconds = policy.next_delay(attempt, deadline)
+        if delay_seconds is None:
+            break
+        logger.info(
+            f"Waiting for {delay_seconds:.1f} seconds before next attempt "
+            f"({deadline.remaining():.0f}s of the budget left)..."
+        )
+        time.sleep(delay_seconds)
 
-    logger.critical(f"All {retries} attempts to fetch data from CBE failed.")
+    logger.critical(
+        f"Failed to fetch data from CBE after {attempt} attempt(s) "
+        f"within the retry budget."
+    )
+    return "failed"
@@ -10,10 +10,43 @@ TENOR_COLUMN_NAME = "tenor"
 YIELD_COLUMN_NAME = "yield"
 DATE_COLUMN_NAME = "scrape_date"
 SESSION_DATE_COLUMN_NAME = "session_date"
+# Date format of the session dates published by the CBE
+SESSION_DATE_FORMAT = "%d/%m/%Y"
+# Storage-only columns: one row per auction, seen on one or more scrape dates
+FIRST_SEEN_COLUMN_NAME = "first_seen"
+LAST_SEEN_COLUMN_NAME = "last_seen"
+ROW_VERSION_COLUMN_NAME = "row_version"
 
 # --- Database ---
 DB_FILENAME = "cbe_historical_data.db"
 TABLE_NAME = "cbe_t_bills"
+TENOR_DATE_INDEX_NAME = "idx_cbe_t_bills_tenor_date"
+# Per-table write counters that the cached loaders are keyed on
+DATA_VERSIONS_TABLE_NAME = "data_versions"
+# Memory-mapped columnar copy of the history, next to the database file
+HISTORY_SNAPSHOT_SUFFIX = ".history.npy"
+# Incrementally maintained aggregates (see aggregates.py)
+AGGREGATES_TABLE_NAME = "cbe_t_bill_aggregates"
+WEEKLY_TABLE_NAME = "cbe_t_bill_weekly"
+SPREADS_VIEW_NAME = "cbe_t_bill_weekly_spreads"
+MOVING_AVERAGE_COLUMN_NAME = "yield_ma"
+WEEK_START_COLUMN_NAME = "week_start"
+# Auctions of the same tenor averaged by the moving average
+MOVING_AVERAGE_AUCTIONS = 4
+# The weekly spread is long minus short tenor, in percentage points
+SPREAD_LONG_TENOR = 364
+SPREAD_SHORT_TENOR = 91
+
+# --- Database Connection Tuning ---
+DB_POOL_SIZE = 4
+DB_BUSY_TIMEOUT_SECONDS = 30.0
+DB_CACHE_SIZE_KIB = 16384
+DB_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+DB_CACHED_STATEMENTS = 128
+# Cached results per loader; older data versions age out of the LRU
+DATA_CACHE_MAX_ENTRIES = 16
+# Rows written per transaction by the bulk importer (backfill.py)
+BACKFILL_BATCH_ROWS = 50000
 
 # --- Web Scraping ---
 CBE_DATA_URL = "https://www.cbe.org.eg/ar/auctions/egp-t-bills"
@@ -23,8 +56,24 @@ USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTM
 
 # --- Web Scraping Controls (NEW) ---
 SCRAPER_RETRIES = 3
-SCRAPER_RETRY_DELAY_SECONDS = 10
+# Exponential backoff between attempts: 5s, 10s, 20s... capped, then jittered
+SCRAPER_RETRY_BASE_DELAY_SECONDS = 5
+SCRAPER_RETRY_MAX_DELAY_SECONDS = 60
+# Overall budget of one scheduled scrape, waits and page loads included
+SCRAPER_DEADLINE_SECONDS = 300
+# The app's refresh button blocks a user: fewer attempts and a short budget
+APP_SCRAPER_RETRIES = 2
+APP_SCRAPER_DEADLINE_SECONDS = 45
 SCRAPER_TIMEOUT_SECONDS = 60
+# "auto": plain HTTP first and Selenium only if that HTML does not parse;
+# "http" or "selenium" use one path only
+SCRAPER_FETCH_MODE = "auto"
+HTTP_TIMEOUT_SECONDS = 20
+HTTP_POOL_SIZE = 4
+# Validators and results hash of the last saved page, next to the database
+SCRAPE_STATE_SUFFIX = ".scrape_state.json"
+# The warm Chrome kept by DriverManager is replaced after this many page loads
+DRIVER_MAX_USES = 20
 
 # --- Financial ---
 DAYS_IN_YEAR = 365.0
@@ -0,0 +1,112 @@
+# db_cache.py (طبقة التخزين المؤقت الخاصة بـ Streamlit فوق مدير قاعدة البيانات)
+"""
+Streamlit caching adapter for `DatabaseManager`.
+
+The storage core (`db_manager.py`) knows nothing about Streamlit. This module
+wraps its `_load_*` methods in `st.cache_data` functions keyed on
+(database, data version, arguments) and caches the manager itself with
+`st.cache_resource`. A scrape bumps the data version, so only the next call
+of each loader misses; older entries age out of the LRU. Loads under
+`UNKNOWN_DATA_VERSION` (the database could not be read) bypass the cache, so
+a failure is not served to every session after the database recovers.
+"""
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import streamlit as st
+
+import constants as C
+from db_manager import UNKNOWN_DATA_VERSION, DatabaseManager, DateLike
+
+
+# --- Cache the DatabaseManager instance itself ---
+# This prevents re-initializing the connection on every script rerun.
+@st.cache_resource
+def get_db_manager(db_filename: str = C.DB_FILENAME) -> "CachedDatabaseManager":
+    """Factory function to get a cached instance of CachedDatabaseManager."""
+    return CachedDatabaseManager(db_filename)
+
+
+class CachedDatabaseManager(DatabaseManager):
+    """A DatabaseManager whose loaders are served from the Streamlit data cache."""
+
+    def __init__(
+        self, db_filename: str = C.DB_FILENAME, pool_size: int = C.DB_POOL_SIZE
+    ):
+        super().__init__(db_filename, pool_size)
+        # Part of every cached loader's key; ":memory:" databases are per instance
+        self.cache_key = (
+            f"{self.db_filename}:{id(self)}" if self.is_memory else self.db_filename
+        )
+
+    def _serve(self, loader: Callable[..., Any], data_version: int, *args: Any) -> Any:
+        if data_version == UNKNOWN_DATA_VERSION:
+            # Run the loader itself: its result must not outlive the failure
+            return loader.__wrapped__(self, self.cache_key, data_version, *args)
+        return loader(self, self.cache_key, data_version, *args)
+
+    def _load_latest_data(self, data_version: int) -> Tuple[pd.DataFrame, str]:
+        return self._serve(_cached_latest_data, data_version)
+
+    def _load_all_historical_data(self, data_version: int) -> pd.DataFrame:
+        return self._serve(_cached_all_historical_data, data_version)
+
+    def _load_history_range(
+        self,
+        data_version: int,
+        tenors: Optional[Sequence[int]],
+        start_date: Optional[DateLike],
+        end_date: Optional[DateLike],
+    ) -> pd.DataFrame:
+        return self._serve(
+            _cached_history_range, data_version, tenors, start_date, end_date
+        )
+
+    def _load_available_tenors(self, data_version: int) -> List[str]:
+        return self._serve(_cached_available_tenors, data_version)
+
+    def _load_aggregate(self, data_version: int, query: str) -> pd.DataFrame:
+        return self._serve(_cached_aggregate, data_version, query)
+
+
+# The leading underscore keeps Streamlit from hashing the manager itself
+@st.cache_data(max_entries=C.DATA_CACHE_MAX_ENTRIES)
+def _cached_latest_data(
+    _db: DatabaseManager, cache_key: str, data_version: int
+) -> Tuple[pd.DataFrame, str]:
+    return DatabaseManager._load_latest_data(_db, data_version)
+
+
+@st.cache_data(max_entries=C.DATA_CACHE_MAX_ENTRIES)
+def _cached_all_historical_data(
+    _db: DatabaseManager, cache_key: str, data_version: int
+) -> pd.DataFrame:
+    return DatabaseManager._load_all_historical_data(_db, data_version)
+
+
+@st.cache_data(max_entries=64)
+def _cached_history_range(
+    _db: DatabaseManager,
+    cache_key: str,
+    data_version: int,
+    tenors: Optional[Sequence[int]],
+    start_date: Optional[DateLike],
+    end_date: Optional[DateLike],
+) -> pd.DataFrame:
+    return DatabaseManager._load_history_range(
+        _db, data_version, tenors, start_date, end_date
+    )
+
+
+@st.cache_data(max_entries=C.DATA_CACHE_MAX_ENTRIES)
+def _cached_available_tenors(
+    _db: DatabaseManager, cache_key: str, data_version: int
+) -> List[str]:
+    return DatabaseManager._load_available_tenors(_db, data_version)
+
+
+@st.cache_data(max_entries=C.DATA_CACHE_MAX_ENTRIES)
+def _cached_aggregate(
+    _db: DatabaseManager, cache_key: str, data_version: int, query: str
+) -> pd.DataFrame:
+    return DatabaseManager._load_aggregate(_db, data_version, query)
@@ -1,50 +1,418 @@
-# db_manager.py (النسخة المحسنة مع Caching ودالة جديدة)
+# db_manager.py (نواة التخزين بدون Streamlit؛ التخزين المؤقت في db_cache.py)
+"""
+Storage core for the T-bill history: SQLite, the columnar snapshot and the
+aggregates. It imports neither Streamlit nor any UI code, so headless jobs
+(update_data.py, backfill.py, the scheduled scrape) load only sqlite, NumPy
+and pandas. The app uses `db_cache.CachedDatabaseManager`, which adds the
+Streamlit caches on top of the `_load_*` methods of this class.
+"""
 import sqlite3
+import numpy as np
 import pandas as pd
 import os
+import itertools
+import queue
+import threading
 import logging
-from datetime import datetime
-from typing import Tuple, List, Any
-import streamlit as st
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple, List, Any, Union
 
 import constants as C
+from aggregates import (
+    MOVING_AVERAGES_SQL,
+    SPREADS_SQL,
+    WEEKLY_AVERAGES_SQL,
+    apply_auction_changes,
+    create_aggregate_tables,
+    rebuild_aggregates,
+)
+from history_snapshot import (
+    FINGERPRINT_YIELD_SCALE,
+    SNAPSHOT_DTYPE,
+    empty_snapshot,
+    merge_snapshot,
+    read_snapshot,
+    select_history,
+    snapshot_fingerprint,
+    snapshot_row_version,
+    snapshot_to_dataframe,
+    write_snapshot,
+)
 
 # Configure logging for this module
 logger = logging.getLogger(__name__)
 
+MEMORY_DB_FILENAME = ":memory:"
+# Returned by `data_version` when the database cannot be read
+UNKNOWN_DATA_VERSION = -1
 
-# --- IMPROVEMENT: Cache the DatabaseManager instance itself ---
-# This prevents re-initializing the connection on every script rerun.
-@st.cache_resource
-def get_db_manager(db_filename: str = C.DB_FILENAME) -> "DatabaseManager":
-    """Factory function to get a cached instance of DatabaseManager."""
-    return DatabaseManager(db_filename)
+DateLike = Union[str, date, datetime, pd.Timestamp]
+
+# --- Statements are module constants so every pooled connection keeps them prepared ---
+# One row per auction (session date, tenor), whatever the number of scrapes that
+# saw it. Loaders expose first_seen as the scrape date, so their output keeps
+# the (scrape_date, tenor, yield, session_date) shape. Dates are stored as
+# integer days since 1970-01-01: they sort, compare and load as plain numbers.
+_CREATE_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS "{C.TABLE_NAME}" (
+        "{C.SESSION_DATE_COLUMN_NAME}" INTEGER NOT NULL,
+        "{C.TENOR_COLUMN_NAME}" INTEGER NOT NULL,
+        "{C.YIELD_COLUMN_NAME}" REAL NOT NULL,
+        "{C.FIRST_SEEN_COLUMN_NAME}" INTEGER NOT NULL,
+        "{C.LAST_SEEN_COLUMN_NAME}" INTEGER NOT NULL,
+        "{C.ROW_VERSION_COLUMN_NAME}" INTEGER NOT NULL,
+        PRIMARY KEY ("{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}")
+    )
+"""
+# Covering index for "tenor set + date range" queries: the chart reads only
+# (tenor, date, yield, session) from the index itself.
+_CREATE_INDEX_SQL = f"""
+    CREATE INDEX IF NOT EXISTS "{C.TENOR_DATE_INDEX_NAME}"
+    ON "{C.TABLE_NAME}" (
+        "{C.TENOR_COLUMN_NAME}",
+        "{C.FIRST_SEEN_COLUMN_NAME}",
+        "{C.YIELD_COLUMN_NAME}",
+        "{C.SESSION_DATE_COLUMN_NAME}"
+    )
+"""
+_HISTORY_COLUMNS_SQL = (
+    f'"{C.FIRST_SEEN_COLUMN_NAME}" AS "{C.DATE_COLUMN_NAME}", '
+    f'"{C.TENOR_COLUMN_NAME}", "{C.YIELD_COLUMN_NAME}", "{C.SESSION_DATE_COLUMN_NAME}"'
+)
+_INSERT_SQL = f"""
+    INSERT INTO "{C.TABLE_NAME}" (
+        "{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}", "{C.YIELD_COLUMN_NAME}",
+        "{C.FIRST_SEEN_COLUMN_NAME}", "{C.LAST_SEEN_COLUMN_NAME}", "{C.ROW_VERSION_COLUMN_NAME}"
+    )
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+# A revised yield is corrected in place and tagged with the new data version
+_UPDATE_SQL = f"""
+    UPDATE "{C.TABLE_NAME}"
+    SET "{C.YIELD_COLUMN_NAME}" = ?,
+        "{C.LAST_SEEN_COLUMN_NAME}" = MAX("{C.LAST_SEEN_COLUMN_NAME}", ?),
+        "{C.ROW_VERSION_COLUMN_NAME}" = ?
+    WHERE "{C.SESSION_DATE_COLUMN_NAME}" = ? AND "{C.TENOR_COLUMN_NAME}" = ?
+"""
+# Seeing an unchanged auction again only moves last_seen; the data is the same.
+# Touches ride along with a scrape that changed something, so every auction of
+# the latest saved scrape shares its last_seen; alone they are not written.
+_TOUCH_SQL = f"""
+    UPDATE "{C.TABLE_NAME}" SET "{C.LAST_SEEN_COLUMN_NAME}" = ?
+    WHERE "{C.SESSION_DATE_COLUMN_NAME}" = ? AND "{C.TENOR_COLUMN_NAME}" = ?
+"""
+# The newest auction of every tenor on the latest saved scrape; tenors that are
+# no longer offered (only in the older history) are left out
+_LATEST_SQL = f"""
+    SELECT {_HISTORY_COLUMNS_SQL}, "{C.LAST_SEEN_COLUMN_NAME}" FROM (
+        SELECT *, ROW_NUMBER() OVER (
+            PARTITION BY "{C.TENOR_COLUMN_NAME}"
+            ORDER BY "{C.SESSION_DATE_COLUMN_NAME}" DESC,
+                     "{C.FIRST_SEEN_COLUMN_NAME}" DESC
+        ) AS newest
+        FROM "{C.TABLE_NAME}"
+        WHERE "{C.LAST_SEEN_COLUMN_NAME}" = (
+            SELECT MAX("{C.LAST_SEEN_COLUMN_NAME}") FROM "{C.TABLE_NAME}"
+        )
+    )
+    WHERE newest = 1
+    ORDER BY "{C.TENOR_COLUMN_NAME}"
+"""
+_ALL_SQL = (
+    f'SELECT {_HISTORY_COLUMNS_SQL}, "{C.ROW_VERSION_COLUMN_NAME}" '
+    f'FROM "{C.TABLE_NAME}"'
+)
+_TENORS_SQL = f"""
+    SELECT DISTINCT "{C.TENOR_COLUMN_NAME}" FROM "{C.TABLE_NAME}"
+    ORDER BY "{C.TENOR_COLUMN_NAME}"
+"""
+_DELTA_SQL = f'{_ALL_SQL} WHERE "{C.ROW_VERSION_COLUMN_NAME}" > ?'
+# Same values as history_snapshot.snapshot_fingerprint, computed by SQLite
+_FINGERPRINT_SQL = f"""
+    SELECT COUNT(*),
+           COALESCE(SUM("{C.ROW_VERSION_COLUMN_NAME}"), 0),
+           COALESCE(SUM("{C.FIRST_SEEN_COLUMN_NAME}"), 0),
+           COALESCE(SUM("{C.SESSION_DATE_COLUMN_NAME}"), 0),
+           COALESCE(SUM("{C.TENOR_COLUMN_NAME}"), 0),
+           COALESCE(SUM(
+               CAST("{C.YIELD_COLUMN_NAME}" * {FINGERPRINT_YIELD_SCALE} AS INTEGER)
+               * "{C.TENOR_COLUMN_NAME}"
+           ), 0)
+    FROM "{C.TABLE_NAME}"
+"""
+_LEGACY_TABLE_NAME = f"{C.TABLE_NAME}_legacy"
+
+
+def _iso_to_days_sql(column: str) -> str:
+    """SQL expression converting a 'YYYY-MM-DD' TEXT column to epoch days."""
+    return f"CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+
+def _session_to_days_sql(column: str) -> str:
+    """SQL expression converting a 'DD/MM/YYYY' TEXT column to epoch days."""
+    return _iso_to_days_sql(
+        f"substr({column}, 7, 4) || '-' || substr({column}, 4, 2) "
+        f"|| '-' || substr({column}, 1, 2)"
+    )
+
+
+_MIGRATE_INSERT_SQL = f"""
+    INSERT INTO "{C.TABLE_NAME}" (
+        "{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}", "{C.YIELD_COLUMN_NAME}",
+        "{C.FIRST_SEEN_COLUMN_NAME}", "{C.LAST_SEEN_COLUMN_NAME}", "{C.ROW_VERSION_COLUMN_NAME}"
+    )
+"""
+# Oldest layout, one row per (scrape_date, tenor): collapse the scrapes of an
+# auction into one row, keeping the yield of the most recent scrape
+_MIGRATE_PER_SCRAPE_SQL = f"""
+    {_MIGRATE_INSERT_SQL}
+    SELECT {_session_to_days_sql(f'l."{C.SESSION_DATE_COLUMN_NAME}"')},
+           l."{C.TENOR_COLUMN_NAME}", l."{C.YIELD_COLUMN_NAME}",
+           {_iso_to_days_sql("g.first_seen")}, {_iso_to_days_sql("g.last_seen")}, ?
+    FROM "{_LEGACY_TABLE_NAME}" AS l
+    JOIN (
+        SELECT "{C.SESSION_DATE_COLUMN_NAME}" AS session_date, "{C.TENOR_COLUMN_NAME}" AS tenor,
+               MIN("{C.DATE_COLUMN_NAME}") AS first_seen, MAX("{C.DATE_COLUMN_NAME}") AS last_seen
+        FROM "{_LEGACY_TABLE_NAME}"
+        GROUP BY "{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}"
+    ) AS g
+    ON l."{C.SESSION_DATE_COLUMN_NAME}" = g.session_date
+    AND l."{C.TENOR_COLUMN_NAME}" = g.tenor
+    AND l."{C.DATE_COLUMN_NAME}" = g.last_seen
+"""
+# One row per auction, but with TEXT dates: convert the dates only
+_MIGRATE_TEXT_DATES_SQL = f"""
+    {_MIGRATE_INSERT_SQL}
+    SELECT {_session_to_days_sql(f'"{C.SESSION_DATE_COLUMN_NAME}"')},
+           "{C.TENOR_COLUMN_NAME}", "{C.YIELD_COLUMN_NAME}",
+           {_iso_to_days_sql(f'"{C.FIRST_SEEN_COLUMN_NAME}"')},
+           {_iso_to_days_sql(f'"{C.LAST_SEEN_COLUMN_NAME}"')}, ?
+    FROM "{_LEGACY_TABLE_NAME}"
+"""
+_BUMP_VERSION_SQL = f"""
+    INSERT INTO "{C.DATA_VERSIONS_TABLE_NAME}" (table_name, version) VALUES (?, 1)
+    ON CONFLICT(table_name) DO UPDATE SET version = version + 1
+"""
+_VERSION_SQL = (
+    f'SELECT version FROM "{C.DATA_VERSIONS_TABLE_NAME}" WHERE table_name = ?'
+)
+
+
+def _to_epoch_day(value: DateLike) -> int:
+    """Converts a date-like value to the integer day number stored in the date columns."""
+    return int(pd.Timestamp(value).to_datetime64().astype("datetime64[D]").astype(int))
+
+
+def _to_epoch_days(values: pd.Series, date_format: str) -> np.ndarray:
+    """Converts datetimes, or strings in `date_format`, to integer day numbers."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, format=date_format)
+    return values.to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def _from_epoch_days(values: pd.Series) -> pd.Series:
+    """Converts stored day numbers back to datetimes (no string parsing)."""
+    return pd.to_datetime(values, unit="D")
+
+
+def _decode_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts the date columns of a loaded frame from day numbers to datetimes."""
+    for column in (C.DATE_COLUMN_NAME, C.SESSION_DATE_COLUMN_NAME):
+        if column in df.columns:
+            df[column] = _from_epoch_days(df[column])
+    return df
+
+
+def _build_range_query(
+    tenors: Optional[Sequence[int]],
+    start_date: Optional[DateLike],
+    end_date: Optional[DateLike],
+) -> Tuple[str, Tuple[Any, ...]]:
+    """Builds the filtered history query so SQLite can seek the covering index."""
+    conditions: List[str] = []
+    params: List[Any] = []
+    if tenors is not None:
+        tenor_list = sorted({int(t) for t in tenors})
+        if not tenor_list:
+            conditions.append("0")
+        else:
+            placeholders = ", ".join("?" * len(tenor_list))
+            conditions.append(f'"{C.TENOR_COLUMN_NAME}" IN ({placeholders})')
+            params.extend(tenor_list)
+    if start_date is not None:
+        conditions.append(f'"{C.FIRST_SEEN_COLUMN_NAME}" >= ?')
+        params.append(_to_epoch_day(start_date))
+    if end_date is not None:
+        conditions.append(f'"{C.FIRST_SEEN_COLUMN_NAME}" <= ?')
+        params.append(_to_epoch_day(end_date))
+
+    query = f'SELECT {_HISTORY_COLUMNS_SQL} FROM "{C.TABLE_NAME}"'
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f' ORDER BY "{C.TENOR_COLUMN_NAME}", "{C.FIRST_SEEN_COLUMN_NAME}"'
+    return query, tuple(params)
+
+
+# Columns that define the content of an auction result, and its identity
+_CONTENT_COLUMNS = [
+    C.TENOR_COLUMN_NAME,
+    C.SESSION_DATE_COLUMN_NAME,
+    C.YIELD_COLUMN_NAME,
+]
+_KEY_COLUMNS = [C.TENOR_COLUMN_NAME, C.SESSION_DATE_COLUMN_NAME]
+# A prepared batch has one row per auction: the date column holds the first
+# scrape that showed it and this one the last
+_LAST_SCRAPE_COLUMN = "last_scrape"
+_BATCH_COLUMNS = [
+    C.DATE_COLUMN_NAME,
+    C.TENOR_COLUMN_NAME,
+    C.YIELD_COLUMN_NAME,
+    C.SESSION_DATE_COLUMN_NAME,
+    _LAST_SCRAPE_COLUMN,
+]
+_EMPTY_COUNTS = {"inserted": 0, "updated": 0, "skipped": 0}
+# Stays well below SQLite's limit on bound parameters
+_MAX_IN_PARAMS = 500
+
+
+def _to_snapshot(rows: List[Tuple[Any, ...]]) -> np.ndarray:
+    """Converts rows of `_ALL_SQL` to snapshot records."""
+    return np.array(rows, dtype=SNAPSHOT_DTYPE) if rows else empty_snapshot()
+
+
+def _content_hash(df: pd.DataFrame) -> np.ndarray:
+    """Returns a 64-bit hash of (tenor, session date, yield) for every row."""
+    return pd.util.hash_pandas_object(df[_CONTENT_COLUMNS], index=False).to_numpy()
+
+
+def _collapse_scrapes(batch: pd.DataFrame) -> pd.DataFrame:
+    """
+    Folds the rows of an auction seen by several scrapes into one.
+
+    The first scrape becomes its first_seen and the last one its last_seen;
+    the yield is the one of the latest scrape (of the last row among equals).
+    """
+    latest_last = batch.sort_values(_LAST_SCRAPE_COLUMN, kind="stable")
+    collapsed = latest_last.groupby(_KEY_COLUMNS, sort=False).agg(
+        **{
+            C.DATE_COLUMN_NAME: (C.DATE_COLUMN_NAME, "min"),
+            C.YIELD_COLUMN_NAME: (C.YIELD_COLUMN_NAME, "last"),
+            _LAST_SCRAPE_COLUMN: (_LAST_SCRAPE_COLUMN, "max"),
+        }
+    )
+    return collapsed.reset_index()[_BATCH_COLUMNS]
 
 
 class DatabaseManager:
     """A robust class to manage all SQLite database operations for the T-bill data."""
 
-    def __init__(self, db_filename: str = C.DB_FILENAME):
-        self.db_filename = os.path.abspath(db_filename)
+    def __init__(
+        self, db_filename: str = C.DB_FILENAME, pool_size: int = C.DB_POOL_SIZE
+    ):
+        self.is_memory = db_filename == MEMORY_DB_FILENAME
+        self.db_filename = (
+            db_filename if self.is_memory else os.path.abspath(db_filename)
+        )
+        # Each connection to ":memory:" is a separate database, so share a single one
+        self.pool_size = 1 if self.is_memory else max(1, pool_size)
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all_connections: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        # SQLite allows one writer at a time; serialize ours instead of hitting SQLITE_BUSY
+        self._write_lock = threading.Lock()
+        # Incrementally refreshed copy of the history (see load_all_historical_data)
+        self._history_df: Optional[pd.DataFrame] = None
+        self._history_row_version: Optional[int] = None
+        self._history_lock = threading.Lock()
+        # Memory-mapped columnar copy of the history, shared by every process
+        self.snapshot_path: Optional[str] = (
+            None
+            if self.is_memory
+            else os.path.splitext(self.db_filename)[0] + C.HISTORY_SNAPSHOT_SUFFIX
+        )
+        self._snapshot: Optional[np.ndarray] = None
+        self._snapshot_version: Optional[int] = None
+        self._snapshot_lock = threading.Lock()
         logger.info(f"Initializing new DB Manager instance for: {self.db_filename}")
         self._init_db()
 
+    # --- Connection pool ---
+    def _open_connection(self) -> sqlite3.Connection:
+        """Opens a new connection and applies the performance pragmas."""
+        conn = sqlite3.connect(
+            self.db_filename,
+            timeout=C.DB_BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,  # Connections move between threads via the pool
+            cached_statements=C.DB_CACHED_STATEMENTS,
+        )
+        if not self.is_memory:
+            # WAL lets readers keep reading while save_data writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={C.DB_MMAP_SIZE_BYTES}")
+        conn.execute(f"PRAGMA cache_size=-{C.DB_CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrows a pooled connection, opening a new one while the pool is not full."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_open = len(self._all_connections) < self.pool_size
+                if can_open:
+                    conn = self._open_connection()
+                    self._all_connections.append(conn)
+            if not can_open:
+                try:
+                    conn = self._pool.get(timeout=C.DB_BUSY_TIMEOUT_SECONDS)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        "Timed out waiting for a pooled database connection."
+                    ) from None
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    def close(self) -> None:
+        """Checkpoints the WAL into the main file and closes every pooled connection."""
+        with self._pool_lock:
+            connections, self._all_connections = self._all_connections, []
+        for i, conn in enumerate(connections):
+            try:
+                if i == 0 and not self.is_memory:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Error while closing a database connection: {e}")
+        self._pool = queue.LifoQueue()
+        logger.info(f"Closed {len(connections)} database connection(s).")
+
     def _init_db(self) -> None:
-        """Initializes the DB and creates the T-bills table with a composite primary key."""
+        """Initializes the DB, migrating a legacy per-scrape table if there is one."""
         try:
-            with sqlite3.connect(self.db_filename) as conn:
+            with self._connection() as conn, self._write_lock:
                 cursor = conn.cursor()
+                # One write counter per table; cached loaders are keyed on it
                 cursor.execute(
                     f"""
-                CREATE TABLE IF NOT EXISTS "{C.TABLE_NAME}" (
-                    "{C.DATE_COLUMN_NAME}" TEXT NOT NULL,
-                    "{C.TENOR_COLUMN_NAME}" INTEGER NOT NULL,
-                    "{C.YIELD_COLUMN_NAME}" REAL NOT NULL,
-                    "{C.SESSION_DATE_COLUMN_NAME}" TEXT NOT NULL,
-                    PRIMARY KEY ("{C.DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}")
+                CREATE TABLE IF NOT EXISTS "{C.DATA_VERSIONS_TABLE_NAME}" (
+                    table_name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
                 )
                 """
                 )
+                migrated = self._migrate_legacy_table(cursor)
+                cursor.execute(_CREATE_TABLE_SQL)
+                cursor.execute(_CREATE_INDEX_SQL)
+                if create_aggregate_tables(cursor) or migrated:
+                    rebuild_aggregates(cursor)
                 conn.commit()
                 logger.info(
                     f"Database '{self.db_filename}' and table '{C.TABLE_NAME}' are ready."
@@ -53,13 +421,160 @@ class DatabaseManager:
             logger.critical(f"Database initialization failed: {e}", exc_info=True)
             raise
 
-    def save_data(self, df: pd.DataFrame) -> None:
+    def _migrate_legacy_table(self, cursor: sqlite3.Cursor) -> bool:
         """
-        Saves a DataFrame to the database using an efficient "INSERT OR REPLACE" strategy.
+        Converts an older layout of the table to the current one.
+
+        Two layouts are migrated: one row per (scrape_date, tenor), and one row
+        per auction with TEXT dates. The whole migration runs in one
+        transaction: either every auction is moved, or the old table is kept.
+
+        Returns:
+            True if the table was migrated.
         """
+        column_types = {
+            row[1]: row[2]
+            for row in cursor.execute(f'PRAGMA table_info("{C.TABLE_NAME}")')
+        }
+        if not column_types:
+            return False
+        if C.FIRST_SEEN_COLUMN_NAME not in column_types:
+            migrate_sql, layout = _MIGRATE_PER_SCRAPE_SQL, "one row per scrape"
+        elif column_types[C.FIRST_SEEN_COLUMN_NAME].upper() == "TEXT":
+            migrate_sql, layout = _MIGRATE_TEXT_DATES_SQL, "TEXT dates"
+        else:
+            return False
+
+        cursor.execute("BEGIN")
+        legacy_rows = cursor.execute(
+            f'SELECT COUNT(*) FROM "{C.TABLE_NAME}"'
+        ).fetchone()[0]
+        cursor.execute(f'ALTER TABLE "{C.TABLE_NAME}" RENAME TO "{_LEGACY_TABLE_NAME}"')
+        cursor.execute(_CREATE_TABLE_SQL)
+        cursor.execute(_BUMP_VERSION_SQL, (C.TABLE_NAME,))
+        version = cursor.execute(_VERSION_SQL, (C.TABLE_NAME,)).fetchone()[0]
+        cursor.execute(migrate_sql, (version,))
+        auctions = cursor.rowcount
+        # Dropping the old table also drops its index, which is recreated below
+        cursor.execute(f'DROP TABLE "{_LEGACY_TABLE_NAME}"')
+        logger.info(
+            f"Migrated '{C.TABLE_NAME}' from {layout}: "
+            f"{legacy_rows} rows -> {auctions} auctions."
+        )
+        return True
+
+    def save_data(self, df: pd.DataFrame) -> Dict[str, int]:
+        """
+        Saves a DataFrame to the database, writing only the rows that changed.
+
+        Incoming rows are matched to the stored ones by (tenor, session date)
+        and compared by a content hash. New rows are inserted, rows whose yield
+        was revised are updated, and identical rows are skipped. When nothing
+        changed there is no write at all, so the data version (and with it
+        every cached loader) stays the same.
+
+        Returns:
+            The number of rows "inserted", "updated" and "skipped".
+        """
+        batch = self._prepare_batch(df)
+        if batch is None:
+            return dict(_EMPTY_COUNTS)
+        logger.info(f"Comparing {len(batch)} incoming rows with the stored data.")
+
+        try:
+            with self._connection() as conn, self._write_lock:
+                counts = self._write_batch(conn, batch)
+        except sqlite3.DatabaseError as e:
+            logger.error(f"Failed to save data to SQLite: {e}", exc_info=True)
+            raise
+
+        if counts["inserted"] or counts["updated"]:
+            logger.info(
+                f"Saved scrape: {counts['inserted']} inserted, "
+                f"{counts['updated']} updated, {counts['skipped']} skipped."
+            )
+            self._fresh_snapshot(None)
+        else:
+            logger.info(
+                f"All {counts['skipped']} rows are unchanged. Nothing to write."
+            )
+        return counts
+
+    def bulk_import(
+        self,
+        frames: Iterable[pd.DataFrame],
+        batch_rows: int = C.BACKFILL_BATCH_ROWS,
+    ) -> Dict[str, int]:
+        """
+        Imports many DataFrames (e.g. a backfill of archived pages) in large batches.
+
+        The frames are streamed and grouped into batches of about `batch_rows`
+        rows; each batch is deduplicated against the stored rows and written
+        in one transaction, on one connection. An auction seen by several
+        scrapes in a batch keeps the first as first_seen, the last as
+        last_seen, and the yield of the last. The covering index is dropped
+        for the duration of the import and rebuilt once at the end, and the
+        history snapshot is refreshed once. The aggregates are rebuilt once at
+        the end instead of being folded in auction by auction.
+
+        A frame that cannot be converted is logged and skipped. If a batch
+        fails to write, it is rolled back and the error is raised; the batches
+        written before it stay committed.
+
+        Returns:
+            The total number of rows "inserted", "updated" and "skipped".
+        """
+        totals = dict(_EMPTY_COUNTS)
+        pending: List[pd.DataFrame] = []
+        pending_rows = 0
+
+        with self._connection() as conn, self._write_lock:
+            conn.execute(f'DROP INDEX IF EXISTS "{C.TENOR_DATE_INDEX_NAME}"')
+            try:
+                for df in itertools.chain(frames, [None]):
+                    if df is not None:
+                        try:
+                            batch = self._prepare_batch(df)
+                        except (ValueError, TypeError, OverflowError) as e:
+                            # One malformed file must not abort the whole import
+                            logger.error(f"Skipping a malformed frame: {e}")
+                            batch = None
+                        if batch is not None:
+                            pending.append(batch)
+                            pending_rows += len(batch)
+                        if pending_rows < batch_rows:
+                            continue
+                    if not pending:
+                        continue
+                    batch = _collapse_scrapes(pd.concat(pending, ignore_index=True))
+                    counts = self._write_batch(conn, batch, maintain_aggregates=False)
+                    for key in totals:
+                        totals[key] += counts[key]
+                    logger.info(
+                        f"Imported a batch of {len(batch)} rows: {counts['inserted']} "
+                        f"inserted, {counts['updated']} updated, "
+                        f"{counts['skipped']} skipped."
+                    )
+                    pending, pending_rows = [], 0
+            except BaseException:
+                # Discard the half-written batch; earlier batches are committed
+                conn.rollback()
+                raise
+            finally:
+                # Built once over the final table instead of maintained per row
+                conn.execute(_CREATE_INDEX_SQL)
+                rebuild_aggregates(conn.cursor())
+                conn.commit()
+
+        if totals["inserted"] or totals["updated"]:
+            self._fresh_snapshot(None)
+        return totals
+
+    def _prepare_batch(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Validates an incoming frame and converts it to the stored types."""
         if not isinstance(df, pd.DataFrame) or df.empty:
             logger.warning("Received an empty or invalid DataFrame. Nothing to save.")
-            return
+            return None
 
         required_cols = [
             C.DATE_COLUMN_NAME,
@@ -71,71 +586,442 @@ class DatabaseManager:
             logger.error(
                 f"DataFrame is missing one of the required columns: {required_cols}"
             )
-            return
+            return None
+
+        # Dates are converted to day numbers once, here, and never parsed again
+        scrape_days = _to_epoch_days(df[C.DATE_COLUMN_NAME], "%Y-%m-%d")
+        batch = pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: scrape_days,
+                C.TENOR_COLUMN_NAME: df[C.TENOR_COLUMN_NAME].astype("int64").to_numpy(),
+                C.YIELD_COLUMN_NAME: df[C.YIELD_COLUMN_NAME]
+                .astype("float64")
+                .to_numpy(),
+                C.SESSION_DATE_COLUMN_NAME: _to_epoch_days(
+                    df[C.SESSION_DATE_COLUMN_NAME], C.SESSION_DATE_FORMAT
+                ),
+                _LAST_SCRAPE_COLUMN: scrape_days,
+            }
+        )
+        return _collapse_scrapes(batch)
 
-        data_to_save: List[Tuple[Any, ...]] = [
-            tuple(x) for x in df[required_cols].to_numpy()
+    def _write_batch(
+        self,
+        conn: sqlite3.Connection,
+        batch: pd.DataFrame,
+        maintain_aggregates: bool = True,
+    ) -> Dict[str, int]:
+        """
+        Diffs a prepared batch against the stored rows and writes the changes.
+
+        Must be called with the write lock held. Commits its own transaction.
+        New and revised auctions are folded into the aggregates in the same
+        transaction unless `maintain_aggregates` is False. The last_seen of
+        unchanged auctions is moved only together with such changes: a batch
+        with nothing new writes nothing, not even last_seen.
+        """
+        stored = self._stored_rows(
+            conn, batch[C.SESSION_DATE_COLUMN_NAME].unique().tolist()
+        )
+        merged = batch.merge(
+            stored, on=_KEY_COLUMNS, how="left", suffixes=("", "_stored")
+        )
+        is_new = merged[C.LAST_SEEN_COLUMN_NAME].isna().to_numpy()
+        stored_content = merged[_KEY_COLUMNS].assign(
+            **{C.YIELD_COLUMN_NAME: merged[f"{C.YIELD_COLUMN_NAME}_stored"]}
+        )
+        unchanged = ~is_new & (_content_hash(merged) == _content_hash(stored_content))
+        inserts = merged[is_new]
+        updates = merged[~is_new & ~unchanged]
+        # At most one last_seen write per auction and scrape day
+        touches = merged[
+            unchanged
+            & (
+                merged[_LAST_SCRAPE_COLUMN] > merged[C.LAST_SEEN_COLUMN_NAME].fillna(-1)
+            ).to_numpy()
         ]
+        counts = {
+            "inserted": len(inserts),
+            "updated": len(updates),
+            "skipped": int(unchanged.sum()),
+        }
 
-        logger.info(f"Attempting to upsert {len(data_to_save)} rows.")
+        if inserts.empty and updates.empty:
+            return counts
 
-        try:
-            with sqlite3.connect(self.db_filename) as conn:
-                cursor = conn.cursor()
-                query = f"""
-                    INSERT OR REPLACE INTO "{C.TABLE_NAME}" 
-                    ("{C.DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}", "{C.YIELD_COLUMN_NAME}", "{C.SESSION_DATE_COLUMN_NAME}") 
-                    VALUES (?, ?, ?, ?)
-                """
-                cursor.executemany(query, data_to_save)
-                conn.commit()
+        cursor = conn.cursor()
+        cursor.executemany(
+            _TOUCH_SQL,
+            touches[
+                [_LAST_SCRAPE_COLUMN, C.SESSION_DATE_COLUMN_NAME, C.TENOR_COLUMN_NAME]
+            ]
+            .to_numpy(dtype=object)
+            .tolist(),
+        )
+        # Same transaction: readers never see new rows under the old version
+        cursor.execute(_BUMP_VERSION_SQL, (C.TABLE_NAME,))
+        version = cursor.execute(_VERSION_SQL, (C.TABLE_NAME,)).fetchone()[0]
+        cursor.executemany(
+            _INSERT_SQL,
+            [
+                (session_date, tenor, yield_, first_seen, last_seen, version)
+                for first_seen, tenor, yield_, session_date, last_seen in inserts[
+                    _BATCH_COLUMNS
+                ].to_numpy(dtype=object)
+            ],
+        )
+        cursor.executemany(
+            _UPDATE_SQL,
+            [
+                (yield_, last_seen, version, session_date, tenor)
+                for _, tenor, yield_, session_date, last_seen in updates[
+                    _BATCH_COLUMNS
+                ].to_numpy(dtype=object)
+            ],
+        )
+        if maintain_aggregates:
+            apply_auction_changes(
+                cursor,
+                inserts[
+                    [
+                        C.TENOR_COLUMN_NAME,
+                        C.SESSION_DATE_COLUMN_NAME,
+                        C.YIELD_COLUMN_NAME,
+                    ]
+                ]
+                .to_numpy(dtype=object)
+                .tolist(),
+                updates[
+                    [
+                        C.TENOR_COLUMN_NAME,
+                        C.SESSION_DATE_COLUMN_NAME,
+                        C.YIELD_COLUMN_NAME,
+                        f"{C.YIELD_COLUMN_NAME}_stored",
+                    ]
+                ]
+                .to_numpy(dtype=object)
+                .tolist(),
+            )
+        conn.commit()
+        return counts
+
+    def _stored_rows(
+        self, conn: sqlite3.Connection, session_dates: List[str]
+    ) -> pd.DataFrame:
+        """Returns the stored auctions of the given sessions."""
+        frames = []
+        for start in range(0, len(session_dates), _MAX_IN_PARAMS):
+            chunk = session_dates[start : start + _MAX_IN_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            frames.append(
+                pd.read_sql_query(
+                    f'SELECT "{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}", '
+                    f'"{C.YIELD_COLUMN_NAME}", "{C.LAST_SEEN_COLUMN_NAME}" '
+                    f'FROM "{C.TABLE_NAME}" '
+                    f'WHERE "{C.SESSION_DATE_COLUMN_NAME}" IN ({placeholders})',
+                    conn,
+                    params=chunk,
+                )
+            )
+        stored = pd.concat(frames, ignore_index=True)
+        return stored.astype(
+            {
+                C.SESSION_DATE_COLUMN_NAME: "int64",
+                C.TENOR_COLUMN_NAME: "int64",
+                C.YIELD_COLUMN_NAME: "float64",
+            }
+        )
+
+    # --- Columnar snapshot ---
+    def refresh_history_snapshot(
+        self, data_version: Optional[int] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Brings the history snapshot up to date and returns it memory-mapped.
+
+        Only the rows written after the snapshot's newest row version are read
+        from SQLite and merged in; the new file replaces the old one
+        atomically. A snapshot that is already current (for example, written
+        by the update script in another process) is mapped as is. If the
+        merged rows do not match the database's fingerprint, the database
+        was replaced under the snapshot and it is rebuilt from scratch.
+
+        Returns:
+            The read-only structured array, or None for ":memory:" databases.
+        """
+        if self.snapshot_path is None:
+            return None
+        version = self._resolve(data_version)
+        with self._snapshot_lock:
+            if self._snapshot is not None and self._snapshot_version == version:
+                return self._snapshot
+
+            current = None
+            if os.path.exists(self.snapshot_path):
+                try:
+                    current = read_snapshot(self.snapshot_path)
+                except ValueError as e:
+                    logger.warning(f"Rebuilding the history snapshot: {e}")
+            with self._connection() as conn:
+                expected = tuple(conn.execute(_FINGERPRINT_SQL).fetchone())
+                changed = current is None
+                if current is not None:
+                    rows = conn.execute(
+                        _DELTA_SQL, (snapshot_row_version(current),)
+                    ).fetchall()
+                    delta = _to_snapshot(rows)
+                    merged = merge_snapshot(current, delta)
+                    changed = delta.size > 0
+                    if snapshot_fingerprint(merged) != expected:
+                        logger.warning(
+                            "The history snapshot does not match the database "
+                            "(replaced?). Rebuilding it."
+                        )
+                        current = None
+                if current is None:
+                    delta = _to_snapshot(conn.execute(_ALL_SQL).fetchall())
+                    merged = merge_snapshot(None, delta)
+                    changed = True
+
+            if changed:
+                write_snapshot(self.snapshot_path, merged)
+                current = read_snapshot(self.snapshot_path)
                 logger.info(
-                    f"Successfully upserted {cursor.rowcount} rows into the database."
+                    f"History snapshot updated with {delta.size} row(s) "
+                    f"({current.size} in total)."
                 )
-                # --- IMPROVEMENT: Clear caches after updating data ---
-                st.cache_data.clear()
-                logger.info("Cleared Streamlit data caches after update.")
-        except sqlite3.DatabaseError as e:
-            logger.error(f"Failed to save data to SQLite: {e}", exc_info=True)
-            raise
+            self._snapshot, self._snapshot_version = current, version
+            return current
+
+    def load_history_snapshot(
+        self, data_version: Optional[int] = None
+    ) -> Optional[np.ndarray]:
+        """Returns the memory-mapped history snapshot (None if it is unavailable)."""
+        return self._fresh_snapshot(data_version)
+
+    def _fresh_snapshot(self, data_version: Optional[int]) -> Optional[np.ndarray]:
+        # The snapshot is an accelerator: any failure falls back to SQL
+        try:
+            return self.refresh_history_snapshot(data_version)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.warning(f"History snapshot unavailable, using SQL: {e}")
+            return None
+
+    def data_version(self, table_name: str = C.TABLE_NAME) -> int:
+        """
+        Returns the write counter of a table (0 if it was never written to).
+
+        The counter is bumped in the same transaction as every `save_data`, so
+        cached loaders keyed on it are invalidated only when their table changes.
+        If it cannot be read, `UNKNOWN_DATA_VERSION` is returned; nothing
+        loaded under that version may be cached.
+        """
+        try:
+            with self._connection() as conn:
+                row = conn.execute(_VERSION_SQL, (table_name,)).fetchone()
+            return int(row[0]) if row else 0
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read the data version: {e}", exc_info=True)
+            return UNKNOWN_DATA_VERSION
 
-    # --- IMPROVEMENT: Cache the data loading functions ---
-    @st.cache_data
-    def load_latest_data(_self) -> Tuple[pd.DataFrame, str]:
+    # --- Loaders ---
+    # The public loaders resolve the data version and delegate to the `_load_*`
+    # methods, which take it explicitly so a caching layer (db_cache.py) can key
+    # on (database, version, arguments).
+    def load_latest_data(
+        self, data_version: Optional[int] = None
+    ) -> Tuple[pd.DataFrame, str]:
         """Loads the most recent complete data set."""
-        logger.info("Executing 'load_latest_data' (will be cached).")
+        return self._load_latest_data(self._resolve(data_version))
+
+    def load_all_historical_data(
+        self, data_version: Optional[int] = None
+    ) -> pd.DataFrame:
+        """Loads all historical data from the database for charting."""
+        return self._load_all_historical_data(self._resolve(data_version))
+
+    def load_history_range(
+        self,
+        tenors: Optional[Sequence[int]] = None,
+        start_date: Optional[DateLike] = None,
+        end_date: Optional[DateLike] = None,
+        data_version: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Loads the history for a set of tenors and a date range.
+
+        The range is cut from the memory-mapped snapshot when there is one,
+        and filtered in SQL on the covering index otherwise.
+
+        Args:
+            tenors (Optional[Sequence[int]]): Tenors to include (all if None).
+            start_date (Optional[DateLike]): First scrape date to include.
+            end_date (Optional[DateLike]): Last scrape date to include.
+            data_version (Optional[int]): The version to load (current if None).
+
+        Returns:
+            A DataFrame with the same shape as `load_all_historical_data`.
+        """
+        return self._load_history_range(
+            self._resolve(data_version), tenors, start_date, end_date
+        )
+
+    def load_available_tenors(self, data_version: Optional[int] = None) -> List[str]:
+        """Returns every tenor present in the history (an index-only scan)."""
+        return self._load_available_tenors(self._resolve(data_version))
+
+    def load_moving_averages(self, data_version: Optional[int] = None) -> pd.DataFrame:
+        """
+        Loads every auction with the moving average of its tenor's yield.
+
+        Reads the materialized aggregates table; nothing is recomputed.
+
+        Returns:
+            A DataFrame of session date, tenor, yield and `MOVING_AVERAGE_COLUMN_NAME`.
+        """
+        return self._load_aggregate(self._resolve(data_version), MOVING_AVERAGES_SQL)
+
+    def load_weekly_averages(self, data_version: Optional[int] = None) -> pd.DataFrame:
+        """Loads the average yield and the number of auctions per week and tenor."""
+        return self._load_aggregate(self._resolve(data_version), WEEKLY_AVERAGES_SQL)
+
+    def load_weekly_spreads(self, data_version: Optional[int] = None) -> pd.DataFrame:
+        """
+        Loads the weekly spread between the long and short tenors.
+
+        Returns:
+            A DataFrame of week start, long_yield, short_yield and spread
+            (long minus short, in percentage points).
+        """
+        return self._load_aggregate(self._resolve(data_version), SPREADS_SQL)
+
+    def _resolve(self, data_version: Optional[int]) -> int:
+        return self.data_version() if data_version is None else data_version
+
+    def _load_latest_data(self, data_version: int) -> Tuple[pd.DataFrame, str]:
+        logger.info(f"Loading latest data (version {data_version}).")
         fallback_df = pd.DataFrame(C.INITIAL_DATA)
         try:
-            with sqlite3.connect(_self.db_filename) as conn:
-                query = f"""
-                    SELECT * FROM "{C.TABLE_NAME}"
-                    WHERE "{C.DATE_COLUMN_NAME}" = (SELECT MAX("{C.DATE_COLUMN_NAME}") FROM "{C.TABLE_NAME}")
-                """
-                latest_df = pd.read_sql_query(query, conn)
+            with self._connection() as conn:
+                latest_df = pd.read_sql_query(_LATEST_SQL, conn)
                 if latest_df.empty:
                     return fallback_df, "البيانات الأولية (قاعدة بيانات فارغة)"
-                update_date_str = latest_df[C.DATE_COLUMN_NAME].iloc[0]
-                update_date_dt = datetime.strptime(update_date_str, "%Y-%m-%d")
+                update_date_dt = pd.Timestamp(
+                    int(latest_df.pop(C.LAST_SEEN_COLUMN_NAME).max()), unit="D"
+                )
                 status_message = f"بتاريخ {update_date_dt.strftime('%d-%m-%Y')}"
-                return latest_df, status_message
+                return _decode_dates(latest_df), status_message
         except Exception as e:
             logger.error(
                 f"An error occurred while loading latest data: {e}", exc_info=True
             )
             return fallback_df, f"خطأ في قاعدة البيانات: {e}"
 
-    # --- NEW FUNCTION: To load all data for historical charts ---
-    @st.cache_data
-    def load_all_historical_data(_self) -> pd.DataFrame:
-        """Loads all historical data from the database for charting."""
-        logger.info("Executing 'load_all_historical_data' (will be cached).")
+    def _load_all_historical_data(self, data_version: int) -> pd.DataFrame:
+        """
+        The first call maps the history snapshot (or reads the whole table when
+        there is none); later calls only fetch the rows written after the
+        high-water mark (the newest row version already loaded) and merge them
+        into the frame kept on the manager, so a refresh costs time
+        proportional to the new data rather than to the whole history.
+        """
+        logger.info(f"Loading historical data (version {data_version}).")
         try:
-            with sqlite3.connect(_self.db_filename) as conn:
-                query = f'SELECT * FROM "{C.TABLE_NAME}"'
-                df = pd.read_sql_query(query, conn)
-                df[C.DATE_COLUMN_NAME] = pd.to_datetime(df[C.DATE_COLUMN_NAME])
-                df[C.TENOR_COLUMN_NAME] = df[C.TENOR_COLUMN_NAME].astype(str)
-                return df
+            with self._history_lock:
+                if self._history_df is None or self._history_row_version is None:
+                    snapshot = self._fresh_snapshot(data_version)
+                    self._history_df = (
+                        self._read_history(_ALL_SQL)
+                        if snapshot is None
+                        else snapshot_to_dataframe(snapshot, include_row_version=True)
+                    )
+                    logger.info(f"Loaded {len(self._history_df)} historical rows.")
+                else:
+                    self._merge_history_delta()
+                self._history_row_version = int(
+                    self._history_df[C.ROW_VERSION_COLUMN_NAME].max()
+                    if not self._history_df.empty
+                    else 0
+                )
+                return self._history_df.drop(columns=C.ROW_VERSION_COLUMN_NAME)
         except Exception as e:
             logger.error(f"Failed to load historical data: {e}", exc_info=True)
             return pd.DataFrame()
+
+    def _load_history_range(
+        self,
+        data_version: int,
+        tenors: Optional[Sequence[int]],
+        start_date: Optional[DateLike],
+        end_date: Optional[DateLike],
+    ) -> pd.DataFrame:
+        snapshot = self._fresh_snapshot(data_version)
+        if snapshot is not None:
+            # Binary searches over the mapped arrays instead of a SQL query
+            return snapshot_to_dataframe(
+                select_history(
+                    snapshot,
+                    tenors,
+                    None if start_date is None else _to_epoch_day(start_date),
+                    None if end_date is None else _to_epoch_day(end_date),
+                )
+            )
+        query, params = _build_range_query(tenors, start_date, end_date)
+        try:
+            return self._read_history(query, params)
+        except Exception as e:
+            logger.error(f"Failed to load the history range: {e}", exc_info=True)
+            return pd.DataFrame()
+
+    def _load_available_tenors(self, data_version: int) -> List[str]:
+        try:
+            with self._connection() as conn:
+                rows = conn.execute(_TENORS_SQL).fetchall()
+            return [str(row[0]) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to load the available tenors: {e}", exc_info=True)
+            return []
+
+    def _load_aggregate(self, data_version: int, query: str) -> pd.DataFrame:
+        # The aggregates are written with the auctions, so the data version covers them
+        try:
+            with self._connection() as conn:
+                df = pd.read_sql_query(query, conn)
+        except Exception as e:
+            logger.error(f"Failed to load the aggregates: {e}", exc_info=True)
+            return pd.DataFrame()
+        for column in (C.SESSION_DATE_COLUMN_NAME, C.WEEK_START_COLUMN_NAME):
+            if column in df.columns:
+                df[column] = _from_epoch_days(df[column])
+        if C.TENOR_COLUMN_NAME in df.columns:
+            df[C.TENOR_COLUMN_NAME] = df[C.TENOR_COLUMN_NAME].astype(str)
+        return df
+
+    def _read_history(self, query: str, params: Tuple[Any, ...] = ()) -> pd.DataFrame:
+        """Runs a history query and converts the columns for charting."""
+        with self._connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        _decode_dates(df)
+        df[C.TENOR_COLUMN_NAME] = df[C.TENOR_COLUMN_NAME].astype(str)
+        return df
+
+    def _merge_history_delta(self) -> None:
+        """Replaces the cached auctions that were inserted or revised since the mark."""
+        delta = self._read_history(_DELTA_SQL, (self._history_row_version,))
+        if delta.empty:
+            return
+        changed = pd.MultiIndex.from_frame(delta[_KEY_COLUMNS])
+        stale = pd.MultiIndex.from_frame(self._history_df[_KEY_COLUMNS]).isin(changed)
+        self._history_df = pd.concat(
+            [self._history_df[~stale], delta], ignore_index=True
+        )
+        logger.info(
+            f"Incremental history refresh: {len(delta)} row(s) fetched, "
+            f"{int(stale.sum())} cached row(s) refreshed."
+        )
+
+    def reset_history_cache(self) -> None:
+        """Drops the cached history so the next load reads the whole table again."""
+        with self._history_lock:
+            self._history_df = None
+            self._history_row_version = None
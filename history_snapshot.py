@@ -0,0 +1,184 @@
+# history_snapshot.py (نسخة عمودية من التاريخ تُقرأ بالـ mmap بدون SQL)
+"""
+Columnar, memory-mapped snapshot of the auction history.
+
+The history is kept next to the SQLite file as one structured NumPy array
+(`.npy`), sorted by (tenor, scrape day). Readers map it with
+`np.load(mmap_mode="r")`, so every process on the host shares the same page
+cache pages instead of holding a private copy, and a cold start costs no SQL.
+Writers build the new array in a temporary file and swap it in with
+`os.replace`, so a reader never sees a half-written snapshot.
+
+A snapshot is only extended with the rows written after its newest row
+version, which assumes it was built from the same database. Its fingerprint
+(`snapshot_fingerprint`) is compared with the database's after every
+refresh, so a database file replaced under it (for example by a `git pull`)
+makes it rebuild from scratch instead of serving rows the database lacks.
+"""
+import logging
+import os
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import constants as C
+
+logger = logging.getLogger(__name__)
+
+# Dates are day numbers since 1970-01-01, as in the database
+SNAPSHOT_DTYPE = np.dtype(
+    [
+        (C.DATE_COLUMN_NAME, np.int32),
+        (C.TENOR_COLUMN_NAME, np.int32),
+        (C.YIELD_COLUMN_NAME, np.float64),
+        (C.SESSION_DATE_COLUMN_NAME, np.int32),
+        (C.ROW_VERSION_COLUMN_NAME, np.int64),
+    ]
+)
+
+
+def empty_snapshot() -> np.ndarray:
+    """Returns a snapshot without rows."""
+    return np.empty(0, dtype=SNAPSHOT_DTYPE)
+
+
+def read_snapshot(path: str) -> np.ndarray:
+    """
+    Maps a snapshot file read-only.
+
+    Raises:
+        ValueError: If the file is not a snapshot of the expected layout.
+    """
+    records = np.load(path, mmap_mode="r", allow_pickle=False)
+    if records.dtype != SNAPSHOT_DTYPE:
+        raise ValueError(f"Unexpected history snapshot layout in '{path}'.")
+    return records
+
+
+def write_snapshot(path: str, records: np.ndarray) -> None:
+    """Writes a snapshot atomically: a temporary file replaces the old one."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(records, dtype=SNAPSHOT_DTYPE))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def snapshot_row_version(records: np.ndarray) -> int:
+    """Returns the newest row version in a snapshot (0 when it is empty)."""
+    if records.size == 0:
+        return 0
+    return int(records[C.ROW_VERSION_COLUMN_NAME].max())
+
+
+# Yields are summed as integer millionths so both sides compare exactly
+FINGERPRINT_YIELD_SCALE = 1_000_000
+
+
+def snapshot_fingerprint(records: np.ndarray) -> Tuple[int, ...]:
+    """
+    Summarizes a snapshot's rows; equal to the database's fingerprint when
+    both hold the same rows.
+
+    Returns:
+        The row count and the sums of the row versions, scrape days, session
+        days and tenors, and of every yield (in millionths) times its tenor.
+    """
+    tenors = records[C.TENOR_COLUMN_NAME].astype(np.int64)
+    yields = np.trunc(records[C.YIELD_COLUMN_NAME] * FINGERPRINT_YIELD_SCALE)
+    return (
+        int(records.size),
+        int(records[C.ROW_VERSION_COLUMN_NAME].astype(np.int64).sum()),
+        int(records[C.DATE_COLUMN_NAME].astype(np.int64).sum()),
+        int(records[C.SESSION_DATE_COLUMN_NAME].astype(np.int64).sum()),
+        int(tenors.sum()),
+        int((yields.astype(np.int64) * tenors).sum()),
+    )
+
+
+def _auction_keys(records: np.ndarray) -> np.ndarray:
+    # (session day, tenor) identifies an auction; tenors are well below 10000 days
+    return records[C.SESSION_DATE_COLUMN_NAME].astype(np.int64) * 10000 + records[
+        C.TENOR_COLUMN_NAME
+    ].astype(np.int64)
+
+
+def merge_snapshot(current: Optional[np.ndarray], delta: np.ndarray) -> np.ndarray:
+    """
+    Returns `current` with the auctions of `delta` inserted or replaced.
+
+    Args:
+        current (Optional[np.ndarray]): The existing snapshot (None for a first build).
+        delta (np.ndarray): Rows written since the snapshot's row version.
+
+    Returns:
+        A new array sorted by (tenor, scrape day, session day).
+    """
+    if current is None or current.size == 0:
+        merged = np.array(delta, dtype=SNAPSHOT_DTYPE)
+    else:
+        kept = current[~np.isin(_auction_keys(current), _auction_keys(delta))]
+        merged = np.concatenate([kept, delta.astype(SNAPSHOT_DTYPE)])
+    order = np.lexsort(
+        (
+            merged[C.SESSION_DATE_COLUMN_NAME],
+            merged[C.DATE_COLUMN_NAME],
+            merged[C.TENOR_COLUMN_NAME],
+        )
+    )
+    return merged[order]
+
+
+def select_history(
+    records: np.ndarray,
+    tenors: Optional[Sequence[int]] = None,
+    start_day: Optional[int] = None,
+    end_day: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Selects a set of tenors and a scrape-day range from a snapshot.
+
+    The snapshot is sorted by (tenor, day), so every tenor is a contiguous
+    block and its day range is found with two binary searches.
+    """
+    tenor_column = records[C.TENOR_COLUMN_NAME]
+    if tenors is None:
+        tenors = np.unique(tenor_column)
+    slices = []
+    for tenor in sorted({int(t) for t in tenors}):
+        block_start, block_end = np.searchsorted(tenor_column, [tenor, tenor + 1])
+        days = records[C.DATE_COLUMN_NAME][block_start:block_end]
+        lo, hi = 0, days.size
+        if start_day is not None:
+            lo = np.searchsorted(days, start_day, side="left")
+        if end_day is not None:
+            hi = np.searchsorted(days, end_day, side="right")
+        slices.append(records[block_start + lo : block_start + max(lo, hi)])
+    return np.concatenate(slices) if slices else empty_snapshot()
+
+
+def snapshot_to_dataframe(
+    records: np.ndarray, include_row_version: bool = False
+) -> pd.DataFrame:
+    """Converts snapshot rows to the DataFrame shape of the history loaders."""
+    data = {
+        C.DATE_COLUMN_NAME: pd.to_datetime(
+            records[C.DATE_COLUMN_NAME].astype(np.int64), unit="D"
+        ),
+        C.TENOR_COLUMN_NAME: records[C.TENOR_COLUMN_NAME].astype(str),
+        C.YIELD_COLUMN_NAME: records[C.YIELD_COLUMN_NAME],
+        C.SESSION_DATE_COLUMN_NAME: pd.to_datetime(
+            records[C.SESSION_DATE_COLUMN_NAME].astype(np.int64), unit="D"
+        ),
+    }
+    if include_row_version:
+        data[C.ROW_VERSION_COLUMN_NAME] = records[C.ROW_VERSION_COLUMN_NAME].astype(
+            np.int64
+        )
+    return pd.DataFrame(data)
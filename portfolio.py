@@ -0,0 +1,273 @@
+# portfolio.py (محرك سلم الاستحقاقات لمحفظة أذون الخزانة)
+"""
+Portfolio ladder engine built on the formulas in `calculations.py`.
+
+Positions are kept in a struct-of-arrays store (one NumPy array per field)
+instead of a list of dicts, so pricing and aggregation run as whole-array
+operations even for hundreds of thousands of positions.
+"""
+import logging
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import constants as C
+from calculations import ArrayLike, calculate_primary_yield_batch
+
+if TYPE_CHECKING:
+    from asof_index import AsOfYieldIndex
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[str, date, np.datetime64, pd.Timestamp]
+
+POSITION_FIELDS = {
+    "face_value": np.float64,
+    "yield_rate": np.float64,
+    "tenor": np.int32,
+    "purchase_day": np.int32,  # Days since 1970-01-01
+    "tax_rate": np.float64,
+}
+
+MATURITY_DATE_COLUMN_NAME = "maturity_date"
+
+
+def to_epoch_days(dates: Union[DateLike, ArrayLike]) -> np.ndarray:
+    """Converts one or many dates to integer day numbers since 1970-01-01."""
+    values = pd.to_datetime(np.atleast_1d(np.asarray(dates)))
+    return np.asarray(values.values.astype("datetime64[D]").astype(np.int64))
+
+
+def from_epoch_days(days: ArrayLike) -> pd.DatetimeIndex:
+    """Converts integer day numbers since 1970-01-01 back to dates."""
+    return pd.DatetimeIndex(np.asarray(days, dtype="int64").astype("datetime64[D]"))
+
+
+class PositionStore:
+    """A compact, array-backed store of T-bill positions (struct-of-arrays)."""
+
+    def __init__(self, capacity: int = 1024):
+        self._size = 0
+        self._data: Dict[str, np.ndarray] = {
+            name: np.empty(max(capacity, 1), dtype=dtype)
+            for name, dtype in POSITION_FIELDS.items()
+        }
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, extra: int) -> None:
+        """Grows every column geometrically so appends stay amortized O(1)."""
+        needed = self._size + extra
+        capacity = len(self._data["face_value"])
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name, column in self._data.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[: self._size] = column[: self._size]
+            self._data[name] = grown
+
+    def extend(
+        self,
+        face_value: ArrayLike,
+        yield_rate: ArrayLike,
+        tenor: ArrayLike,
+        purchase_date: Union[DateLike, ArrayLike],
+        tax_rate: ArrayLike = C.DEFAULT_TAX_RATE_PERCENT,
+    ) -> None:
+        """
+        Appends many positions at once. Scalars are broadcast across the batch.
+
+        Raises:
+            ValueError: If a tenor is not a whole number of days, or any
+                position fails the validation of `calculate_primary_yield`.
+        """
+        tenor = np.atleast_1d(np.asarray(tenor, dtype=float))
+        # Checked before the int32 store would truncate 91.9 to 91
+        non_integral = ~np.isfinite(tenor) | (tenor != np.round(tenor))
+        if non_integral.any():
+            bad_rows = np.flatnonzero(non_integral)
+            raise ValueError(
+                f"Tenor must be a whole number of days; got {tenor[bad_rows[0]]} "
+                f"at rows {bad_rows[:10].tolist()}."
+            )
+        columns = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(face_value, dtype=float)),
+            np.atleast_1d(np.asarray(yield_rate, dtype=float)),
+            tenor,
+            to_epoch_days(purchase_date),
+            np.atleast_1d(np.asarray(tax_rate, dtype=float)),
+        )
+        errors = calculate_primary_yield_batch(
+            columns[0], columns[1], columns[2], columns[4]
+        )["error"]
+        if errors.notna().any():
+            bad_rows = np.flatnonzero(errors.notna().to_numpy())
+            raise ValueError(
+                f"Invalid position(s) at rows {bad_rows[:10].tolist()}: "
+                f"{errors.iloc[bad_rows[0]]}"
+            )
+
+        count = len(columns[0])
+        self._reserve(count)
+        for name, values in zip(POSITION_FIELDS, columns):
+            self._data[name][self._size : self._size + count] = values
+        self._size += count
+
+    def add(
+        self,
+        face_value: float,
+        yield_rate: float,
+        tenor: int,
+        purchase_date: DateLike,
+        tax_rate: float = C.DEFAULT_TAX_RATE_PERCENT,
+    ) -> None:
+        """Appends a single position."""
+        self.extend(face_value, yield_rate, tenor, purchase_date, tax_rate)
+
+    @classmethod
+    def from_dataframe(
+        cls, df: pd.DataFrame, yield_index: Optional["AsOfYieldIndex"] = None
+    ) -> "PositionStore":
+        """
+        Builds a store from a DataFrame with the columns `face_value`,
+        `yield_rate`, `tenor`, `purchase_date` and, optionally, `tax_rate`.
+
+        With a `yield_index`, a missing `yield_rate` column or missing values
+        in it are filled with the auction yield in effect on each purchase
+        date, in one vectorized lookup.
+        """
+        store = cls(capacity=len(df))
+        if df.empty:
+            return store
+        yield_rate = (
+            df["yield_rate"].to_numpy(dtype=float)
+            if "yield_rate" in df.columns
+            else np.full(len(df), np.nan)
+        )
+        if yield_index is not None:
+            missing = np.isnan(yield_rate)
+            if missing.any():
+                yield_rate = yield_rate.copy()
+                yield_rate[missing] = yield_index.yields_on(
+                    df["tenor"].to_numpy()[missing],
+                    df["purchase_date"].to_numpy()[missing],
+                )
+        store.extend(
+            df["face_value"].to_numpy(),
+            yield_rate,
+            df["tenor"].to_numpy(),
+            df["purchase_date"].to_numpy(),
+            (
+                df["tax_rate"].to_numpy()
+                if "tax_rate" in df.columns
+                else C.DEFAULT_TAX_RATE_PERCENT
+            ),
+        )
+        return store
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a read-only view of one column, trimmed to the stored positions."""
+        view = self._data[name][: self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def maturity_day(self) -> np.ndarray:
+        """Maturity dates as day numbers since 1970-01-01."""
+        return self.column("purchase_day").astype(np.int64) + self.column("tenor")
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns the positions as a regular DataFrame (one row per position)."""
+        df = pd.DataFrame({name: self.column(name) for name in POSITION_FIELDS})
+        df["purchase_date"] = from_epoch_days(df.pop("purchase_day"))
+        return df
+
+
+def price_positions(store: PositionStore) -> pd.DataFrame:
+    """Prices every position with `calculate_primary_yield_batch`."""
+    return calculate_primary_yield_batch(
+        store.column("face_value"),
+        store.column("yield_rate"),
+        store.column("tenor"),
+        store.column("tax_rate"),
+    )
+
+
+def maturity_ladder(store: PositionStore) -> pd.DataFrame:
+    """
+    Aggregates the portfolio's cash flows by maturity date.
+
+    Returns:
+        A DataFrame with one row per maturity date: the number of positions,
+        the face value paid out, the tax due on that date and the net income.
+    """
+    columns = [
+        MATURITY_DATE_COLUMN_NAME,
+        "positions",
+        "face_value",
+        "purchase_price",
+        "gross_return",
+        "tax_due",
+        "net_income",
+    ]
+    if len(store) == 0:
+        return pd.DataFrame(columns=columns)
+
+    priced = price_positions(store)
+    maturity_days, inverse = np.unique(store.maturity_day, return_inverse=True)
+
+    def _sum_by_date(values: np.ndarray) -> np.ndarray:
+        return np.bincount(inverse, weights=values, minlength=len(maturity_days))
+
+    ladder = pd.DataFrame(
+        {
+            MATURITY_DATE_COLUMN_NAME: from_epoch_days(maturity_days),
+            "positions": np.bincount(inverse, minlength=len(maturity_days)),
+            "face_value": _sum_by_date(store.column("face_value")),
+            "purchase_price": _sum_by_date(priced["purchase_price"].to_numpy()),
+            "gross_return": _sum_by_date(priced["gross_return"].to_numpy()),
+            # Tax is deducted on the maturity date (see the app's help section)
+            "tax_due": _sum_by_date(priced["tax_amount"].to_numpy()),
+            "net_income": _sum_by_date(priced["net_return"].to_numpy()),
+        }
+    )
+    return ladder[columns]
+
+
+def portfolio_summary(
+    store: PositionStore, as_of: Optional[DateLike] = None
+) -> Dict[str, Any]:
+    """
+    Rolls up the whole portfolio into a few totals.
+
+    Args:
+        store (PositionStore): The positions to summarize.
+        as_of (Optional[DateLike]): If given, also reports the totals still
+            outstanding (maturing after this date).
+
+    Returns:
+        A dictionary of portfolio-level totals.
+    """
+    priced = price_positions(store)
+    summary: Dict[str, Any] = {
+        "positions": len(store),
+        "total_face_value": float(store.column("face_value").sum()),
+        "total_invested": float(priced["purchase_price"].sum()),
+        "total_gross_return": float(priced["gross_return"].sum()),
+        "total_tax_due": float(priced["tax_amount"].sum()),
+        "total_net_income": float(priced["net_return"].sum()),
+    }
+    if as_of is not None:
+        outstanding = store.maturity_day > to_epoch_days(as_of)[0]
+        summary["outstanding_positions"] = int(outstanding.sum())
+        summary["outstanding_face_value"] = float(
+            store.column("face_value")[outstanding].sum()
+        )
+        summary["outstanding_tax_due"] = float(
+            priced["tax_amount"].to_numpy()[outstanding].sum()
+        )
+    return summary
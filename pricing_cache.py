@@ -0,0 +1,132 @@
+# pricing_cache.py (طبقة تخزين مؤقت لنتائج الحاسبات)
+"""
+Memoized pricing layer in front of `calculate_primary_yield` and
+`analyze_secondary_sale`.
+
+Keys are the normalized (rounded) inputs plus the data version, so the same
+preset asked for by many sessions is computed once. The cache is bounded and
+evicts the least recently used entry; it is safe to share between threads.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from calculations import calculate_primary_yield, analyze_secondary_sale
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_PRECISION = 6
+
+
+class PricingCache:
+    """A thread-safe, bounded LRU cache for pricing results."""
+
+    def __init__(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, precision: int = DEFAULT_PRECISION
+    ):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be a positive integer.")
+        self.max_entries = max_entries
+        self.precision = precision
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _normalize(self, value: float) -> float:
+        # Rounding makes 25000 and 25000.0000001 share one entry
+        return round(float(value), self.precision)
+
+    @staticmethod
+    def _whole_days(value: float, name: str) -> int:
+        """Returns a day count as an int; 91.9 must not share the key of 91."""
+        days = float(value)
+        if not days.is_integer():
+            raise ValueError(f"{name} must be a whole number of days, got {value!r}.")
+        return int(days)
+
+    def get_or_compute(
+        self, key: Hashable, compute: Callable[[], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Returns the cached result for `key`, computing and storing it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(self._entries[key])
+            self.misses += 1
+
+        # Computing outside the lock keeps other sessions from waiting on us
+        result = compute()
+
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(result)
+
+    def primary_yield(
+        self,
+        face_value: float,
+        yield_rate: float,
+        tenor: int,
+        tax_rate: float,
+        data_version: Optional[Hashable] = None,
+    ) -> Dict[str, Any]:
+        """Cached `calculate_primary_yield`."""
+        args: Tuple[Any, ...] = (
+            self._normalize(face_value),
+            self._normalize(yield_rate),
+            self._whole_days(tenor, "tenor"),
+            self._normalize(tax_rate),
+        )
+        return self.get_or_compute(
+            ("primary", data_version) + args,
+            lambda: calculate_primary_yield(*args),
+        )
+
+    def secondary_sale(
+        self,
+        face_value: float,
+        original_yield: float,
+        original_tenor: int,
+        holding_days: int,
+        secondary_yield: float,
+        tax_rate: float,
+        data_version: Optional[Hashable] = None,
+    ) -> Dict[str, Any]:
+        """Cached `analyze_secondary_sale`."""
+        args: Tuple[Any, ...] = (
+            self._normalize(face_value),
+            self._normalize(original_yield),
+            self._whole_days(original_tenor, "original_tenor"),
+            self._whole_days(holding_days, "holding_days"),
+            self._normalize(secondary_yield),
+            self._normalize(tax_rate),
+        )
+        return self.get_or_compute(
+            ("secondary", data_version) + args,
+            lambda: analyze_secondary_sale(*args),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Drops every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,142 @@
+# retry_policy.py (سياسة إعادة المحاولة: تأخير أُسّي مع عشوائية ومهلة إجمالية وتصنيف الأخطاء)
+"""
+Retry policy of the CBE scraper.
+
+`RetryPolicy` bounds a scrape in two ways: a number of attempts and an
+overall deadline. The wait between attempts grows exponentially and is
+jittered, so retries after a CBE outage do not all arrive at once. Every
+attempt's own timeouts (HTTP, page load, render wait) are clamped to what is
+left of the deadline by `Deadline.clamp`, so a caller gets an answer within
+its budget instead of after `attempts x (timeout + delay)`.
+
+`is_retryable` sorts errors into transient ones (timeouts, dropped
+connections, 5xx/429 answers, a crashed browser, a busy database), which
+are worth another attempt, and fatal ones (4xx answers, no browser
+available, programming errors), which end the scrape at once.
+"""
+import random
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import requests
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+import constants as C
+
+# Answers that may succeed when asked again
+RETRYABLE_HTTP_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class DriverStartupError(RuntimeError):
+    """Chrome could not be started; retrying will not start it either."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Returns True if `error` is transient and the scrape may be retried."""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is not None and response.status_code in RETRYABLE_HTTP_STATUSES
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, DriverStartupError):
+        return False
+    if isinstance(error, (TimeoutException, WebDriverException)):
+        # DriverManager replaces a browser that failed, so the next try is clean
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return "locked" in message or "busy" in message
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class Deadline:
+    """The time left of an overall budget; None means no deadline."""
+
+    def __init__(
+        self,
+        seconds: Optional[float],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._expires_at = None if seconds is None else clock() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left (infinite without a deadline, never negative)."""
+        if self._expires_at is None:
+            return float("inf")
+        return max(0.0, self._expires_at - self._clock())
+
+    def clamp(self, timeout: float) -> float:
+        """Shortens a timeout so it ends with the deadline (at least one second)."""
+        return max(1.0, min(timeout, self.remaining()))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How often and how long to retry a scrape.
+
+    Attributes:
+        max_attempts (int): Attempts in total, the first one included.
+        base_delay (float): The wait after the first failed attempt, in seconds.
+        max_delay (float): The cap of the exponential wait.
+        multiplier (float): The growth of the wait per attempt.
+        jitter (float): The fraction of each wait that is randomized: the wait
+            is drawn from [(1 - jitter) x delay, delay].
+        deadline (Optional[float]): The overall budget in seconds, waits
+            included; None for no deadline.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 5.0
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    deadline: Optional[float] = None
+    rng: random.Random = field(default_factory=random.Random, compare=False, repr=False)
+
+    @classmethod
+    def scheduled(cls) -> "RetryPolicy":
+        """The policy of the scheduled update job, from `constants.py`."""
+        return cls(
+            max_attempts=C.SCRAPER_RETRIES,
+            base_delay=C.SCRAPER_RETRY_BASE_DELAY_SECONDS,
+            max_delay=C.SCRAPER_RETRY_MAX_DELAY_SECONDS,
+            deadline=C.SCRAPER_DEADLINE_SECONDS,
+        )
+
+    @classmethod
+    def interactive(cls) -> "RetryPolicy":
+        """A short policy for callers that block a user, like the app's refresh button."""
+        return cls(
+            max_attempts=C.APP_SCRAPER_RETRIES,
+            base_delay=C.SCRAPER_RETRY_BASE_DELAY_SECONDS,
+            max_delay=C.SCRAPER_RETRY_MAX_DELAY_SECONDS,
+            deadline=C.APP_SCRAPER_DEADLINE_SECONDS,
+        )
+
+    def start(self) -> Deadline:
+        """Starts the clock of the overall budget."""
+        return Deadline(self.deadline)
+
+    def backoff(self, attempt: int) -> float:
+        """Returns the jittered wait after failed attempt number `attempt` (from 1)."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay * (1 - self.jitter * self.rng.random())
+
+    def next_delay(self, attempt: int, deadline: Deadline) -> Optional[float]:
+        """
+        Decides whether to try again after failed attempt number `attempt`.
+
+        Returns:
+            The wait before the next attempt, or None if the attempts are used
+            up or the deadline would pass during the wait.
+        """
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        if delay >= deadline.remaining():
+            return None
+        return delay
@@ -0,0 +1,87 @@
+# scrape_state.py (حالة آخر صفحة تم حفظها من البنك المركزي لتخطي التشغيلات التي لا جديد فيها)
+"""
+Validators of the last CBE page whose results were parsed and saved.
+
+The record is a small JSON file next to the database, so it travels with the
+database file (the scheduled workflow commits both). It keeps the `ETag` and
+`Last-Modified` headers of that response, sent back as a conditional GET, and
+a hash of its results section for servers that ignore those headers and for
+pages rendered by Selenium. A scrape whose page matches either stops before
+parsing and before opening a write on the database.
+
+It also keeps the date of that scrape. The database moves `last_seen` only
+when a scrape changed some auction, so this is where a scrape that parsed a
+page with no new results is recorded.
+
+Delete the file to force the next scrape to parse and save the page again.
+"""
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Optional
+
+import constants as C
+from db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+def scrape_state_path(db_manager: DatabaseManager) -> Optional[str]:
+    """Returns the state file of a database, or None for in-memory databases."""
+    if db_manager.is_memory:
+        return None
+    return os.path.splitext(db_manager.db_filename)[0] + C.SCRAPE_STATE_SUFFIX
+
+
+@dataclass
+class ScrapeState:
+    """What identified the last saved page: its URL, validators, results hash and date."""
+
+    url: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    results_hash: Optional[str] = None
+    scraped_on: Optional[str] = None
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "ScrapeState":
+        """Reads the state file; a missing or unreadable file gives an empty state."""
+        if path is None or not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(**{field.name: data.get(field.name) for field in fields(cls)})
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable scrape state {path}: {e}")
+            return cls()
+
+    def save(self, path: Optional[str]) -> None:
+        """Writes the state file atomically (nothing to do without a path)."""
+        if path is None:
+            return
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(temp_path, path)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Returns the If-None-Match / If-Modified-Since headers for `url`."""
+        if url != self.url:
+            return {}
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def matches(self, url: str, results_hash: Optional[str]) -> bool:
+        """True if `url` still shows the results that were saved last time."""
+        return (
+            results_hash is not None
+            and url == self.url
+            and results_hash == self.results_hash
+        )
@@ -0,0 +1,205 @@
+# simulation.py (محاكاة إعادة استثمار أذون الخزانة بطريقة مونت كارلو)
+"""
+Monte Carlo projection of rolling a T-bill investment over several years.
+
+Every roll's yield is resampled from the auction history (as returned by
+`DatabaseManager.load_all_historical_data`, or its memory-mapped snapshot). Paths are split into fixed-size
+chunks that run on a process pool; each chunk gets its own child seed from
+one `SeedSequence`, so results are identical for any number of workers.
+"""
+import argparse
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+import constants as C
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _simulate_chunk(
+    yields: np.ndarray,
+    n_paths: int,
+    n_rolls: int,
+    tenor: int,
+    tax_rate: float,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """
+    Simulates one chunk of paths and returns each path's total growth factor.
+
+    The net return of one roll, relative to the price paid, is
+    `yield / 100 * tenor / 365 * (1 - tax / 100)`, so compounding a path is a
+    product over its sampled yields - done for the whole chunk at once.
+    """
+    rng = np.random.default_rng(seed)
+    sampled = rng.choice(yields, size=(n_paths, n_rolls), replace=True)
+    growth = 1 + (sampled / 100.0 * tenor / C.DAYS_IN_YEAR) * (1 - tax_rate / 100.0)
+    return np.prod(growth, axis=1)
+
+
+def simulate_rollover(
+    historical_df: Union[pd.DataFrame, np.ndarray],
+    face_value: float,
+    years: float,
+    tenor: int = 364,
+    tax_rate: float = C.DEFAULT_TAX_RATE_PERCENT,
+    n_paths: int = 20000,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    chunk_size: int = 2500,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+) -> Dict[str, Any]:
+    """
+    Projects the return of rolling `face_value` through successive T-bills.
+
+    Args:
+        historical_df: The auction history to resample from, as a DataFrame or
+            as the structured array of `DatabaseManager.load_history_snapshot`.
+        face_value (float): The amount invested at the start of every path.
+        years (float): The investment horizon in years.
+        tenor (int): The tenor that is bought and rolled over.
+        tax_rate (float): The tax rate on profits.
+        n_paths (int): The number of simulated paths.
+        seed (int): The root seed; the same seed always gives the same result.
+        workers (Optional[int]): Process pool size (defaults to the CPU count).
+            Use 1 to run in the calling process.
+        chunk_size (int): Paths per task submitted to the pool.
+        percentiles (Sequence[float]): The percentiles to report.
+
+    Returns:
+        A dictionary with the return distribution percentiles, the run's
+        throughput (`paths_per_sec`) or an error message.
+    """
+    if face_value <= 0 or years <= 0 or n_paths <= 0:
+        return {
+            "error": "القيمة الإسمية، عدد السنوات، وعدد المسارات يجب أن تكون أرقامًا موجبة."
+        }
+
+    if isinstance(historical_df, np.ndarray):
+        # Snapshot columns are mapped arrays: select without building a DataFrame
+        yields = np.asarray(
+            historical_df[C.YIELD_COLUMN_NAME][
+                historical_df[C.TENOR_COLUMN_NAME] == tenor
+            ],
+            dtype=float,
+        )
+    elif historical_df.empty:
+        yields = np.array([])
+    else:
+        tenors = pd.to_numeric(historical_df[C.TENOR_COLUMN_NAME], errors="coerce")
+        yields = (
+            historical_df.loc[tenors == tenor, C.YIELD_COLUMN_NAME]
+            .dropna()
+            .to_numpy(dtype=float)
+        )
+    if yields.size == 0:
+        return {"error": f"لا توجد بيانات تاريخية لأجل {tenor} يوم."}
+
+    n_rolls = max(1, int(years * C.DAYS_IN_YEAR // tenor))
+    chunk_sizes = [
+        min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    workers = workers or os.cpu_count() or 1
+
+    logger.info(
+        f"Simulating {n_paths} paths x {n_rolls} rolls of {tenor} days "
+        f"in {len(chunk_sizes)} chunks on {workers} worker(s)."
+    )
+    start_time = time.perf_counter()
+    if workers == 1 or len(chunk_sizes) == 1:
+        chunks = [
+            _simulate_chunk(yields, size, n_rolls, tenor, tax_rate, chunk_seed)
+            for size, chunk_seed in zip(chunk_sizes, seeds)
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(
+                pool.map(
+                    _simulate_chunk,
+                    [yields] * len(chunk_sizes),
+                    chunk_sizes,
+                    [n_rolls] * len(chunk_sizes),
+                    [tenor] * len(chunk_sizes),
+                    [tax_rate] * len(chunk_sizes),
+                    seeds,
+                )
+            )
+    growth = np.concatenate(chunks)
+    elapsed = time.perf_counter() - start_time
+    paths_per_sec = n_paths / elapsed if elapsed > 0 else math.inf
+    logger.info(
+        f"Simulation finished in {elapsed:.3f}s ({paths_per_sec:,.0f} paths/sec)."
+    )
+
+    total_return = (growth - 1) * 100
+    horizon_years = n_rolls * tenor / C.DAYS_IN_YEAR
+    annualized_return = (growth ** (1 / horizon_years) - 1) * 100
+
+    return {
+        "error": None,
+        "paths": n_paths,
+        "rolls": n_rolls,
+        "horizon_days": n_rolls * tenor,
+        "percentiles": dict(zip(percentiles, np.percentile(total_return, percentiles))),
+        "annualized_percentiles": dict(
+            zip(percentiles, np.percentile(annualized_return, percentiles))
+        ),
+        "final_value_percentiles": dict(
+            zip(percentiles, np.percentile(face_value * growth, percentiles))
+        ),
+        "mean_total_return": float(total_return.mean()),
+        "elapsed_seconds": elapsed,
+        "paths_per_sec": paths_per_sec,
+    }
+
+
+if __name__ == "__main__":
+    from db_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(
+        description="Monte Carlo T-bill rollover projection."
+    )
+    parser.add_argument("--face-value", type=float, default=100000.0)
+    parser.add_argument("--years", type=float, default=5.0)
+    parser.add_argument("--tenor", type=int, default=364)
+    parser.add_argument("--paths", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    db_manager = DatabaseManager()
+    history = db_manager.load_history_snapshot()
+    if history is None:
+        history = db_manager.load_all_historical_data()
+    result = simulate_rollover(
+        history,
+        args.face_value,
+        args.years,
+        tenor=args.tenor,
+        n_paths=args.paths,
+        seed=args.seed,
+        workers=args.workers,
+    )
+    if result["error"]:
+        print(result["error"])
+    else:
+        for p, value in result["percentiles"].items():
+            print(
+                f"P{p:g}: total return {value:.2f}%  (annualized {result['annualized_percentiles'][p]:.2f}%)"
+            )
+        print(
+            f"{result['paths']} paths in {result['elapsed_seconds']:.3f}s -> {result['paths_per_sec']:,.0f} paths/sec"
+        )
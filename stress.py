@@ -0,0 +1,248 @@
+# stress.py (اختبارات الضغط لمحفظة الأذون تحت صدمات منحنى العائد)
+"""
+Curve-shift stress testing for a portfolio of T-bill positions.
+
+Every live position is marked to market on the current yield curve and then
+re-priced under each scenario with the `analyze_secondary_sale` formula. The
+positions x scenarios matrix is computed with broadcasting in a single pass,
+or in chunks of positions when the matrix would exceed the memory budget.
+`stress_test_portfolio` returns every result in one frame, whatever its
+size; `iter_stress_test` yields them chunk by chunk, with the results counted
+in the budget, for grids whose full result frame should not be built.
+"""
+import logging
+from typing import Dict, Iterable, Iterator, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import constants as C
+from portfolio import DateLike, PositionStore, to_epoch_days
+from yield_curve import YieldCurve
+
+logger = logging.getLogger(__name__)
+
+# Scenario name -> (parallel shift in bp, twist in bp). A twist of X bp moves
+# the short end (91 days) by -X/2 and the long end (364 days) by +X/2.
+DEFAULT_SCENARIOS: Dict[str, Tuple[float, float]] = {
+    "parallel -200bp": (-200.0, 0.0),
+    "parallel -100bp": (-100.0, 0.0),
+    "parallel -50bp": (-50.0, 0.0),
+    "parallel -25bp": (-25.0, 0.0),
+    "parallel +25bp": (25.0, 0.0),
+    "parallel +50bp": (50.0, 0.0),
+    "parallel +100bp": (100.0, 0.0),
+    "parallel +200bp": (200.0, 0.0),
+    "steepener 50bp": (0.0, 50.0),
+    "steepener 100bp": (0.0, 100.0),
+    "flattener 50bp": (0.0, -50.0),
+}
+
+TWIST_SHORT_END_DAYS = 91
+TWIST_LONG_END_DAYS = 364
+DEFAULT_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+# Float64 matrices alive at the same time while pricing one chunk
+_MATRICES_PER_CELL = 8
+# One 8-byte value for each of the 8 result columns (scenario names are shared)
+_RESULT_BYTES_PER_ROW = 8 * 8
+_MATRIX_BYTES_PER_CELL = _MATRICES_PER_CELL * 8
+# A chunk's working matrices plus its result frame, per (position, scenario)
+_BYTES_PER_CELL = _MATRIX_BYTES_PER_CELL + _RESULT_BYTES_PER_ROW
+
+STRESS_COLUMNS = [
+    "position",
+    "scenario",
+    "parallel_bp",
+    "twist_bp",
+    "market_yield",
+    "sale_price",
+    "net_profit",
+    "pnl",
+]
+
+
+def scenario_shifts(
+    remaining_days: np.ndarray, scenarios: Dict[str, Tuple[float, float]]
+) -> np.ndarray:
+    """
+    Returns the yield shift, in percentage points, for every (position, scenario).
+
+    Args:
+        remaining_days (np.ndarray): Days to maturity of each position.
+        scenarios: Scenario name -> (parallel bp, twist bp).
+
+    Returns:
+        A (positions x scenarios) array.
+    """
+    parallel_bp, twist_bp = (np.array(v, dtype=float) for v in zip(*scenarios.values()))
+    span = TWIST_LONG_END_DAYS - TWIST_SHORT_END_DAYS
+    position_on_curve = (
+        np.clip(remaining_days, TWIST_SHORT_END_DAYS, TWIST_LONG_END_DAYS)
+        - TWIST_SHORT_END_DAYS
+    ) / span - 0.5
+    shift_bp = parallel_bp[np.newaxis, :] + (
+        position_on_curve[:, np.newaxis] * twist_bp[np.newaxis, :]
+    )
+    return shift_bp / 100.0
+
+
+def _live_positions(
+    store: PositionStore, valuation_date: DateLike
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the indexes of the live positions, and every tenor and holding period."""
+    valuation_day = to_epoch_days(valuation_date)[0]
+    tenor = store.column("tenor").astype(np.int64)
+    holding_days = valuation_day - store.column("purchase_day").astype(np.int64)
+    live = np.flatnonzero((holding_days >= 1) & (holding_days < tenor))
+    return live, tenor, holding_days
+
+
+def iter_stress_test(
+    store: PositionStore,
+    curve: YieldCurve,
+    valuation_date: DateLike,
+    scenarios: Dict[str, Tuple[float, float]] = DEFAULT_SCENARIOS,
+    memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the stress results chunk by chunk of positions.
+
+    Each chunk is sized so its intermediate matrices and its own result frame
+    fit in `memory_budget_bytes` together; consuming the chunks one at a time
+    (e.g. with `summarize_stress`) keeps the whole run within the budget,
+    whatever the size of the grid. Arguments and columns are those of
+    `stress_test_portfolio`.
+    """
+    return _stress_chunks(
+        store, curve, valuation_date, scenarios, memory_budget_bytes, _BYTES_PER_CELL
+    )
+
+
+def _stress_chunks(
+    store: PositionStore,
+    curve: YieldCurve,
+    valuation_date: DateLike,
+    scenarios: Dict[str, Tuple[float, float]],
+    memory_budget_bytes: int,
+    bytes_per_cell: int,
+) -> Iterator[pd.DataFrame]:
+    """Yields the results in chunks of `memory_budget_bytes // bytes_per_cell` cells."""
+    if not scenarios or len(store) == 0:
+        return
+
+    live, tenor, holding_days = _live_positions(store, valuation_date)
+    if live.size == 0:
+        logger.warning("No live positions on the valuation date. Nothing to stress.")
+        return
+
+    names = np.array(list(scenarios.keys()), dtype=object)
+    parallel_bp, twist_bp = (np.array(v, dtype=float) for v in zip(*scenarios.values()))
+    bytes_per_position = len(scenarios) * bytes_per_cell
+    chunk_size = max(1, int(memory_budget_bytes // bytes_per_position))
+    if chunk_size < live.size:
+        logger.info(
+            f"Stress matrix exceeds the memory budget; evaluating {live.size} "
+            f"positions in chunks of {chunk_size}."
+        )
+
+    for start in range(0, live.size, chunk_size):
+        idx = live[start : start + chunk_size]
+        face_value = store.column("face_value")[idx][:, np.newaxis]
+        original_yield = store.column("yield_rate")[idx][:, np.newaxis]
+        tax_rate = store.column("tax_rate")[idx][:, np.newaxis]
+        original_tenor = tenor[idx][:, np.newaxis]
+        remaining_days = (tenor[idx] - holding_days[idx]).astype(float)
+
+        base_yield = np.asarray(curve.yield_for(remaining_days))[:, np.newaxis]
+        market_yield = np.maximum(
+            base_yield + scenario_shifts(remaining_days, scenarios), 0.0
+        )
+
+        # Same formulas as analyze_secondary_sale, broadcast over scenarios
+        original_purchase_price = face_value / (
+            1 + (original_yield / 100.0 * original_tenor / C.DAYS_IN_YEAR)
+        )
+        remaining = remaining_days[:, np.newaxis]
+        base_sale_price = face_value / (
+            1 + (base_yield / 100.0 * remaining / C.DAYS_IN_YEAR)
+        )
+        sale_price = face_value / (
+            1 + (market_yield / 100.0 * remaining / C.DAYS_IN_YEAR)
+        )
+        gross_profit = sale_price - original_purchase_price
+        tax_amount = np.maximum(0, gross_profit * (tax_rate / 100.0))
+        net_profit = gross_profit - tax_amount
+
+        n_positions, n_scenarios = sale_price.shape
+        yield pd.DataFrame(
+            {
+                "position": np.repeat(idx, n_scenarios),
+                "scenario": np.tile(names, n_positions),
+                "parallel_bp": np.tile(parallel_bp, n_positions),
+                "twist_bp": np.tile(twist_bp, n_positions),
+                "market_yield": market_yield.ravel(),
+                "sale_price": sale_price.ravel(),
+                "net_profit": net_profit.ravel(),
+                "pnl": (sale_price - base_sale_price).ravel(),
+            }
+        )
+
+
+def stress_test_portfolio(
+    store: PositionStore,
+    curve: YieldCurve,
+    valuation_date: DateLike,
+    scenarios: Dict[str, Tuple[float, float]] = DEFAULT_SCENARIOS,
+    memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+) -> pd.DataFrame:
+    """
+    Computes the P&L of every live position under every curve scenario.
+
+    Args:
+        store (PositionStore): The portfolio.
+        curve (YieldCurve): The current market curve (the base scenario).
+        valuation_date (DateLike): The date the positions would be sold on.
+        scenarios: Scenario name -> (parallel bp, twist bp).
+        memory_budget_bytes (int): Upper bound for the intermediate matrices;
+            above it, positions are processed in chunks. The returned frame
+            is not counted: callers that need the total memory bounded should
+            consume `iter_stress_test` instead.
+
+    Returns:
+        A tidy DataFrame with one row per (position, scenario): the shifted
+        market yield, the sale price, the post-tax net profit of selling and
+        the P&L versus selling at the base curve. Positions that are not live
+        on the valuation date (not yet bought, or already matured) are skipped.
+    """
+    frames = list(
+        _stress_chunks(
+            store,
+            curve,
+            valuation_date,
+            scenarios,
+            memory_budget_bytes,
+            _MATRIX_BYTES_PER_CELL,
+        )
+    )
+    if not frames:
+        return pd.DataFrame(columns=STRESS_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_stress(
+    results: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+) -> pd.DataFrame:
+    """
+    Totals the stress results per scenario (portfolio-level P&L).
+
+    Accepts the frame of `stress_test_portfolio` or the chunks of
+    `iter_stress_test`; chunks are totalled one at a time.
+    """
+    chunks = [results] if isinstance(results, pd.DataFrame) else results
+    totals = [
+        chunk.groupby("scenario", sort=False)[["pnl", "net_profit"]].sum()
+        for chunk in chunks
+    ]
+    if not totals:
+        return pd.DataFrame(columns=["scenario", "pnl", "net_profit"])
+    return pd.concat(totals).groupby(level=0, sort=False).sum().reset_index()
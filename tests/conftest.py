@@ -0,0 +1,33 @@
+# tests/conftest.py
+import sys
+import os
+import pandas as pd
+import pytest
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import constants as C
+
+
+@pytest.fixture
+def scrape():
+    """
+    يُرجع دالة تبني DataFrame بنفس شكل ناتج parse_cbe_html:
+    scrape(date_str, tenors, yields)، وتاريخ الجلسة هو نفس يوم الجلب.
+    """
+
+    def build(date_str, tenors, yields):
+        return pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: [date_str] * len(tenors),
+                C.TENOR_COLUMN_NAME: tenors,
+                C.YIELD_COLUMN_NAME: yields,
+                C.SESSION_DATE_COLUMN_NAME: [
+                    pd.Timestamp(date_str).strftime(C.SESSION_DATE_FORMAT)
+                ]
+                * len(tenors),
+            }
+        )
+
+    return build
@@ -0,0 +1,176 @@
+# tests/test_aggregates.py
+import sys
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from aggregates import rebuild_aggregates, week_start
+from db_manager import DatabaseManager
+import constants as C
+
+
+def _auctions(session_dates, tenor, yields):
+    """يبني نتيجة جلب لعدة عطاءات لأجل واحد (كل عطاء يُرى في يوم جلسته)."""
+    sessions = pd.to_datetime(session_dates, format=C.SESSION_DATE_FORMAT)
+    return pd.DataFrame(
+        {
+            C.DATE_COLUMN_NAME: sessions,
+            C.TENOR_COLUMN_NAME: [tenor] * len(yields),
+            C.YIELD_COLUMN_NAME: yields,
+            C.SESSION_DATE_COLUMN_NAME: sessions,
+        }
+    )
+
+
+def _aggregate_rows(db_manager):
+    """يقرأ جدولي المؤشرات كما هما في قاعدة البيانات."""
+    with db_manager._connection() as conn:
+        auctions = conn.execute(
+            f'SELECT * FROM "{C.AGGREGATES_TABLE_NAME}" ORDER BY 1, 2'
+        ).fetchall()
+        weeks = conn.execute(
+            f'SELECT * FROM "{C.WEEKLY_TABLE_NAME}" ORDER BY 1, 2'
+        ).fetchall()
+    return auctions, weeks
+
+
+def _rebuilt_rows(db_manager):
+    """يعيد حساب المؤشرات من الصفر على نسخة من قاعدة البيانات للمقارنة."""
+    copy = sqlite3.connect(":memory:")
+    with db_manager._connection() as conn:
+        conn.backup(copy)
+    rebuild_aggregates(copy.cursor())
+    auctions = copy.execute(
+        f'SELECT * FROM "{C.AGGREGATES_TABLE_NAME}" ORDER BY 1, 2'
+    ).fetchall()
+    weeks = copy.execute(
+        f'SELECT * FROM "{C.WEEKLY_TABLE_NAME}" ORDER BY 1, 2'
+    ).fetchall()
+    copy.close()
+    return auctions, weeks
+
+
+def test_moving_average_is_maintained_on_save():
+    """
+    🧪 يختبر أن المتوسط المتحرك لآخر 4 عطاءات يُحدَّث مع كل عطاء جديد دون إعادة حساب.
+    """
+    db_manager = DatabaseManager(":memory:")
+    dates = ["05/01/2025", "12/01/2025", "19/01/2025", "26/01/2025", "02/02/2025"]
+    yields = [25.0, 26.0, 27.0, 28.0, 29.0]
+    for session_date, yield_ in zip(dates, yields):
+        db_manager.save_data(_auctions([session_date], 91, [yield_]))
+
+    df = db_manager.load_moving_averages()
+    assert list(df[C.TENOR_COLUMN_NAME]) == ["91"] * 5
+    assert list(df[C.MOVING_AVERAGE_COLUMN_NAME]) == pytest.approx(
+        [25.0, 25.5, 26.0, 26.5, 27.5]
+    )
+    assert df[C.SESSION_DATE_COLUMN_NAME].iloc[-1] == pd.Timestamp("2025-02-02")
+
+
+def test_incremental_aggregates_match_a_full_rebuild():
+    """
+    🧪 يختبر أن المؤشرات المحدثة تدريجيًا (عطاءات متأخرة وعوائد معدلة) تطابق إعادة الحساب الكاملة.
+    """
+    db_manager = DatabaseManager(":memory:")
+    rng = np.random.default_rng(7)
+    sessions = pd.date_range("2025-01-05", periods=12, freq="7D")
+    order = rng.permutation(len(sessions))
+    for i in order:
+        session_date = sessions[i].strftime(C.SESSION_DATE_FORMAT)
+        db_manager.save_data(
+            pd.concat(
+                [
+                    _auctions([session_date], 91, [20 + rng.random()]),
+                    _auctions([session_date], 364, [18 + rng.random()]),
+                ]
+            )
+        )
+    # Revisions of already stored auctions
+    for i in (0, 5, 11):
+        session_date = sessions[i].strftime(C.SESSION_DATE_FORMAT)
+        db_manager.save_data(_auctions([session_date], 91, [30.0 + i]))
+
+    incremental_auctions, incremental_weeks = _aggregate_rows(db_manager)
+    rebuilt_auctions, rebuilt_weeks = _rebuilt_rows(db_manager)
+    assert len(incremental_auctions) == 24
+    for got, expected in zip(incremental_auctions, rebuilt_auctions):
+        assert got == pytest.approx(expected)
+    for got, expected in zip(incremental_weeks, rebuilt_weeks):
+        assert got == pytest.approx(expected)
+
+
+def test_weekly_averages_and_spread():
+    """
+    🧪 يختبر المتوسط الأسبوعي والفارق بين أجل 364 وأجل 91 يومًا من جدول المؤشرات.
+    """
+    db_manager = DatabaseManager(":memory:")
+    # Sunday 06/07 and Monday 07/07 are in the same week, Thursday 10/07 too
+    db_manager.save_data(_auctions(["06/07/2025", "10/07/2025"], 364, [25.0, 25.5]))
+    db_manager.save_data(_auctions(["07/07/2025"], 91, [27.5]))
+    db_manager.save_data(_auctions(["13/07/2025"], 364, [24.0]))
+
+    weekly = db_manager.load_weekly_averages()
+    week_364 = weekly[weekly[C.TENOR_COLUMN_NAME] == "364"]
+    assert list(week_364[C.WEEK_START_COLUMN_NAME]) == [
+        pd.Timestamp("2025-07-06"),
+        pd.Timestamp("2025-07-13"),
+    ]
+    assert list(week_364[C.YIELD_COLUMN_NAME]) == pytest.approx([25.25, 24.0])
+    assert list(week_364["auction_count"]) == [2, 1]
+
+    spreads = db_manager.load_weekly_spreads()
+    assert len(spreads) == 1, "الفارق يحتاج الأجلين في نفس الأسبوع"
+    assert spreads["spread"].iloc[0] == pytest.approx(25.25 - 27.5)
+
+
+def test_week_starts_on_sunday():
+    """🧪 يختبر أن الأسبوع يبدأ يوم الأحد."""
+    sunday = (pd.Timestamp("2025-07-06") - pd.Timestamp("1970-01-01")).days
+    assert all(week_start(sunday + offset) == sunday for offset in range(7))
+    assert week_start(sunday + 7) == sunday + 7
+
+
+def test_aggregates_are_built_for_an_existing_database(tmp_path):
+    """
+    🧪 يختبر أن قاعدة بيانات قديمة بلا جداول مؤشرات تُملأ جداولها عند أول فتح.
+    """
+    db_path = str(tmp_path / "history.db")
+    db_manager = DatabaseManager(db_path)
+    db_manager.save_data(
+        _auctions(["05/01/2025", "12/01/2025", "19/01/2025"], 91, [25.0, 26.0, 30.0])
+    )
+    db_manager.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(f'DROP VIEW "{C.SPREADS_VIEW_NAME}"')
+    conn.execute(f'DROP TABLE "{C.AGGREGATES_TABLE_NAME}"')
+    conn.execute(f'DROP TABLE "{C.WEEKLY_TABLE_NAME}"')
+    conn.commit()
+    conn.close()
+
+    reopened = DatabaseManager(db_path)
+    df = reopened.load_moving_averages()
+    assert list(df[C.MOVING_AVERAGE_COLUMN_NAME]) == pytest.approx([25.0, 25.5, 27.0])
+    assert len(reopened.load_weekly_averages()) == 3
+    reopened.close()
+
+
+def test_reopening_leaves_the_database_file_untouched(tmp_path):
+    """
+    🧪 يختبر أن فتح قاعدة البيانات من جديد دون أي تغيير لا يعيد كتابة الملف
+    (فلا يرى تشغيل المهمة المجدولة الذي لا جديد فيه ملفاً ثنائياً جديداً).
+    """
+    db_path = tmp_path / "history.db"
+    db_manager = DatabaseManager(str(db_path))
+    db_manager.save_data(_auctions(["05/01/2025", "12/01/2025"], 91, [25.0, 26.0]))
+    db_manager.close()
+    before = db_path.read_bytes()
+
+    DatabaseManager(str(db_path)).close()
+    assert db_path.read_bytes() == before
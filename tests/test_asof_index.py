@@ -0,0 +1,106 @@
+# tests/test_asof_index.py
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from asof_index import AsOfYieldIndex
+from db_manager import DatabaseManager
+from portfolio import PositionStore
+import constants as C
+
+
+@pytest.fixture
+def history():
+    """تاريخ عطاءات وهمي: أجل 91 يومًا كل أسبوع وأجل 364 يومًا مرة واحدة."""
+    return pd.DataFrame(
+        {
+            C.DATE_COLUMN_NAME: pd.to_datetime(["2025-01-06"] * 4),
+            C.TENOR_COLUMN_NAME: ["91", "91", "91", "364"],
+            C.YIELD_COLUMN_NAME: [25.0, 26.0, 27.0, 24.0],
+            C.SESSION_DATE_COLUMN_NAME: pd.to_datetime(
+                ["2025-01-05", "2025-01-12", "2025-01-19", "2025-01-12"]
+            ),
+        }
+    )
+
+
+def test_yield_on_returns_the_auction_in_effect(history):
+    """
+    🧪 يختبر أن العائد المرجع هو عائد آخر عطاء للأجل في أو قبل تاريخ الشراء.
+    """
+    index = AsOfYieldIndex.from_history(history)
+    assert len(index) == 4
+    assert index.yield_on(91, "2025-01-05") == 25.0
+    assert index.yield_on(91, "2025-01-11") == 25.0
+    assert index.yield_on(91, "2025-01-12") == 26.0
+    assert index.yield_on(91, "2030-01-01") == 27.0
+    assert index.yield_on(364, "2025-01-20") == 24.0
+    # لا يوجد عطاء قبل هذا التاريخ، أو لا يوجد هذا الأجل أصلًا
+    assert index.yield_on(91, "2025-01-04") is None
+    assert index.yield_on(364, "2025-01-11") is None
+    assert index.yield_on(182, "2025-01-20") is None
+
+
+def test_vectorized_lookup_matches_scalar_lookup(history):
+    """
+    🧪 يختبر الاستعلام المتجه لعدة تواريخ شراء وآجال دفعة واحدة.
+    """
+    index = AsOfYieldIndex.from_history(history)
+    dates = pd.date_range("2025-01-01", "2025-01-25")
+    tenors = np.where(np.arange(len(dates)) % 2 == 0, 91, 364)
+
+    yields, sessions = index.lookup(tenors, dates)
+    for tenor, day, value in zip(tenors, dates, yields):
+        expected = index.yield_on(int(tenor), day)
+        assert (np.isnan(value) and expected is None) or value == expected
+    assert sessions[np.isnan(yields)].tolist() == [-1] * int(np.isnan(yields).sum())
+    # تاريخ واحد لعدة آجال
+    assert index.yields_on([91, 364], "2025-01-12").tolist() == [26.0, 24.0]
+
+
+def test_index_from_snapshot_matches_dataframe(tmp_path):
+    """
+    🧪 يختبر أن الفهرس المبني من النسخة العمودية يطابق المبني من DataFrame.
+    """
+    db_manager = DatabaseManager(str(tmp_path / "asof.db"))
+    sessions = pd.to_datetime(["2025-01-05", "2025-01-12"])
+    db_manager.save_data(
+        pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: sessions,
+                C.TENOR_COLUMN_NAME: [91, 91],
+                C.YIELD_COLUMN_NAME: [25.0, 26.0],
+                C.SESSION_DATE_COLUMN_NAME: sessions,
+            }
+        )
+    )
+    from_snapshot = AsOfYieldIndex.from_history(db_manager.load_history_snapshot())
+    from_frame = AsOfYieldIndex.from_history(db_manager.load_all_historical_data())
+    dates = pd.date_range("2025-01-01", "2025-01-20")
+    np.testing.assert_array_equal(
+        from_snapshot.yields_on(91, dates), from_frame.yields_on(91, dates)
+    )
+    db_manager.close()
+
+
+def test_portfolio_import_fills_missing_yields(history):
+    """
+    🧪 يختبر أن استيراد المحفظة يملأ العوائد الناقصة من الفهرس بتاريخ الشراء.
+    """
+    positions = pd.DataFrame(
+        {
+            "face_value": [100000.0, 50000.0],
+            "yield_rate": [np.nan, 30.0],
+            "tenor": [91, 91],
+            "purchase_date": ["2025-01-13", "2025-01-13"],
+        }
+    )
+    store = PositionStore.from_dataframe(
+        positions, yield_index=AsOfYieldIndex.from_history(history)
+    )
+    assert store.column("yield_rate").tolist() == [26.0, 30.0]
@@ -0,0 +1,161 @@
+# tests/test_backfill.py
+import sys
+import os
+import sqlite3
+import pandas as pd
+import pytest
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backfill import run_backfill
+from db_manager import DatabaseManager
+import constants as C
+
+
+def _results_page(session_date, yields_by_tenor):
+    """يبني صفحة نتائج مؤرشفة بنفس بنية موقع البنك المركزي."""
+    tenors = "".join(f"<th>{t}</th>" for t in yields_by_tenor)
+    dates = "".join(f"<td>{session_date}</td>" for _ in yields_by_tenor)
+    yields = "".join(f"<td>{y}</td>" for y in yields_by_tenor.values())
+    return f"""
+    <html><body>
+    <h2>النتائج</h2>
+    <table><thead><tr><th>البيان</th>{tenors}</tr></thead>
+    <tbody><tr><td>تاريخ الجلسة</td>{dates}</tr></tbody></table>
+    <p><strong>تفاصيل العروض المقبولة</strong></p>
+    <table><tbody><tr><td>متوسط العائد المرجح</td>{yields}</tr></tbody></table>
+    </body></html>
+    """
+
+
+def test_backfill_imports_pages_and_csv_and_dedupes(tmp_path):
+    """
+    🧪 يختبر استيراد صفحات HTML وملف CSV دفعة واحدة، وأن إعادة الاستيراد لا تكرر الصفوف.
+    """
+    archive = tmp_path / "archive"
+    (archive / "2025").mkdir(parents=True)
+    (archive / "2025" / "a.html").write_text(
+        _results_page("06/07/2025", {182: 27.192, 364: 25.043}), encoding="utf-8"
+    )
+    (archive / "2025" / "b.htm").write_text(
+        _results_page("07/07/2025", {91: 27.558}), encoding="utf-8"
+    )
+    (archive / "notes.txt").write_text("ignored")
+    days = pd.date_range("2015-01-04", periods=520, freq="W")
+    pd.DataFrame(
+        {
+            C.TENOR_COLUMN_NAME: 91,
+            C.YIELD_COLUMN_NAME: [15 + (i % 50) / 10 for i in range(len(days))],
+            C.SESSION_DATE_COLUMN_NAME: days.strftime("%d/%m/%Y"),
+        }
+    ).to_csv(archive / "export.csv", index=False)
+
+    db_path = str(tmp_path / "backfill.db")
+    result = run_backfill([str(archive)], db_path, batch_rows=100)
+    assert result["files"] == 3
+    assert result["rows"] == 523
+    assert result["inserted"] == 523
+    assert result["rows_per_sec"] > 0
+
+    # إعادة الاستيراد: كل الصفوف موجودة بالفعل
+    again = run_backfill([str(archive)], db_path, batch_rows=100)
+    assert again["inserted"] == 0 and again["skipped"] == 523
+
+    db_manager = DatabaseManager(db_filename=db_path)
+    history = db_manager.load_history_range((182,))
+    assert history[C.YIELD_COLUMN_NAME].tolist() == [27.192]
+    # الصفحات المؤرشفة تُسجل بتاريخ جلستها
+    assert history[C.DATE_COLUMN_NAME].tolist() == [pd.Timestamp("2025-07-06")]
+    # المؤشرات المجمعة أُعيد حسابها مرة واحدة بعد الاستيراد
+    assert len(db_manager.load_moving_averages()) == 523
+    db_manager.close()
+
+    # الفهرس أُعيد بناؤه بعد الاستيراد
+    conn = sqlite3.connect(db_path)
+    indexes = [row[1] for row in conn.execute(f'PRAGMA index_list("{C.TABLE_NAME}")')]
+    conn.close()
+    assert C.TENOR_DATE_INDEX_NAME in indexes
+
+
+def _frame(session_date, yields_by_tenor):
+    return pd.DataFrame(
+        {
+            C.DATE_COLUMN_NAME: "2025-07-10",
+            C.TENOR_COLUMN_NAME: list(yields_by_tenor),
+            C.YIELD_COLUMN_NAME: list(yields_by_tenor.values()),
+            C.SESSION_DATE_COLUMN_NAME: session_date,
+        }
+    )
+
+
+def test_bulk_import_skips_malformed_frames_and_rolls_back_failures(tmp_path):
+    """
+    🧪 يختبر تخطي الملفات التالفة، وأن فشل الكتابة في منتصف الاستيراد لا يحفظ صفوفًا جزئية.
+    """
+    db_path = str(tmp_path / "bulk.db")
+    db_manager = DatabaseManager(db_filename=db_path)
+    totals = db_manager.bulk_import(
+        [
+            _frame("06/07/2025", {91: 27.0}),
+            _frame("N/A", {182: 26.0}),
+            _frame("07/07/2025", {364: 25.0}),
+        ],
+        batch_rows=1,
+    )
+    assert totals["inserted"] == 2, "الإطار التالف وحده يُتخطى"
+    version = db_manager.data_version()
+
+    # خطأ يُحقن بعد إدراج صف جديد وقبل انتهاء الدفعة
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        f'CREATE TRIGGER fail_update BEFORE UPDATE OF "{C.YIELD_COLUMN_NAME}" '
+        f"ON \"{C.TABLE_NAME}\" BEGIN SELECT RAISE(ABORT, 'injected'); END"
+    )
+    conn.commit()
+    conn.close()
+    batch = pd.concat(
+        [_frame("08/07/2025", {91: 27.3}), _frame("06/07/2025", {91: 28.0})]
+    )
+    with pytest.raises(sqlite3.DatabaseError):
+        db_manager.bulk_import([batch])
+
+    assert db_manager.data_version() == version
+    history = db_manager.load_history_range((91,))
+    assert history[C.YIELD_COLUMN_NAME].tolist() == [
+        27.0
+    ], "لا يُحفظ شيء من الدفعة الفاشلة"
+    db_manager.close()
+
+
+def test_bulk_import_keeps_first_and_last_scrape_of_a_repeated_auction(tmp_path):
+    """
+    🧪 يختبر أن العطاء الذي يظهر في أكثر من جلب يُحفظ بتاريخ أول جلب (first_seen)
+    وتاريخ آخر جلب (last_seen) وعائد آخر جلب، داخل الملف الواحد وعبر الملفات.
+    """
+    archive = pd.DataFrame(
+        {
+            C.DATE_COLUMN_NAME: ["2025-07-10", "2025-07-11"],
+            C.TENOR_COLUMN_NAME: [91, 91],
+            C.YIELD_COLUMN_NAME: [27.5, 27.5],
+            C.SESSION_DATE_COLUMN_NAME: ["07/07/2025", "07/07/2025"],
+        }
+    )
+    revised = archive.iloc[[1]].assign(
+        **{C.DATE_COLUMN_NAME: "2025-07-12", C.YIELD_COLUMN_NAME: 27.6}
+    )
+    db_manager = DatabaseManager(db_filename=str(tmp_path / "bulk.db"))
+    totals = db_manager.bulk_import([archive, revised])
+    assert totals == {"inserted": 1, "updated": 0, "skipped": 0}
+
+    with db_manager._connection() as conn:
+        rows = conn.execute(
+            f'SELECT "{C.FIRST_SEEN_COLUMN_NAME}", "{C.LAST_SEEN_COLUMN_NAME}", '
+            f'"{C.YIELD_COLUMN_NAME}" FROM "{C.TABLE_NAME}"'
+        ).fetchall()
+    first_day, last_day = (
+        (pd.Timestamp(iso) - pd.Timestamp(0)).days
+        for iso in ("2025-07-10", "2025-07-12")
+    )
+    assert rows == [(first_day, last_day, 27.6)]
+    db_manager.close()
@@ -6,7 +6,16 @@ import pytest
 # يضيف المجلد الرئيسي للمشروع إلى مسار بايثون للعثور على الوحدات البرمجية
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from calculations import calculate_primary_yield, analyze_secondary_sale
+import numpy as np
+import pandas as pd
+
+from calculations import (
+    calculate_primary_yield,
+    analyze_secondary_sale,
+    calculate_primary_yield_batch,
+    analyze_secondary_sale_surface,
+    solve_break_even_secondary_yield,
+)
 
 # --- اختبارات حاسبة العائد الأساسية (بطريقة أكثر دقة) ---
 
@@ -125,3 +134,118 @@ def test_secondary_sale_invalid_days():
     """
     results = analyze_secondary_sale(100000, 25.0, 91, 91, 28.0, 20.0)
     assert results["error"] is not None
+
+
+# --- اختبارات الحساب المجمّع (Batch) ---
+
+
+def test_primary_yield_batch_matches_scalar_exactly():
+    """
+    🧪 يختبر أن الحساب المجمّع يطابق الدالة الأساسية تمامًا لكل صف.
+    """
+    inputs = pd.DataFrame(
+        {
+            "face_value": [25000.0, 100000.0, 75000.0, 1000000.0],
+            "yield_rate": [26.0, 26.5, 27.0, 27.5],
+            "tenor": [91, 182, 273, 364],
+            "tax_rate": [20.0, 0.0, 20.0, 100.0],
+        }
+    )
+
+    batch = calculate_primary_yield_batch(inputs)
+
+    for i, row in inputs.iterrows():
+        scalar = calculate_primary_yield(
+            row["face_value"], row["yield_rate"], int(row["tenor"]), row["tax_rate"]
+        )
+        assert batch.loc[i, "error"] is None
+        for key in ("purchase_price", "gross_return", "tax_amount", "net_return"):
+            assert batch.loc[i, key] == scalar[key]
+        assert batch.loc[i, "real_profit_percentage"] == scalar["real_profit_percentage"]
+
+
+def test_primary_yield_batch_flags_invalid_rows():
+    """
+    🧪 يختبر أن الصفوف غير الصالحة تحمل نفس رسالة الخطأ دون التأثير على باقي الصفوف.
+    """
+    batch = calculate_primary_yield_batch(
+        np.array([100000.0, 0.0, 100000.0]), 25.0, 364, np.array([20.0, 20.0, 101.0])
+    )
+
+    assert batch["error"].tolist() == [
+        None,
+        calculate_primary_yield(0, 25.0, 364, 20.0)["error"],
+        calculate_primary_yield(100000, 25.0, 364, 101)["error"],
+    ]
+    assert not np.isnan(batch.loc[0, "net_return"])
+    assert batch.loc[1:, "net_return"].isna().all()
+
+
+# --- اختبارات سطح قرار البيع الثانوي ---
+
+
+def test_secondary_sale_surface_matches_scalar():
+    """
+    🧪 يختبر أن سطح (أيام الاحتفاظ × العائد السائد) يطابق الدالة الأساسية في كل خلية.
+    """
+    yields = np.array([20.0, 25.0, 30.0, 35.0])
+    surface = analyze_secondary_sale_surface(100000, 25.0, 91, yields, 20.0)
+
+    assert surface["error"] is None
+    assert surface["net_profit"].shape == (90, 4)
+    assert surface["holding_days"][0] == 1 and surface["holding_days"][-1] == 90
+
+    for i, days in enumerate(surface["holding_days"]):
+        for j, secondary_yield in enumerate(yields):
+            scalar = analyze_secondary_sale(
+                100000, 25.0, 91, int(days), float(secondary_yield), 20.0
+            )
+            assert surface["net_profit"][i, j] == scalar["net_profit"]
+            assert surface["period_yield"][i, j] == scalar["period_yield"]
+
+
+def test_secondary_sale_surface_invalid_input():
+    """
+    🧪 يختبر أن السطح يُرجع خطأ عند وجود عائد سائد غير صالح.
+    """
+    surface = analyze_secondary_sale_surface(100000, 25.0, 91, [25.0, 0.0], 20.0)
+    assert surface["error"] is not None
+
+
+# --- اختبارات عائد التعادل ---
+
+
+def test_break_even_yield_gives_zero_profit():
+    """
+    🧪 يختبر أن البيع بعائد التعادل يحقق ربحًا صافيًا يساوي صفرًا لكل يوم احتفاظ.
+    """
+    results = solve_break_even_secondary_yield(100000, 25.0, 182, 20.0)
+
+    assert results["error"] is None
+    assert len(results["holding_days"]) == 181
+    # الخسائر لا تخضع للضريبة، لذا يتطابق التعادل قبل الضريبة وبعدها عند الصفر
+    np.testing.assert_array_equal(results["pre_tax_yield"], results["post_tax_yield"])
+
+    for days in (1, 60, 181):
+        break_even_yield = results["pre_tax_yield"][days - 1]
+        sale = analyze_secondary_sale(100000, 25.0, 182, days, break_even_yield, 20.0)
+        assert sale["net_profit"] == pytest.approx(0, abs=1e-6)
+
+
+def test_break_even_yield_with_profit_target():
+    """
+    🧪 يختبر أن عائد التعادل بعد الضريبة يراعي الضريبة على الأرباح المستهدفة.
+    """
+    results = solve_break_even_secondary_yield(
+        100000, 25.0, 364, 20.0, holding_days=[90], target_net_profit=1000.0
+    )
+    post_tax = analyze_secondary_sale(
+        100000, 25.0, 364, 90, results["post_tax_yield"][0], 20.0
+    )
+    pre_tax = analyze_secondary_sale(
+        100000, 25.0, 364, 90, results["pre_tax_yield"][0], 20.0
+    )
+
+    assert post_tax["net_profit"] == pytest.approx(1000.0)
+    assert pre_tax["gross_profit"] == pytest.approx(1000.0)
+    assert results["post_tax_yield"][0] < results["pre_tax_yield"][0]
@@ -1,12 +1,32 @@
 # tests/test_cbe_scraper.py
 import sys
 import os
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime
 import pandas as pd
+import pytest
+import requests
 
 # إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from cbe_scraper import parse_cbe_html
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+import cbe_scraper
+from cbe_scraper import (
+    DriverManager,
+    fetch_data_from_cbe,
+    fetch_page_with_http,
+    fetch_page_with_selenium,
+    parse_cbe_html,
+    results_hash,
+)
+from benchmark_parser import build_results_page, parse_cbe_html_legacy
+from db_manager import DatabaseManager
+from retry_policy import DriverStartupError, RetryPolicy
+from scrape_state import ScrapeState, scrape_state_path
 import constants as C
 
 # محتوى HTML وهمي تم نسخه من الموقع للاختبار بدون انترنت
@@ -90,3 +110,322 @@ def test_html_parser_with_mock_data():
         C.YIELD_COLUMN_NAME
     ].iloc[0]
     assert yield_91 == 27.558, "يجب أن تكون قيمة العائد لأجل 91 يومًا صحيحة"
+
+    # 5. التواريخ تُحوّل مرة واحدة عند الاستخلاص
+    assert pd.api.types.is_datetime64_any_dtype(parsed_df[C.SESSION_DATE_COLUMN_NAME])
+    session_91 = parsed_df[parsed_df[C.TENOR_COLUMN_NAME] == 91][
+        C.SESSION_DATE_COLUMN_NAME
+    ].iloc[0]
+    assert session_91 == pd.Timestamp("2025-07-07")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cbe_server(tmp_path):
+    """
+    خادم HTTP محلي يقدم صفحات البنك المركزي المحفوظة بدلًا من الموقع الحقيقي.
+    Serves saved CBE pages from a temporary directory.
+    """
+    (tmp_path / "results.html").write_text(MOCK_HTML_CONTENT, encoding="utf-8")
+    (tmp_path / "loading.html").write_text(
+        "<html><body><div id='app'>جار التحميل...</div></body></html>",
+        encoding="utf-8",
+    )
+    handler = functools.partial(_QuietHandler, directory=str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(C, "SCRAPER_RETRIES", 1)
+    monkeypatch.setattr(C, "SCRAPER_RETRY_BASE_DELAY_SECONDS", 0)
+
+
+def test_http_fast_path_saves_without_selenium(cbe_server, no_retry_delay, monkeypatch):
+    """
+    🧪 يختبر أن الجلب عبر HTTP العادي يكفي عندما تُحلل الصفحة، بدون تشغيل المتصفح.
+    """
+    html = fetch_page_with_http(f"{cbe_server}/results.html")
+    assert "النتائج" in html, "يجب فك ترميز الصفحة العربية بشكل صحيح"
+
+    def no_selenium(url, timeout=None):
+        raise AssertionError("Selenium must not start when the HTTP page parses")
+
+    monkeypatch.setattr(cbe_scraper, "fetch_page_with_selenium", no_selenium)
+    db_manager = DatabaseManager(db_filename=":memory:")
+    fetch_data_from_cbe(db_manager, url=f"{cbe_server}/results.html")
+
+    latest, _ = db_manager.load_latest_data()
+    assert sorted(latest[C.TENOR_COLUMN_NAME].tolist()) == [91, 182, 273, 364]
+    # الجلسة الثانية تعيد استخدام نفس الاتصالات المجمعة
+    assert cbe_scraper.get_http_session() is cbe_scraper.get_http_session()
+
+
+def test_falls_back_to_selenium_when_http_page_does_not_parse(
+    cbe_server, no_retry_delay, monkeypatch
+):
+    """
+    🧪 يختبر الرجوع إلى Selenium عندما لا تحتوي صفحة HTTP على جداول النتائج.
+    """
+    rendered = []
+
+    def fake_selenium(url, timeout=None):
+        rendered.append(url)
+        return MOCK_HTML_CONTENT
+
+    monkeypatch.setattr(cbe_scraper, "fetch_page_with_selenium", fake_selenium)
+    db_manager = DatabaseManager(db_filename=":memory:")
+    fetch_data_from_cbe(db_manager, url=f"{cbe_server}/loading.html")
+    assert rendered == [f"{cbe_server}/loading.html"]
+    assert db_manager.data_version() == 1
+
+    # في وضع "http" فقط لا يوجد رجوع إلى المتصفح
+    rendered.clear()
+    fetch_data_from_cbe(db_manager, url=f"{cbe_server}/missing.html", mode="http")
+    assert rendered == []
+    assert db_manager.data_version() == 1
+
+
+def test_unchanged_page_is_a_no_op(cbe_server, no_retry_delay, monkeypatch, tmp_path):
+    """
+    🧪 يختبر أن التشغيل ينتهي دون تحليل أو حفظ عندما لم تتغير صفحة النتائج.
+    """
+    url = f"{cbe_server}/results.html"
+    page = tmp_path / "results.html"
+    db_manager = DatabaseManager(db_filename=str(tmp_path / "cbe.db"))
+    assert fetch_data_from_cbe(db_manager, url=url) == "saved"
+    state_path = scrape_state_path(db_manager)
+    state = ScrapeState.load(state_path)
+    assert state.last_modified is not None
+    assert state.scraped_on == datetime.now().date().isoformat()
+    saved_version = db_manager.data_version()
+
+    def no_parse(page_source):
+        raise AssertionError("An unchanged page must not be parsed")
+
+    monkeypatch.setattr(cbe_scraper, "parse_cbe_html", no_parse)
+    # 1) الخادم يرد بـ 304 على الطلب المشروط
+    assert fetch_data_from_cbe(db_manager, url=url) == "unchanged"
+
+    # 2) تغير خارج قسم النتائج: رد كامل لكن بنفس بصمة النتائج
+    page.write_text(
+        MOCK_HTML_CONTENT.replace("<body>", "<body><nav>رابط جديد</nav>"),
+        encoding="utf-8",
+    )
+    os.utime(page, (page.stat().st_mtime + 60, page.stat().st_mtime + 60))
+    assert fetch_data_from_cbe(db_manager, url=url) == "unchanged"
+    assert db_manager.data_version() == saved_version
+
+    # 3) نتائج جديدة: تُحلل وتُحفظ وتُحدّث الحالة
+    monkeypatch.undo()
+    monkeypatch.setattr(C, "SCRAPER_RETRIES", 1)
+    page.write_text(MOCK_HTML_CONTENT.replace("27.192", "27.5"), encoding="utf-8")
+    os.utime(page, (page.stat().st_mtime + 120, page.stat().st_mtime + 120))
+    previous_hash = ScrapeState.load(state_path).results_hash
+    assert fetch_data_from_cbe(db_manager, url=url) == "saved"
+    assert ScrapeState.load(state_path).results_hash != previous_hash
+    latest, _ = db_manager.load_latest_data()
+    assert latest.set_index(C.TENOR_COLUMN_NAME).loc[182, C.YIELD_COLUMN_NAME] == 27.5
+    db_manager.close()
+
+
+def test_results_hash_ignores_markup_outside_results():
+    """
+    🧪 يختبر أن بصمة النتائج لا تتأثر إلا بقسم النتائج نفسه.
+    """
+    base = results_hash(MOCK_HTML_CONTENT)
+    assert base is not None
+    assert results_hash("<html><body><p>لا توجد نتائج</p></body></html>") is None
+    assert (
+        results_hash(MOCK_HTML_CONTENT.replace("<body>", "<body><script>1</script>"))
+        == base
+    )
+    assert results_hash(MOCK_HTML_CONTENT.replace("24.999", "25.000")) != base
+
+
+def test_retries_transient_errors_and_stops_on_fatal_ones(monkeypatch):
+    """
+    🧪 يختبر إعادة المحاولة عند الأخطاء المؤقتة فقط، والتوقف فورًا عند الأخطاء النهائية.
+    """
+    calls = []
+
+    def failing_get(status_code):
+        def get_page(url, state=None, timeout=C.HTTP_TIMEOUT_SECONDS):
+            calls.append(timeout)
+            response = requests.Response()
+            response.status_code = status_code
+            raise requests.HTTPError(f"{status_code} error", response=response)
+
+        return get_page
+
+    db_manager = DatabaseManager(db_filename=":memory:")
+    policy = RetryPolicy(max_attempts=3, base_delay=0, deadline=30)
+
+    monkeypatch.setattr(cbe_scraper, "get_page_with_http", failing_get(503))
+    assert fetch_data_from_cbe(db_manager, mode="http", policy=policy) == "failed"
+    assert len(calls) == 3, "الخطأ 503 مؤقت: تُستنفد كل المحاولات"
+    assert all(timeout <= 30 for timeout in calls), "المهلة لا تتجاوز الميزانية"
+
+    calls.clear()
+    monkeypatch.setattr(cbe_scraper, "get_page_with_http", failing_get(404))
+    assert fetch_data_from_cbe(db_manager, mode="http", policy=policy) == "failed"
+    assert len(calls) == 1, "الخطأ 404 نهائي: لا إعادة للمحاولة"
+
+    # ميزانية لا تكفي للانتظار: محاولة واحدة فقط
+    calls.clear()
+    monkeypatch.setattr(cbe_scraper, "get_page_with_http", failing_get(503))
+    short = RetryPolicy(max_attempts=5, base_delay=10, jitter=0, deadline=5)
+    assert fetch_data_from_cbe(db_manager, mode="http", policy=short) == "failed"
+    assert len(calls) == 1 and calls[0] <= 5
+
+
+class _FakeDriver:
+    """متصفح وهمي يسجل عدد الصفحات المحملة وإغلاقه."""
+
+    def __init__(self):
+        self.loads = 0
+        self.alive = True
+        self.quit_called = False
+        self.page_source = MOCK_HTML_CONTENT
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise WebDriverException("browser crashed")
+        return 1
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeout = seconds
+
+    def get(self, url):
+        self.loads += 1
+
+    def find_element(self, by, value):
+        return object()
+
+    def quit(self):
+        self.quit_called = True
+
+
+def _fake_factory(created):
+    def factory():
+        driver = _FakeDriver()
+        created.append(driver)
+        return driver
+
+    return factory
+
+
+def test_driver_manager_reuses_warm_driver_and_recycles():
+    """
+    🧪 يختبر أن مدير المتصفح يعيد استخدام نفس المتصفح ويستبدله بعد N استخدامات.
+    """
+    created = []
+    manager = DriverManager(factory=_fake_factory(created), max_uses=3)
+    for _ in range(4):
+        html = fetch_page_with_selenium("https://example.test", manager)
+        assert "النتائج" in html
+
+    assert len(created) == 2, "يُبدأ متصفح جديد فقط بعد 3 استخدامات"
+    assert created[0].loads == 3 and created[0].quit_called
+    assert created[1].loads == 1 and not created[1].quit_called
+    manager.close()
+    assert created[1].quit_called
+
+
+def test_driver_manager_replaces_unhealthy_or_failed_driver():
+    """
+    🧪 يختبر استبدال المتصفح عند فشل فحص الصحة أو عند حدوث خطأ أثناء الاستخدام.
+    """
+    created = []
+    manager = DriverManager(factory=_fake_factory(created))
+    with manager.driver() as driver:
+        driver.get("https://example.test")
+    created[0].alive = False
+    with manager.driver() as driver:
+        assert driver is created[1], "المتصفح المتعطل لا يُعاد استخدامه"
+    assert created[0].quit_called
+
+    with pytest.raises(TimeoutException):
+        with manager.driver():
+            raise TimeoutException("page did not render")
+    assert created[1].quit_called
+    with manager.driver() as driver:
+        assert driver is created[2]
+    manager.close()
+
+
+def test_driver_manager_reports_failed_startup(monkeypatch):
+    """
+    🧪 يختبر أن فشل تشغيل المتصفح يرفع DriverStartupError، وأنه خطأ نهائي:
+    ينتهي الجلب من أول محاولة دون إعادة تشغيل المتصفح.
+    """
+    starts = []
+
+    def no_browser():
+        starts.append(1)
+        return None
+
+    manager = DriverManager(factory=no_browser)
+    with pytest.raises(DriverStartupError):
+        with manager.driver():
+            pass
+
+    starts.clear()
+    monkeypatch.setattr(cbe_scraper, "get_driver_manager", lambda: manager)
+    policy = RetryPolicy(max_attempts=3, base_delay=0, deadline=30)
+    status = fetch_data_from_cbe(
+        DatabaseManager(db_filename=":memory:"), mode="selenium", policy=policy
+    )
+    assert status == "failed"
+    assert len(starts) == 1, "لا إعادة محاولة بعد فشل تشغيل المتصفح"
+
+
+# جدول نتائج بخلايا مدمجة ومسافات زائدة وأرقام بفواصل الآلاف
+SPANNED_HTML_CONTENT = """<html><body>
+    <h2>  النتائج  </h2>
+    <table>
+        <tr><th>البيان</th><th>91</th><th>182</th></tr>
+        <tr><td>تاريخ   الجلسة</td><td>05/01/2025</td><td>05/01/2025</td></tr>
+        <tr><td>تاريخ الجلسة</td><td colspan="2">12/01/2025</td></tr>
+    </table>
+    <p>تفاصيل <strong>العروض المقبولة</strong></p>
+    <table>
+        <tr><td rowspan="2">متوسط العائد المرجح</td><td>1,027.5</td><td>26.25</td></tr>
+        <tr><td>99</td><td>98</td></tr>
+    </table>
+    <h2>النتائج</h2>
+    <table><tr><th>البيان</th><th>273</th></tr></table>
+</body></html>
+"""
+
+
+@pytest.mark.parametrize(
+    "page",
+    [
+        MOCK_HTML_CONTENT,
+        SPANNED_HTML_CONTENT,
+        build_results_page(40, filler_paragraphs=3),
+        "<html><body><h2>لا توجد نتائج</h2></body></html>",
+        "<html><body><p>صفحة أخرى</p></body></html>",
+    ],
+    ids=["mock", "spans", "multi-section", "no-tables", "no-results"],
+)
+def test_lxml_parser_matches_legacy_parser(page):
+    """
+    🧪 يختبر أن محلل lxml الجديد يعطي نفس الـ DataFrame الذي يعطيه المحلل القديم بالضبط.
+    """
+    expected = parse_cbe_html_legacy(page)
+    parsed = parse_cbe_html(page)
+    if expected is None:
+        assert parsed is None
+    else:
+        pd.testing.assert_frame_equal(parsed, expected)
@@ -1,6 +1,7 @@
 # tests/test_db_manager.py
 import sys
 import os
+import threading
 import pytest
 import pandas as pd
 from datetime import datetime
@@ -8,7 +9,8 @@ from datetime import datetime
 # إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from db_manager import DatabaseManager
+from db_cache import CachedDatabaseManager
+from db_manager import UNKNOWN_DATA_VERSION, DatabaseManager
 import constants as C
 
 
@@ -54,3 +56,432 @@ def test_save_and_load_data(in_memory_db):
         C.YIELD_COLUMN_NAME
     ].iloc[0]
     assert yield_182 == 26.5
+
+
+def test_latest_data_is_the_newest_session_not_the_newest_insert(in_memory_db):
+    """
+    🧪 يختبر أن أحدث البيانات هي أحدث جلسة، حتى لو أُضيفت جلسة أقدم بعدها (استيراد متأخر لصفحة مؤرشفة).
+    """
+    in_memory_db.save_data(
+        pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: ["2025-07-10"],
+                C.TENOR_COLUMN_NAME: [91],
+                C.YIELD_COLUMN_NAME: [27.5],
+                C.SESSION_DATE_COLUMN_NAME: ["07/07/2025"],
+            }
+        )
+    )
+    in_memory_db.save_data(
+        pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: ["2025-06-03"],
+                C.TENOR_COLUMN_NAME: [91],
+                C.YIELD_COLUMN_NAME: [24.0],
+                C.SESSION_DATE_COLUMN_NAME: ["02/06/2025"],
+            }
+        )
+    )
+    latest, _ = in_memory_db.load_latest_data()
+    assert latest[C.YIELD_COLUMN_NAME].tolist() == [27.5]
+    assert latest[C.SESSION_DATE_COLUMN_NAME].tolist() == [pd.Timestamp("2025-07-07")]
+
+
+def test_latest_data_leaves_out_discontinued_tenors(in_memory_db):
+    """
+    🧪 يختبر أن أجلاً لم يعد يُطرح (موجوداً في التاريخ القديم فقط) لا يظهر في أحدث البيانات.
+    """
+    in_memory_db.save_data(
+        pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: ["2015-03-02", "2015-03-02"],
+                C.TENOR_COLUMN_NAME: [91, 266],
+                C.YIELD_COLUMN_NAME: [10.5, 11.0],
+                C.SESSION_DATE_COLUMN_NAME: ["01/03/2015", "01/03/2015"],
+            }
+        )
+    )
+    in_memory_db.save_data(
+        pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: ["2025-07-10", "2025-07-10"],
+                C.TENOR_COLUMN_NAME: [91, 182],
+                C.YIELD_COLUMN_NAME: [27.5, 27.0],
+                C.SESSION_DATE_COLUMN_NAME: ["07/07/2025", "07/07/2025"],
+            }
+        )
+    )
+    latest, status_message = in_memory_db.load_latest_data()
+    assert latest[C.TENOR_COLUMN_NAME].tolist() == [91, 182]
+    assert latest[C.YIELD_COLUMN_NAME].tolist() == [27.5, 27.0]
+    assert status_message == "بتاريخ 10-07-2025"
+
+
+def test_unchanged_scrape_does_not_write_the_file(tmp_path):
+    """
+    🧪 يختبر أن جلباً جديداً بلا أي عطاء جديد أو معدل لا يكتب شيئاً (ولا حتى last_seen)،
+    وأن أول جلب فيه تغيير ينقل last_seen لكل عطاءات ذلك الجلب.
+    """
+    db_path = tmp_path / "history.db"
+
+    def scrape(scrape_date, yield_91):
+        return pd.DataFrame(
+            {
+                C.DATE_COLUMN_NAME: [scrape_date, scrape_date],
+                C.TENOR_COLUMN_NAME: [91, 182],
+                C.YIELD_COLUMN_NAME: [yield_91, 27.0],
+                C.SESSION_DATE_COLUMN_NAME: ["07/07/2025", "07/07/2025"],
+            }
+        )
+
+    db_manager = DatabaseManager(str(db_path))
+    db_manager.save_data(scrape("2025-07-10", 27.5))
+    db_manager.close()
+    before = db_path.read_bytes()
+
+    db_manager = DatabaseManager(str(db_path))
+    counts = db_manager.save_data(scrape("2025-07-11", 27.5))
+    db_manager.close()
+    assert counts == {"inserted": 0, "updated": 0, "skipped": 2}
+    assert db_path.read_bytes() == before
+
+    db_manager = DatabaseManager(str(db_path))
+    db_manager.save_data(scrape("2025-07-12", 27.6))
+    latest, status_message = db_manager.load_latest_data()
+    assert latest[C.YIELD_COLUMN_NAME].tolist() == [27.6, 27.0]
+    assert status_message == "بتاريخ 12-07-2025"
+    db_manager.close()
+
+
+def test_file_database_uses_wal_and_bounded_pool(tmp_path):
+    """
+    🧪 يختبر تفعيل وضع WAL، وأن القراءة المتزامنة مع الكتابة لا تتعطل، وأن عدد الاتصالات محدود.
+    Readers keep working while save_data writes, through a bounded pool.
+    """
+    db_path = tmp_path / "pool_test.db"
+    db_manager = DatabaseManager(db_filename=str(db_path), pool_size=3)
+    errors = []
+
+    def writer():
+        try:
+            for day in range(1, 21):
+                db_manager.save_data(
+                    pd.DataFrame(
+                        {
+                            C.DATE_COLUMN_NAME: [f"2025-01-{day:02d}"],
+                            C.TENOR_COLUMN_NAME: [91],
+                            C.YIELD_COLUMN_NAME: [25.0 + day / 100],
+                            C.SESSION_DATE_COLUMN_NAME: [f"{day:02d}/01/2025"],
+                        }
+                    )
+                )
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(50):
+                with db_manager._connection() as conn:
+                    conn.execute(f'SELECT COUNT(*) FROM "{C.TABLE_NAME}"').fetchone()
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [
+        threading.Thread(target=reader) for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(db_manager._all_connections) <= 3
+    with db_manager._connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert (
+            conn.execute(f'SELECT COUNT(*) FROM "{C.TABLE_NAME}"').fetchone()[0] == 20
+        )
+
+    # الإغلاق يدمج ملف WAL في قاعدة البيانات الرئيسية
+    db_manager.close()
+    wal_path = tmp_path / "pool_test.db-wal"
+    assert not wal_path.exists() or wal_path.stat().st_size == 0
+
+
+def test_historical_data_is_refreshed_incrementally(in_memory_db, monkeypatch, scrape):
+    """
+    🧪 يختبر أن إعادة تحميل البيانات التاريخية تجلب الصفوف الجديدة فقط وتدمجها.
+    Only rows written after the high-water mark are fetched on a refresh.
+    """
+    in_memory_db.save_data(scrape("2025-01-01", [91, 182], [25.0, 26.0]))
+    in_memory_db.save_data(scrape("2025-01-02", [91, 182], [25.1, 26.1]))
+    assert len(in_memory_db.load_all_historical_data()) == 4
+
+    fetched = []
+    original_read = in_memory_db._read_history
+
+    def spy(query, params=()):
+        df = original_read(query, params)
+        fetched.append(len(df))
+        return df
+
+    monkeypatch.setattr(in_memory_db, "_read_history", spy)
+
+    # عطاء جديد: يُجلب الصف الجديد فقط
+    in_memory_db.save_data(scrape("2025-01-03", [91], [25.5]))
+    history = in_memory_db.load_all_historical_data()
+    assert len(history) == 5
+    assert fetched == [1]
+
+    # إعادة سحب نفس اليوم بقيمة معدلة تستبدل الصف المخزن مؤقتًا
+    in_memory_db.save_data(scrape("2025-01-03", [91], [25.75]))
+    history = in_memory_db.load_all_historical_data()
+    assert len(history) == 5
+    assert fetched == [1, 1]
+    latest = history[history[C.DATE_COLUMN_NAME] == pd.Timestamp("2025-01-03")]
+    assert latest[C.YIELD_COLUMN_NAME].tolist() == [25.75]
+
+
+def test_history_range_is_filtered_in_sql(in_memory_db, scrape):
+    """
+    🧪 يختبر أن الاستعلام حسب الآجال والفترة يُنفذ في SQL باستخدام الفهرس المغطي.
+    """
+    in_memory_db.save_data(scrape("2024-06-01", [91, 364], [30.0, 28.0]))
+    in_memory_db.save_data(scrape("2025-01-01", [91, 364], [27.0, 25.0]))
+    in_memory_db.save_data(scrape("2025-03-01", [91, 364], [26.0, 24.0]))
+
+    chart_df = in_memory_db.load_history_range((364,), "2025-01-01", "2025-12-31")
+    assert chart_df[C.TENOR_COLUMN_NAME].tolist() == ["364", "364"]
+    assert chart_df[C.YIELD_COLUMN_NAME].tolist() == [25.0, 24.0]
+    assert in_memory_db.load_available_tenors() == ["91", "364"]
+
+    from db_manager import _build_range_query
+
+    query, params = _build_range_query((364,), "2025-01-01", "2025-12-31")
+    with in_memory_db._connection() as conn:
+        plan = " ".join(
+            row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        )
+    assert C.TENOR_DATE_INDEX_NAME in plan and "COVERING" in plan
+
+
+def test_save_invalidates_only_caches_of_changed_table(monkeypatch, scrape):
+    """
+    🧪 يختبر أن الحفظ يرفع رقم نسخة البيانات فقط، فتبقى الذاكرة المؤقتة لقاعدة أخرى دافئة.
+    A scrape no longer wipes every cache; only loaders of the changed data miss.
+    """
+    scraped_db = CachedDatabaseManager(db_filename=":memory:")
+    other_db = CachedDatabaseManager(db_filename=":memory:")
+    assert scraped_db.data_version() == 0
+
+    scraped_db.save_data(scrape("2025-01-01", [91], [25.0]))
+    other_db.save_data(scrape("2025-01-01", [182], [26.0]))
+    assert scraped_db.data_version() == 1
+    assert scraped_db.load_history_range()[C.YIELD_COLUMN_NAME].tolist() == [25.0]
+    assert other_db.load_history_range()[C.YIELD_COLUMN_NAME].tolist() == [26.0]
+
+    reads = []
+    for db in (scraped_db, other_db):
+        original_read = db._read_history
+
+        def spy(query, params=(), _db=db, _read=original_read):
+            reads.append(_db)
+            return _read(query, params)
+
+        monkeypatch.setattr(db, "_read_history", spy)
+
+    scraped_db.save_data(scrape("2025-01-02", [91], [25.5]))
+    assert scraped_db.data_version() == 2
+
+    # القاعدة الأخرى تُخدم من الذاكرة المؤقتة، والمحدثة ترى الصف الجديد
+    assert other_db.load_history_range()[C.YIELD_COLUMN_NAME].tolist() == [26.0]
+    assert scraped_db.load_history_range()[C.YIELD_COLUMN_NAME].tolist() == [
+        25.0,
+        25.5,
+    ]
+    assert reads == [scraped_db]
+
+    # النسخة القديمة ما زالت قابلة للطلب صراحة من الذاكرة المؤقتة
+    assert len(scraped_db.load_history_range(data_version=1)) == 1
+    assert reads == [scraped_db]
+
+
+def test_unknown_data_version_is_never_cached(monkeypatch, scrape):
+    """
+    🧪 يختبر أن نتائج التحميل أثناء تعذر قراءة رقم النسخة لا تُخزن مؤقتًا.
+    A failure read under the -1 sentinel must not be served after recovery.
+    """
+    db = CachedDatabaseManager(db_filename=":memory:")
+    db.save_data(scrape("2025-01-01", [91], [25.0]))
+    calls = []
+    original = DatabaseManager._load_available_tenors
+
+    def spy(self, data_version):
+        calls.append(data_version)
+        return original(self, data_version)
+
+    monkeypatch.setattr(DatabaseManager, "_load_available_tenors", spy)
+    monkeypatch.setattr(db, "data_version", lambda *args: UNKNOWN_DATA_VERSION)
+    db.load_available_tenors()
+    db.load_available_tenors()
+    assert calls == [UNKNOWN_DATA_VERSION] * 2, "كل طلب يُقرأ من القاعدة مباشرة"
+
+    monkeypatch.undo()
+    monkeypatch.setattr(DatabaseManager, "_load_available_tenors", spy)
+    calls.clear()
+    db.load_available_tenors()
+    db.load_available_tenors()
+    assert calls == [1], "بعد التعافي تعود الذاكرة المؤقتة للعمل"
+
+
+def test_save_skips_unchanged_rows(in_memory_db, scrape):
+    """
+    🧪 يختبر أن إعادة سحب نفس نتائج العطاء لا تكتب شيئًا ولا ترفع نسخة البيانات.
+    Rows are matched by (tenor, session date) and compared by a content hash.
+    """
+    first = in_memory_db.save_data(scrape("2025-01-05", [91, 182], [25.0, 26.0]))
+    assert first == {"inserted": 2, "updated": 0, "skipped": 0}
+    version = in_memory_db.data_version()
+
+    # نفس العطاء في سحب لاحق: لا كتابة ولا إبطال للذاكرة المؤقتة
+    repeat = scrape("2025-01-05", [91, 182], [25.0, 26.0])
+    repeat[C.DATE_COLUMN_NAME] = "2025-01-06"
+    assert in_memory_db.save_data(repeat) == {
+        "inserted": 0,
+        "updated": 0,
+        "skipped": 2,
+    }
+    assert in_memory_db.data_version() == version
+
+    # عطاء جديد لأجل واحد، وتصحيح عائد الأجل الآخر في نفس الجلسة
+    mixed = pd.concat(
+        [
+            scrape("2025-01-12", [91], [25.4]),
+            scrape("2025-01-05", [182], [26.2]).assign(
+                **{C.DATE_COLUMN_NAME: "2025-01-12"}
+            ),
+        ]
+    )
+    assert in_memory_db.save_data(mixed) == {
+        "inserted": 1,
+        "updated": 1,
+        "skipped": 0,
+    }
+    assert in_memory_db.data_version() == version + 1
+
+    latest_df, _ = in_memory_db.load_latest_data()
+    assert latest_df[C.TENOR_COLUMN_NAME].tolist() == [91, 182]
+    assert latest_df[C.YIELD_COLUMN_NAME].tolist() == [25.4, 26.2]
+    assert len(in_memory_db.load_all_historical_data()) == 3
+
+
+def _day(iso_date):
+    """يحول تاريخًا إلى رقم اليوم منذ 1970-01-01 كما يُخزن في قاعدة البيانات."""
+    return (pd.Timestamp(iso_date) - pd.Timestamp("1970-01-01")).days
+
+
+def test_legacy_per_scrape_table_is_migrated(tmp_path):
+    """
+    🧪 يختبر ترحيل الجدول القديم (صف لكل يوم سحب) إلى صف واحد لكل عطاء وأجل.
+    The same auction scraped on several days collapses into one row.
+    """
+    import sqlite3
+
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        f"""CREATE TABLE "{C.TABLE_NAME}" (
+            "{C.DATE_COLUMN_NAME}" TEXT NOT NULL,
+            "{C.TENOR_COLUMN_NAME}" INTEGER NOT NULL,
+            "{C.YIELD_COLUMN_NAME}" REAL NOT NULL,
+            "{C.SESSION_DATE_COLUMN_NAME}" TEXT NOT NULL,
+            PRIMARY KEY ("{C.DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}")
+        )"""
+    )
+    conn.executemany(
+        f'INSERT INTO "{C.TABLE_NAME}" VALUES (?, ?, ?, ?)',
+        [
+            ("2025-07-07", 91, 27.5, "07/07/2025"),
+            ("2025-07-08", 91, 27.5, "07/07/2025"),
+            ("2025-07-09", 91, 27.558, "07/07/2025"),  # تصحيح لاحق للعائد
+            ("2025-07-07", 182, 27.0, "03/07/2025"),
+            ("2025-07-10", 182, 27.165, "10/07/2025"),
+            ("2025-07-11", 182, 27.165, "10/07/2025"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    db_manager = DatabaseManager(db_filename=db_path)
+    with db_manager._connection() as conn:
+        rows = conn.execute(
+            f'SELECT "{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}", '
+            f'"{C.YIELD_COLUMN_NAME}", "{C.FIRST_SEEN_COLUMN_NAME}", '
+            f'"{C.LAST_SEEN_COLUMN_NAME}" FROM "{C.TABLE_NAME}" '
+            f'ORDER BY "{C.TENOR_COLUMN_NAME}", "{C.FIRST_SEEN_COLUMN_NAME}"'
+        ).fetchall()
+    # التواريخ مخزنة كأرقام أيام منذ 1970-01-01
+    assert rows == [
+        (_day("2025-07-07"), 91, 27.558, _day("2025-07-07"), _day("2025-07-09")),
+        (_day("2025-07-03"), 182, 27.0, _day("2025-07-07"), _day("2025-07-07")),
+        (_day("2025-07-10"), 182, 27.165, _day("2025-07-10"), _day("2025-07-11")),
+    ]
+
+    # الدوال القديمة تُرجع نفس الشكل
+    history = db_manager.load_all_historical_data()
+    assert list(history.columns) == [
+        C.DATE_COLUMN_NAME,
+        C.TENOR_COLUMN_NAME,
+        C.YIELD_COLUMN_NAME,
+        C.SESSION_DATE_COLUMN_NAME,
+    ]
+    # كما في الجدول القديم: أحدث البيانات هي ما رآه آخر جلب (2025-07-11) فقط
+    latest_df, status_message = db_manager.load_latest_data()
+    assert latest_df[C.YIELD_COLUMN_NAME].tolist() == [27.165]
+    assert status_message == "بتاريخ 11-07-2025"
+    db_manager.close()
+
+
+def test_text_dates_are_migrated_to_day_numbers(tmp_path):
+    """
+    🧪 يختبر ترحيل أعمدة التواريخ النصية إلى أرقام أيام، وأن ترتيب الجلسات أصبح صحيحًا.
+    """
+    import sqlite3
+
+    db_path = str(tmp_path / "text_dates.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        f"""CREATE TABLE "{C.TABLE_NAME}" (
+            "{C.SESSION_DATE_COLUMN_NAME}" TEXT NOT NULL,
+            "{C.TENOR_COLUMN_NAME}" INTEGER NOT NULL,
+            "{C.YIELD_COLUMN_NAME}" REAL NOT NULL,
+            "{C.FIRST_SEEN_COLUMN_NAME}" TEXT NOT NULL,
+            "{C.LAST_SEEN_COLUMN_NAME}" TEXT NOT NULL,
+            "{C.ROW_VERSION_COLUMN_NAME}" INTEGER NOT NULL,
+            PRIMARY KEY ("{C.SESSION_DATE_COLUMN_NAME}", "{C.TENOR_COLUMN_NAME}")
+        )"""
+    )
+    # "28/12/2024" < "30/01/2025" < "02/02/2025" كنص غير صحيح، وصحيح كأرقام
+    conn.executemany(
+        f'INSERT INTO "{C.TABLE_NAME}" VALUES (?, ?, ?, ?, ?, 1)',
+        [
+            ("02/02/2025", 91, 26.0, "2025-02-02", "2025-02-03"),
+            ("28/12/2024", 91, 28.0, "2024-12-28", "2024-12-29"),
+            ("30/01/2025", 91, 27.0, "2025-01-30", "2025-01-30"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    db_manager = DatabaseManager(db_filename=db_path)
+    history = db_manager.load_history_range((91,), "2025-01-01")
+    assert history[C.SESSION_DATE_COLUMN_NAME].tolist() == [
+        pd.Timestamp("2025-01-30"),
+        pd.Timestamp("2025-02-02"),
+    ]
+    assert history[C.YIELD_COLUMN_NAME].tolist() == [27.0, 26.0]
+
+    latest_df, status_message = db_manager.load_latest_data()
+    assert latest_df[C.YIELD_COLUMN_NAME].tolist() == [26.0]
+    assert status_message == "بتاريخ 03-02-2025"
+    db_manager.close()
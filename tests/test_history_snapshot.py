@@ -0,0 +1,127 @@
+# tests/test_history_snapshot.py
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db_manager import DatabaseManager, _build_range_query
+from history_snapshot import read_snapshot, select_history, snapshot_to_dataframe
+import constants as C
+
+
+def test_snapshot_matches_sql_and_is_memory_mapped(tmp_path, scrape):
+    """
+    🧪 يختبر أن النسخة العمودية تُقرأ بالـ mmap وتعطي نفس نتيجة استعلام SQL.
+    """
+    db_manager = DatabaseManager(db_filename=str(tmp_path / "history.db"))
+    db_manager.save_data(scrape("2025-01-05", [91, 364], [27.0, 25.0]))
+    db_manager.save_data(scrape("2025-02-02", [91, 182, 364], [26.5, 26.0, 24.5]))
+    db_manager.save_data(scrape("2025-03-02", [91, 364], [26.0, 24.0]))
+
+    snapshot = db_manager.load_history_snapshot()
+    assert isinstance(snapshot, np.memmap)
+    assert not snapshot.flags.writeable
+    assert os.path.exists(db_manager.snapshot_path)
+
+    for tenors, start, end in [
+        (None, None, None),
+        ((364, 91), "2025-02-01", None),
+        ((182,), None, "2025-02-02"),
+        ((273,), None, None),
+    ]:
+        query, params = _build_range_query(tenors, start, end)
+        expected = db_manager._read_history(query, params)
+        start_day = (
+            None if start is None else (pd.Timestamp(start) - pd.Timestamp(0)).days
+        )
+        end_day = None if end is None else (pd.Timestamp(end) - pd.Timestamp(0)).days
+        actual = snapshot_to_dataframe(
+            select_history(snapshot, tenors, start_day, end_day)
+        )
+        if expected.empty:
+            assert actual.empty and list(actual.columns) == list(expected.columns)
+        else:
+            pd.testing.assert_frame_equal(actual, expected)
+    db_manager.close()
+
+
+def test_snapshot_is_refreshed_incrementally(tmp_path, scrape):
+    """
+    🧪 يختبر أن الحفظ يحدّث النسخة العمودية بالصفوف الجديدة فقط، وأن عملية أخرى تقرأ أحدث نسخة.
+    """
+    db_path = str(tmp_path / "history.db")
+    writer = DatabaseManager(db_filename=db_path)
+    writer.save_data(scrape("2025-01-05", [91], [27.0]))
+    first = read_snapshot(writer.snapshot_path)
+    assert first[C.YIELD_COLUMN_NAME].tolist() == [27.0]
+
+    # عطاء جديد وتصحيح لعطاء قديم في نفس الدفعة
+    writer.save_data(
+        pd.concat(
+            [scrape("2025-01-12", [91], [26.8]), scrape("2025-01-05", [91], [27.1])]
+        )
+    )
+    # القارئ القديم ما زال يرى النسخة التي فتحها (استبدال ذري للملف)
+    assert first[C.YIELD_COLUMN_NAME].tolist() == [27.0]
+
+    reader = DatabaseManager(db_filename=db_path)
+    history = reader.load_history_range((91,))
+    assert history[C.YIELD_COLUMN_NAME].tolist() == [27.1, 26.8]
+    assert reader.load_all_historical_data()[C.YIELD_COLUMN_NAME].tolist() == [
+        27.1,
+        26.8,
+    ]
+    writer.close()
+    reader.close()
+
+
+def test_simulation_reads_the_snapshot_directly(tmp_path, scrape):
+    """
+    🧪 يختبر أن المحاكاة تعطي نفس النتيجة من النسخة العمودية ومن الـ DataFrame.
+    """
+    from simulation import simulate_rollover
+
+    db_manager = DatabaseManager(db_filename=str(tmp_path / "history.db"))
+    db_manager.save_data(scrape("2025-01-05", [91, 364], [27.0, 25.0]))
+    db_manager.save_data(scrape("2025-01-12", [91, 364], [26.0, 24.0]))
+
+    kwargs = dict(years=1, tenor=91, n_paths=200, seed=7, workers=1)
+    from_snapshot = simulate_rollover(
+        db_manager.load_history_snapshot(), 100000, **kwargs
+    )
+    from_frame = simulate_rollover(
+        db_manager.load_all_historical_data(), 100000, **kwargs
+    )
+    assert from_snapshot["percentiles"] == from_frame["percentiles"]
+    db_manager.close()
+
+
+def test_snapshot_is_rebuilt_for_a_replaced_database(tmp_path, scrape):
+    """
+    🧪 يختبر أن النسخة العمودية تُبنى من جديد إذا استُبدل ملف قاعدة البيانات تحتها
+    (تحديث محلي ثم git pull لقاعدة البوت) حتى لو تساوت أرقام الإصدارات وعدد الصفوف.
+    """
+    import shutil
+
+    db_path = str(tmp_path / "history.db")
+    local = DatabaseManager(db_filename=db_path)
+    local.save_data(scrape("2025-01-05", [91], [25.0]))
+    local.save_data(scrape("2025-01-12", [91], [26.0]))
+    local.close()
+
+    (tmp_path / "bot").mkdir()
+    bot_path = str(tmp_path / "bot" / "history.db")
+    bot = DatabaseManager(db_filename=bot_path)
+    bot.save_data(scrape("2025-01-05", [91], [25.0]))
+    bot.save_data(scrape("2025-01-12", [182], [27.0]))
+    bot.close()
+    shutil.copyfile(bot_path, db_path)
+
+    pulled = DatabaseManager(db_filename=db_path)
+    history = snapshot_to_dataframe(pulled.load_history_snapshot())
+    assert history[C.TENOR_COLUMN_NAME].tolist() == ["91", "182"]
+    assert history[C.YIELD_COLUMN_NAME].tolist() == [25.0, 27.0]
+    pulled.close()
@@ -0,0 +1,74 @@
+# tests/test_portfolio.py
+import sys
+import os
+import pytest
+import pandas as pd
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from calculations import calculate_primary_yield
+from portfolio import PositionStore, maturity_ladder, portfolio_summary
+
+
+@pytest.fixture
+def sample_store():
+    """
+    محفظة صغيرة بآجال متداخلة، اثنان منها يستحقان في نفس اليوم.
+    A small ladder where two positions mature on the same date.
+    """
+    positions = pd.DataFrame(
+        {
+            "face_value": [100000.0, 50000.0, 25000.0],
+            "yield_rate": [26.0, 27.0, 27.5],
+            "tenor": [91, 182, 364],
+            "purchase_date": ["2025-04-02", "2025-01-01", "2025-06-01"],
+            "tax_rate": [20.0, 20.0, 20.0],
+        }
+    )
+    return PositionStore.from_dataframe(positions)
+
+
+def test_maturity_ladder_aggregates_by_date(sample_store):
+    """
+    🧪 يختبر تجميع التدفقات النقدية والضرائب المستحقة حسب تاريخ الاستحقاق.
+    """
+    ladder = maturity_ladder(sample_store)
+
+    # 2025-04-02 + 91 = 2025-01-01 + 182 = 2025-07-02
+    assert len(ladder) == 2
+    first = ladder.iloc[0]
+    assert first["maturity_date"] == pd.Timestamp("2025-07-02")
+    assert first["positions"] == 2
+    assert first["face_value"] == pytest.approx(150000.0)
+
+    expected_tax = (
+        calculate_primary_yield(100000.0, 26.0, 91, 20.0)["tax_amount"]
+        + calculate_primary_yield(50000.0, 27.0, 182, 20.0)["tax_amount"]
+    )
+    assert first["tax_due"] == pytest.approx(expected_tax)
+
+
+def test_portfolio_summary_and_validation(sample_store):
+    """
+    🧪 يختبر إجمالي صافي الدخل للمحفظة ورفض المراكز غير الصالحة.
+    """
+    summary = portfolio_summary(sample_store, as_of="2025-12-31")
+    expected_net = sum(
+        calculate_primary_yield(fv, y, t, 20.0)["net_return"]
+        for fv, y, t in [(100000.0, 26.0, 91), (50000.0, 27.0, 182), (25000.0, 27.5, 364)]
+    )
+
+    assert summary["positions"] == 3
+    assert summary["total_net_income"] == pytest.approx(expected_net)
+    assert summary["outstanding_positions"] == 1
+
+    with pytest.raises(ValueError):
+        sample_store.add(0, 26.0, 91, "2025-01-01")
+    # أجل غير صحيح لا يُقرّب إلى أجل آخر
+    with pytest.raises(ValueError, match="whole number"):
+        sample_store.extend(1000.0, 26.0, [91, 91.9], "2025-01-01")
+    with pytest.raises(ValueError, match="whole number"):
+        sample_store.add(1000.0, 26.0, float("nan"), "2025-01-01")
+    sample_store.add(1000.0, 26.0, 91.0, "2025-01-01")
+    assert len(sample_store) == 4
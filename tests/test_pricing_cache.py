@@ -0,0 +1,69 @@
+# tests/test_pricing_cache.py
+import sys
+import os
+import pytest
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from calculations import calculate_primary_yield, analyze_secondary_sale
+from pricing_cache import PricingCache
+
+
+def test_cache_hits_on_normalized_inputs():
+    """
+    🧪 يختبر أن المدخلات المتطابقة بعد التقريب تُخدم من الذاكرة المؤقتة بنفس النتيجة.
+    """
+    cache = PricingCache()
+
+    first = cache.primary_yield(25000, 27.5, 364, 20.0, data_version="v1")
+    second = cache.primary_yield(25000.0000000001, 27.5, 364.0, 20, data_version="v1")
+
+    assert first == calculate_primary_yield(25000.0, 27.5, 364, 20.0)
+    assert second == first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # نسخة بيانات جديدة = مفتاح جديد
+    cache.primary_yield(25000, 27.5, 364, 20.0, data_version="v2")
+    assert cache.stats()["misses"] == 2
+
+    # تعديل النتيجة المُرجعة لا يفسد القيمة المخزنة
+    second["net_return"] = -1
+    assert cache.primary_yield(25000, 27.5, 364, 20.0, "v1")["net_return"] > 0
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    🧪 يختبر أن الذاكرة المؤقتة محدودة الحجم وتحذف الأقدم استخدامًا أولًا.
+    """
+    cache = PricingCache(max_entries=2)
+
+    cache.secondary_sale(100000, 25.0, 364, 90, 23.0, 20.0)
+    cache.secondary_sale(100000, 25.0, 364, 91, 23.0, 20.0)
+    cache.secondary_sale(100000, 25.0, 364, 90, 23.0, 20.0)  # hit -> الأحدث
+    cache.secondary_sale(100000, 25.0, 364, 92, 23.0, 20.0)  # يطرد 91
+
+    assert cache.stats()["size"] == 2
+    cache.secondary_sale(100000, 25.0, 364, 90, 23.0, 20.0)
+    assert cache.stats()["hits"] == 2
+
+    result = cache.secondary_sale(100000, 25.0, 364, 91, 23.0, 20.0)
+    assert cache.stats()["misses"] == 4
+    assert result == analyze_secondary_sale(100000, 25.0, 364, 91, 23.0, 20.0)
+
+
+def test_non_integral_days_are_rejected_not_truncated():
+    """
+    🧪 يختبر أن الأجل أو مدة الاحتفاظ غير الصحيحة تُرفض بدل أن تُقرب إلى مفتاح أجل آخر.
+    """
+    cache = PricingCache()
+    with pytest.raises(ValueError, match="tenor"):
+        cache.primary_yield(25000, 27.5, 91.9, 20.0)
+    with pytest.raises(ValueError, match="holding_days"):
+        cache.secondary_sale(100000, 27.0, 364, 60.5, 28.0, 20.0)
+    assert cache.stats()["size"] == 0
+
+    # 364.0 هو نفس الأجل 364
+    assert cache.primary_yield(25000, 27.5, 364.0, 20.0) == cache.primary_yield(
+        25000, 27.5, 364, 20.0
+    )
@@ -0,0 +1,90 @@
+# tests/test_retry_policy.py
+import sys
+import os
+import random
+import sqlite3
+
+import pytest
+import requests
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from retry_policy import Deadline, DriverStartupError, RetryPolicy, is_retryable
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f"{status_code}", response=response)
+
+
+def test_backoff_is_exponential_capped_and_jittered():
+    """
+    🧪 يختبر أن فترات الانتظار تتضاعف حتى الحد الأقصى، وأن العشوائية تبقى في نطاقها.
+    """
+    exact = RetryPolicy(base_delay=2, max_delay=10, jitter=0)
+    assert [exact.backoff(n) for n in range(1, 6)] == [2, 4, 8, 10, 10]
+
+    jittered = RetryPolicy(base_delay=2, max_delay=10, jitter=0.5, rng=random.Random(7))
+    for attempt in range(1, 6):
+        delay = exact.backoff(attempt)
+        waits = [jittered.backoff(attempt) for _ in range(200)]
+        assert all(delay / 2 <= wait <= delay for wait in waits)
+        assert len(set(waits)) > 1, "يجب أن تختلف فترات الانتظار"
+
+
+def test_next_delay_respects_attempts_and_deadline():
+    """
+    🧪 يختبر التوقف عند استنفاد المحاولات أو عندما يتجاوز الانتظار المهلة الإجمالية.
+    """
+    clock = _FakeClock()
+    policy = RetryPolicy(max_attempts=3, base_delay=4, jitter=0)
+    deadline = Deadline(30, clock=clock)
+    assert policy.next_delay(1, deadline) == 4
+    assert policy.next_delay(2, deadline) == 8
+    assert policy.next_delay(3, deadline) is None
+
+    clock.now += 25
+    assert deadline.remaining() == pytest.approx(5)
+    assert policy.next_delay(2, deadline) is None, "الانتظار 8 ثوانٍ يتجاوز الباقي"
+    assert deadline.clamp(20) == pytest.approx(5)
+    clock.now += 60
+    assert deadline.remaining() == 0
+    assert deadline.clamp(20) == 1.0, "لا تقل أي مهلة عن ثانية واحدة"
+
+    unbounded = Deadline(None, clock=clock)
+    assert unbounded.clamp(20) == 20
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (_http_error(503), True),
+        (_http_error(429), True),
+        (_http_error(404), False),
+        (_http_error(403), False),
+        (requests.ConnectionError("reset"), True),
+        (requests.Timeout("slow"), True),
+        (TimeoutException("not rendered"), True),
+        (WebDriverException("browser crashed"), True),
+        (DriverStartupError("no chromedriver"), False),
+        (sqlite3.OperationalError("database is locked"), True),
+        (sqlite3.OperationalError("no such table: x"), False),
+        (ValueError("bad data"), False),
+        (KeyError("tenor"), False),
+    ],
+)
+def test_errors_are_classified(error, retryable):
+    """🧪 يختبر تصنيف الأخطاء إلى مؤقتة تستحق إعادة المحاولة ونهائية."""
+    assert is_retryable(error) is retryable
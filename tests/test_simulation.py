@@ -0,0 +1,61 @@
+# tests/test_simulation.py
+import sys
+import os
+import pytest
+import pandas as pd
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation import simulate_rollover
+import constants as C
+
+
+@pytest.fixture
+def history_df():
+    """
+    بيانات تاريخية وهمية بنفس شكل ناتج load_all_historical_data (الأجل كنص).
+    """
+    return pd.DataFrame(
+        {
+            C.DATE_COLUMN_NAME: pd.to_datetime(
+                ["2025-07-01", "2025-07-01", "2025-07-08", "2025-07-08"]
+            ),
+            C.TENOR_COLUMN_NAME: ["91", "364", "91", "364"],
+            C.YIELD_COLUMN_NAME: [26.0, 25.0, 27.0, 24.0],
+            C.SESSION_DATE_COLUMN_NAME: ["01/07/2025"] * 2 + ["08/07/2025"] * 2,
+        }
+    )
+
+
+def test_rollover_is_deterministic_across_worker_counts(history_df):
+    """
+    🧪 يختبر أن نفس البذرة تعطي نفس النتائج سواء في عملية واحدة أو عدة عمليات.
+    """
+    kwargs = dict(years=2, tenor=91, n_paths=3000, seed=42, chunk_size=1000)
+    inline = simulate_rollover(history_df, 100000, workers=1, **kwargs)
+    pooled = simulate_rollover(history_df, 100000, workers=2, **kwargs)
+
+    assert inline["error"] is None
+    assert inline["percentiles"] == pooled["percentiles"]
+    assert inline["rolls"] == 8
+    assert inline["paths_per_sec"] > 0
+
+
+def test_rollover_percentiles_are_bounded_by_history(history_df):
+    """
+    🧪 يختبر أن العائد المحاكى يقع بين أسوأ وأفضل عائد تاريخي بعد الضريبة.
+    """
+    result = simulate_rollover(
+        history_df, 100000, years=1, tenor=364, n_paths=500, workers=1
+    )
+    after_tax = 1 - C.DEFAULT_TAX_RATE_PERCENT / 100.0
+    low = 24.0 * 364 / C.DAYS_IN_YEAR * after_tax
+    high = 25.0 * 364 / C.DAYS_IN_YEAR * after_tax
+
+    assert result["rolls"] == 1
+    for value in result["percentiles"].values():
+        assert low - 1e-9 <= value <= high + 1e-9
+
+    missing = simulate_rollover(history_df, 100000, years=1, tenor=182, workers=1)
+    assert missing["error"] is not None
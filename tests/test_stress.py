@@ -0,0 +1,86 @@
+# tests/test_stress.py
+import sys
+import os
+import pytest
+import pandas as pd
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from calculations import analyze_secondary_sale
+from portfolio import PositionStore
+from stress import iter_stress_test, stress_test_portfolio, summarize_stress
+from yield_curve import YieldCurve
+import constants as C
+
+
+@pytest.fixture
+def store():
+    """
+    ثلاثة مراكز: اثنان قائمان في تاريخ التقييم وواحد مستحق بالفعل.
+    """
+    return PositionStore.from_dataframe(
+        pd.DataFrame(
+            {
+                "face_value": [100000.0, 50000.0, 25000.0],
+                "yield_rate": [26.0, 27.0, 27.5],
+                "tenor": [364, 182, 91],
+                "purchase_date": ["2025-03-01", "2025-05-01", "2025-01-01"],
+            }
+        )
+    )
+
+
+def test_stress_matches_scalar_secondary_sale(store):
+    """
+    🧪 يختبر أن نتيجة كل سيناريو تطابق حاسبة البيع الثانوي بالعائد المُزاح.
+    """
+    curve = YieldCurve.from_dataframe(pd.DataFrame(C.INITIAL_DATA))
+    results = stress_test_portfolio(
+        store, curve, "2025-07-01", {"up": (100.0, 0.0), "base": (0.0, 0.0)}
+    )
+
+    # المركز المستحق (رقم 2) لا يدخل في الاختبار
+    assert sorted(results["position"].unique()) == [0, 1]
+    assert len(results) == 4
+
+    row = results[(results["position"] == 0) & (results["scenario"] == "up")].iloc[0]
+    holding_days = (pd.Timestamp("2025-07-01") - pd.Timestamp("2025-03-01")).days
+    expected_yield = curve.yield_for(364 - holding_days) + 1.0
+    scalar = analyze_secondary_sale(
+        100000.0, 26.0, 364, holding_days, expected_yield, C.DEFAULT_TAX_RATE_PERCENT
+    )
+    assert row["market_yield"] == pytest.approx(expected_yield)
+    assert row["net_profit"] == pytest.approx(scalar["net_profit"])
+    assert row["pnl"] < 0
+
+    base = results[results["scenario"] == "base"]
+    assert base["pnl"].abs().max() == pytest.approx(0.0)
+
+
+def test_stress_chunked_equals_single_pass(store):
+    """
+    🧪 يختبر أن التقييم على دفعات (عند تجاوز ميزانية الذاكرة) يعطي نفس النتيجة.
+    """
+    curve = YieldCurve.from_dataframe(pd.DataFrame(C.INITIAL_DATA))
+    single = stress_test_portfolio(store, curve, "2025-07-01")
+    chunks = list(iter_stress_test(store, curve, "2025-07-01", memory_budget_bytes=1))
+    assert len(chunks) == 2, "مركز واحد في كل دفعة"
+    pd.testing.assert_frame_equal(single, pd.concat(chunks, ignore_index=True))
+
+    # الميزانية تخص المصفوفات الوسيطة فقط: الجدول الكامل يُعاد مهما كان حجمه
+    chunked = stress_test_portfolio(store, curve, "2025-07-01", memory_budget_bytes=1)
+    pd.testing.assert_frame_equal(single, chunked)
+    pd.testing.assert_frame_equal(
+        summarize_stress(
+            iter_stress_test(store, curve, "2025-07-01", memory_budget_bytes=1)
+        ),
+        summarize_stress(single),
+    )
+
+    summary = summarize_stress(single).set_index("scenario")
+    assert (
+        summary.loc["parallel +200bp", "pnl"]
+        < 0
+        < summary.loc["parallel -200bp", "pnl"]
+    )
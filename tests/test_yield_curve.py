@@ -0,0 +1,41 @@
+# tests/test_yield_curve.py
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+# إضافة المجلد الرئيسي للمشروع إلى مسار بايثون
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from yield_curve import YieldCurve
+import constants as C
+
+
+def test_curve_interpolates_and_extrapolates_flat():
+    """
+    🧪 يختبر الاستيفاء الخطي بين الآجال المعلنة والاستقراء الثابت خارجها.
+    """
+    curve = YieldCurve.from_dataframe(pd.DataFrame(C.INITIAL_DATA))
+
+    assert curve.yield_for(91) == pytest.approx(26.0)
+    assert curve.yield_for(136.5) == pytest.approx(26.25)
+    assert curve.yield_for(30) == pytest.approx(26.0)
+    assert curve.yield_for(400) == pytest.approx(27.5)
+
+    days = np.array([91, 182, 227.5, 364])
+    np.testing.assert_allclose(curve.yield_for(days), [26.0, 26.5, 26.75, 27.5])
+
+
+def test_curve_matches_numpy_interp():
+    """
+    🧪 يختبر أن الاستعلام المجمّع يطابق np.interp لكل عدد أيام.
+    """
+    tenors = [364, 91, 273, 182]  # ترتيب غير مرتب عمدًا
+    yields = [25.132, 27.558, 26.758, 27.165]
+    curve = YieldCurve(tenors, yields)
+
+    days = np.arange(1, 400)
+    order = np.argsort(tenors)
+    expected = np.interp(days, np.array(tenors)[order], np.array(yields)[order])
+    np.testing.assert_allclose(curve.yield_for(days), expected)
@@ -20,21 +20,26 @@ def run_update() -> None:
     logger.info("=" * 50)
     logger.info("Starting data update process...")
 
+    db_manager = None
     try:
         # Initialize the database manager which handles all DB operations
         db_manager = DatabaseManager()
 
         # Pass the db_manager instance to the fetching function
         # The fetching function will now handle saving the data directly
-        fetch_data_from_cbe(db_manager)
+        # An unchanged page is a no-op: nothing is parsed or written
+        status = fetch_data_from_cbe(db_manager)
 
-        logger.info("Data update process finished successfully.")
+        logger.info(f"Data update process finished ({status}).")
 
     except Exception as e:
         logger.critical(
             f"A critical error occurred in the main update script: {e}", exc_info=True
         )
     finally:
+        # Checkpoint the WAL so the committed .db file contains every change
+        if db_manager is not None:
+            db_manager.close()
         logger.info("=" * 50)
 
 
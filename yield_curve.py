@@ -0,0 +1,69 @@
+# yield_curve.py (منحنى العائد لأي مدة متبقية)
+"""
+Yield curve built from the latest auction results.
+
+The auctions only publish yields at a few tenors (usually 91, 182, 273 and
+364 days). `YieldCurve` precomputes a piecewise-linear interpolation once and
+then answers queries for any day count with a binary search over the knots.
+"""
+import logging
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+import constants as C
+from calculations import ArrayLike
+
+logger = logging.getLogger(__name__)
+
+
+class YieldCurve:
+    """Piecewise-linear yield curve with flat extrapolation beyond the known tenors."""
+
+    def __init__(self, tenors: ArrayLike, yields: ArrayLike):
+        tenors = np.asarray(tenors, dtype=float)
+        yields = np.asarray(yields, dtype=float)
+        valid = np.isfinite(tenors) & np.isfinite(yields) & (tenors > 0)
+        if not valid.any():
+            raise ValueError(
+                "A yield curve needs at least one valid (tenor, yield) point."
+            )
+
+        # One knot per tenor (the mean if a tenor appears more than once)
+        knots, inverse = np.unique(tenors[valid], return_inverse=True)
+        knot_yields = np.bincount(inverse, weights=yields[valid]) / np.bincount(inverse)
+
+        self.tenors = knots
+        self.yields = knot_yields
+        # Segment i covers [tenors[i], tenors[i + 1]): y = intercept + slope * days
+        slopes = np.zeros(len(knots))
+        if len(knots) > 1:
+            slopes[:-1] = np.diff(knot_yields) / np.diff(knots)
+        self._slopes = slopes
+        self._intercepts = knot_yields - slopes * knots
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "YieldCurve":
+        """Builds a curve from the DataFrame returned by `load_latest_data`."""
+        return cls(
+            pd.to_numeric(df[C.TENOR_COLUMN_NAME], errors="coerce"),
+            pd.to_numeric(df[C.YIELD_COLUMN_NAME], errors="coerce"),
+        )
+
+    def yield_for(self, days: Union[float, ArrayLike]) -> Union[float, np.ndarray]:
+        """
+        Returns the interpolated yield for one or many remaining day counts.
+
+        Args:
+            days: A day count or an array of day counts.
+
+        Returns:
+            A float for a scalar input, otherwise an array of the same shape.
+        """
+        query = np.asarray(days, dtype=float)
+        clipped = np.clip(query, self.tenors[0], self.tenors[-1])
+        segment = np.searchsorted(self.tenors, clipped, side="right") - 1
+        segment = np.clip(segment, 0, len(self.tenors) - 1)
+        result = self._intercepts[segment] + self._slopes[segment] * clipped
+        return float(result) if result.ndim == 0 else result